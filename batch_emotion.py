@@ -0,0 +1,217 @@
+"""
+Headless batch scoring of recorded sessions.
+
+Re-runs emotion detection over video files or directories of frames,
+spread across a process pool where every worker loads FER once. The
+transitions are written in the same format as emotion.py's log_transition,
+timestamped by position in the source media:
+
+    python batch_emotion.py session1.mp4 session2.mp4 frames_dir/ --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import cv2
+
+from binary_log import BINARY_LOG_FILE, LOG_FORMAT
+from log_store import LOG_FILE
+from segments import SEGMENT_PERIOD, segment_directory
+from sqlite_store import DATABASE_FILE
+from transition_debounce import TransitionDebouncer
+from transition_logger import TransitionLogWriter
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Where emotion.py logs, so the dashboard sees the batch's transitions too:
+# with JOYNA_LOG_SEGMENTS set, the directory of segments
+TEXT_LOG = segment_directory(LOG_FILE) if SEGMENT_PERIOD else LOG_FILE
+
+# Loaded once per worker process by _init_worker
+_detector = None
+
+
+def _init_worker(mtcnn):
+    global _detector
+    from fer import FER
+    _detector = FER(mtcnn=mtcnn)
+
+
+def iter_frames(source, fps):
+    """
+    Yields (seconds into the media, BGR frame) for a video file or a
+    directory of images, which are played back at `fps`.
+    """
+    if os.path.isdir(source):
+        names = sorted(name for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS))
+        for index, name in enumerate(names):
+            frame = cv2.imread(os.path.join(source, name))
+            if frame is not None:
+                yield index / fps, frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {source}")
+    media_fps = cap.get(cv2.CAP_PROP_FPS) or fps
+    try:
+        index = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index / media_fps, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def media_start(source, fps):
+    """
+    Best guess of when a recording started: the earliest frame's mtime for a
+    directory, or the file's mtime minus its duration for a video.
+    """
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)
+                 if name.lower().endswith(IMAGE_EXTENSIONS)]
+        return datetime.fromtimestamp(min((os.path.getmtime(path) for path in paths), default=time.time()))
+
+    cap = cv2.VideoCapture(source)
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+    media_fps = cap.get(cv2.CAP_PROP_FPS) or fps
+    cap.release()
+    return datetime.fromtimestamp(os.path.getmtime(source)) - timedelta(seconds=frame_count / media_fps)
+
+
+def score_source(source, fps=10.0, stride=1, start=None, debounce=None):
+    """
+    Scores one source in a worker. Returns the source, its transitions as
+    log_transition arguments, frames processed, seconds spent and the
+    debouncer's counts. `debounce` holds TransitionDebouncer settings;
+    None logs every change of the dominant emotion.
+    """
+    from emotion import EmotionTracker
+
+    base = start if start is not None else media_start(source, fps)
+    base_seconds = base.timestamp()
+    transitions = []
+    debouncer = TransitionDebouncer(**debounce) if debounce is not None else None
+    tracker = EmotionTracker(log=lambda *entry: transitions.append(entry), debouncer=debouncer)
+
+    frames = 0
+    began = time.perf_counter()
+    for index, (offset, frame) in enumerate(iter_frames(source, fps)):
+        if index % stride:
+            continue
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        tracker.update(_detector.detect_emotions(rgb_frame), base_seconds + offset)
+        frames += 1
+    elapsed = time.perf_counter() - began
+    return {
+        'source': source,
+        'pid': os.getpid(),
+        'transitions': transitions,
+        'frames': frames,
+        'seconds': elapsed,
+        'session_emotions': dict(tracker.session_emotions),
+        'debounce': debouncer.stats() if debouncer is not None else None,
+    }
+
+
+def run_batch(sources, workers=None, fps=10.0, stride=1, start=None, mtcnn=True, debounce=None,
+              text_path=TEXT_LOG, binary_path=None, database_path=None, segment_period=SEGMENT_PERIOD or None):
+    """
+    Scores every source across a process pool, logs their transitions and
+    returns per-source results with a per-worker throughput summary.
+    With `segment_period`, `text_path` is a directory of segments.
+    """
+    workers = workers or os.cpu_count() or 1
+    results = []
+    writer = TransitionLogWriter(text_path=text_path, binary_path=binary_path, database_path=database_path,
+                                 segment_period=segment_period)
+    began = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(mtcnn,)) as pool:
+            futures = {pool.submit(score_source, source, fps, stride, start, debounce): source for source in sources}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error scoring {futures[future]}: {str(e)}")
+                    continue
+                for entry in result['transitions']:
+                    writer.log(*entry)
+                results.append(result)
+                print(f"{result['source']}: {result['frames']} frames, "
+                      f"{len(result['transitions'])} transitions, "
+                      f"{result['frames'] / result['seconds'] if result['seconds'] else 0:.1f} frames/sec")
+    finally:
+        writer.close()
+
+    wall = time.perf_counter() - began
+    per_worker = {}
+    for result in results:
+        stats = per_worker.setdefault(result['pid'], {'frames': 0, 'seconds': 0.0})
+        stats['frames'] += result['frames']
+        stats['seconds'] += result['seconds']
+    total_frames = sum(result['frames'] for result in results)
+    debounced = [result['debounce'] for result in results if result['debounce'] is not None]
+    return {
+        'results': results,
+        'workers': {
+            pid: stats['frames'] / stats['seconds'] if stats['seconds'] else 0.0
+            for pid, stats in per_worker.items()
+        },
+        'frames': total_frames,
+        'wall_seconds': wall,
+        'frames_per_second': total_frames / wall if wall else 0.0,
+        'raw_transitions': sum(stats['raw_transitions'] for stats in debounced),
+        'suppressed': sum(stats['suppressed'] for stats in debounced),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score recorded sessions headlessly across a process pool.")
+    parser.add_argument('sources', nargs='+', help="video files or directories of frames")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--fps', type=float, default=10.0,
+                        help="frame rate of image directories, and fallback for videos that do not report one")
+    parser.add_argument('--stride', type=int, default=1, help="score every Nth frame")
+    parser.add_argument('--start', type=datetime.fromisoformat, default=None,
+                        help="wall-clock time the media starts (default: derived from file times)")
+    parser.add_argument('--min-dwell', type=float, default=1.0,
+                        help="seconds a new emotion must hold before its transition is logged")
+    parser.add_argument('--score-margin', type=float, default=0.1,
+                        help="lead over the current emotion, in averaged score share (0-1), a new emotion needs")
+    parser.add_argument('--vote-window', type=float, default=1.0,
+                        help="seconds of frames a new emotion must win the majority of")
+    parser.add_argument('--majority', type=float, default=0.6,
+                        help="share of the vote window's frames a new emotion must win (0-1)")
+    parser.add_argument('--no-mtcnn', action='store_true', help="use OpenCV's Haar face detector instead of MTCNN")
+    parser.add_argument('--output', default=TEXT_LOG,
+                        help="text transition log to append to (a directory of segments with JOYNA_LOG_SEGMENTS)")
+    parser.add_argument('--binary-output', default=BINARY_LOG_FILE, help="binary transition log to append to")
+    parser.add_argument('--database', default=DATABASE_FILE, help="SQLite database to insert into")
+    args = parser.parse_args()
+
+    summary = run_batch(
+        args.sources, workers=args.workers, fps=args.fps, stride=max(args.stride, 1), start=args.start,
+        mtcnn=not args.no_mtcnn,
+        debounce={'min_dwell': args.min_dwell, 'margin': args.score_margin,
+                  'vote_window': args.vote_window, 'majority': args.majority},
+        text_path=args.output if LOG_FORMAT in ('text', 'both') else None,
+        binary_path=args.binary_output if LOG_FORMAT in ('binary', 'both') else None,
+        database_path=args.database if LOG_FORMAT == 'sqlite' else None,
+        segment_period=SEGMENT_PERIOD or None
+    )
+    for pid, rate in summary['workers'].items():
+        print(f"Worker {pid}: {rate:.1f} frames/sec")
+    print(f"Scored {summary['frames']} frames in {summary['wall_seconds']:.1f}s "
+          f"({summary['frames_per_second']:.1f} frames/sec overall, "
+          f"{len(summary['workers'])} cores used)")
+    raw = summary['raw_transitions']
+    if raw:
+        print(f"Debounce: {raw} emotion changes, suppressed {summary['suppressed']} "
+              f"({summary['suppressed'] / raw:.0%}) as flicker")
@@ -0,0 +1,233 @@
+"""
+Benchmarks the dashboard's log parsers and JSON/HTML endpoints against
+synthetic histories of increasing size, through Flask's test client.
+
+For every size it reports per-endpoint cold (first request) latency,
+p50/p95/p99 latency, throughput and peak traced memory, plus the cold start
+of a fresh interpreter: importing main.py and creating the app ('startup')
+and warming up the indexes ('warm-up'). Results can be
+saved as a named baseline and later runs compared against it:
+
+    python benchmarks/bench_endpoints.py --sizes 1000 10000 --save-baseline local
+    python benchmarks/bench_endpoints.py --sizes 1000 10000 --compare local
+
+Comparisons exit non-zero when an endpoint's p50 regresses beyond --threshold.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+sys.path.insert(0, REPO_ROOT)
+
+from generate_logs import START, write_logs  # noqa: E402
+
+
+def endpoints_for(days):
+    """The benchmarked routes, pointed at a day in the middle of the generated history."""
+    middle = START + timedelta(days=days // 2)
+    us_date = middle.strftime('%m/%d/%Y')
+    iso_date = middle.strftime('%Y-%m-%d')
+    return {
+        'chat-summary': f'/chat-summary/{us_date}',
+        'session-history': f'/session-history/{us_date}',
+        'daily-summary': f'/daily-summary/{iso_date}',
+        'emotion-analysis': f'/emotion-analysis/{us_date}',
+        'weekly-transitions': '/weekly-transitions',
+        'monthly-transitions': '/monthly-transitions',
+        'home': '/',
+    }
+
+
+def prepare_data(size, root):
+    directory = os.path.join(root, str(size))
+    days = max(size // 40, 1)
+    if not os.path.exists(os.path.join(directory, 'emotion_log.txt')):
+        print(f"Generating {size} transitions in {directory}")
+        write_logs(directory, size, max(size // 10, 1), days)
+    return directory, days
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silences any stdout output from the app so it does not skew timings."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def load_main(directory):
+    """Imports a fresh copy of main.py with its data files read from `directory`."""
+    os.chdir(directory)
+    sys.modules.pop('main', None)
+    with quiet():
+        return importlib.import_module('main')
+
+
+def load_app(directory):
+    """A fresh main.py and an app that loads its data on the first request."""
+    main = load_main(directory)
+    return main, main.create_app(warm='lazy')
+
+
+STARTUP_SCRIPT = """
+import json, sys, time
+began = time.perf_counter()
+sys.path.insert(0, {root!r})
+import main
+main.create_app(warm='lazy')
+created = time.perf_counter()
+main.warm_up()
+print(json.dumps([created - began, time.perf_counter() - created]))
+"""
+
+
+def measure_startup(directory, runs):
+    """Times importing main.py plus create_app(), and then warm_up(), in `runs` fresh interpreters."""
+    script = STARTUP_SCRIPT.format(root=REPO_ROOT)
+    startup, warm = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', script], cwd=directory, check=True,
+                                capture_output=True, text=True).stdout
+        created, warmed = json.loads(output.strip().splitlines()[-1])
+        startup.append(created)
+        warm.append(warmed)
+    return {'startup': summarize(startup), 'warm-up': summarize(warm)}
+
+
+def summarize(samples):
+    """Latency figures of `samples` in the layout of measure(); the first sample counts as cold."""
+    return {
+        'cold_ms': samples[0] * 1000,
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p95_ms': percentile(samples, 0.95) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'mean_ms': statistics.mean(samples) * 1000,
+        'throughput_rps': 0.0,
+        'peak_kb': 0.0,
+    }
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def measure(call, requests):
+    """Times a cold call, then `requests` warm calls, then one traced call for peak memory."""
+    with quiet():
+        start = time.perf_counter()
+        call()
+        cold = time.perf_counter() - start
+
+        samples = []
+        began = time.perf_counter()
+        for _ in range(requests):
+            start = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - start)
+        total = time.perf_counter() - began
+
+        tracemalloc.start()
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return dict(summarize(samples), cold_ms=cold * 1000, throughput_rps=requests / total if total else 0.0,
+                peak_kb=peak / 1024)
+
+
+def bench_size(size, root, requests, startup_runs):
+    directory, days = prepare_data(size, root)
+    results = measure_startup(directory, startup_runs)
+
+    # Cold parse on a fresh import, before any request has warmed the stores
+    main = load_main(directory)
+    results['parse_emotion_log'] = measure(main.parse_emotion_log, requests)
+
+    for name, url in endpoints_for(days).items():
+        _, app = load_app(directory)
+        client = app.test_client()
+
+        def call(url=url):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} returned {response.status_code}")
+
+        results[name] = measure(call, requests)
+    return results
+
+
+def print_table(size, results, baseline=None):
+    print(f"\n{size} transitions")
+    print(f"{'endpoint':<22}{'cold ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'peak KB':>10}"
+          + (f"{'vs base':>10}" if baseline else ''))
+    for name, row in results.items():
+        line = (f"{name:<22}{row['cold_ms']:>10.2f}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}"
+                f"{row['p99_ms']:>10.3f}{row['throughput_rps']:>10.0f}{row['peak_kb']:>10.0f}")
+        if baseline and name in baseline:
+            line += f"{row['p50_ms'] / baseline[name]['p50_ms']:>9.2f}x"
+        print(line)
+
+
+def find_regressions(current, baseline, threshold):
+    regressions = []
+    for size, results in current.items():
+        for name, row in results.items():
+            reference = baseline.get(size, {}).get(name)
+            if reference and reference['p50_ms'] > 0 and row['p50_ms'] / reference['p50_ms'] > threshold:
+                regressions.append((size, name, row['p50_ms'] / reference['p50_ms']))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark Joyna's dashboard endpoints on synthetic logs.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="emotion_log.txt line counts to benchmark (chat history gets a tenth as many blocks)")
+    parser.add_argument('--requests', type=int, default=50, help="warm requests per endpoint")
+    parser.add_argument('--startup-runs', type=int, default=5, help="fresh interpreters timed for cold start")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'joyna-bench'),
+                        help="where generated logs are cached between runs")
+    parser.add_argument('--save-baseline', metavar='NAME', help="save results as benchmarks/baselines/NAME.json")
+    parser.add_argument('--compare', metavar='NAME', help="compare against benchmarks/baselines/NAME.json")
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help="p50 slowdown ratio counted as a regression")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json')) as file:
+            baseline = json.load(file)['results']
+
+    data_dir = os.path.abspath(args.data_dir)
+    current = {}
+    for size in args.sizes:
+        current[str(size)] = bench_size(size, data_dir, args.requests, args.startup_runs)
+        print_table(size, current[str(size)], baseline.get(str(size)))
+    os.chdir(REPO_ROOT)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save_baseline}.json')
+        with open(path, 'w') as file:
+            json.dump({'requests': args.requests, 'python': sys.version.split()[0], 'results': current},
+                      file, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {path}")
+
+    if baseline:
+        regressions = find_regressions(current, baseline, args.threshold)
+        for size, name, ratio in regressions:
+            print(f"REGRESSION: {name} at {size} transitions is {ratio:.2f}x slower than {args.compare}")
+        if regressions:
+            sys.exit(1)
+        print(f"\nNo p50 regressions beyond {args.threshold}x against {args.compare}")
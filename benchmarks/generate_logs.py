@@ -0,0 +1,87 @@
+"""
+Writes synthetic emotion_log.txt and chat_history.txt files in the exact
+formats produced by emotion.py's log_transition and src/chatbot.js's
+appendToHistoryFile, for benchmarking at realistic sizes:
+
+    python benchmarks/generate_logs.py --transitions 100000 --sessions 10000 --output /tmp/joyna-100k
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+
+EMOTIONS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+
+# Rough shape of the bundled log: mostly happy, surprise and neutral
+EMOTION_WEIGHTS = (3, 1, 2, 30, 3, 30, 31)
+
+TOPICS = ('friends', 'school', 'headlights', 'favorite colors', 'animals', 'a scary dream', 'apples',
+          'shoes', 'games', 'family', 'drawing', 'the park', 'dinosaurs', 'music', 'space')
+MOODS = ('happy and engaged', 'curious', 'quiet but receptive', 'excited', 'a little scared',
+         'tired', 'playful', 'neutral')
+
+START = datetime(2024, 1, 1, 8, 0, 0)
+
+
+def transition_lines(count, days, seed=0):
+    """Yields `count` log_transition lines spread in time order over `days` days."""
+    rng = random.Random(seed)
+    step = days * 86400 / max(count, 1)
+    current = rng.choices(EMOTIONS, EMOTION_WEIGHTS)[0]
+    for i in range(count):
+        timestamp = START + timedelta(seconds=int(i * step))
+        following = rng.choices(EMOTIONS, EMOTION_WEIGHTS)[0]
+        scores = {emotion: round(rng.random() * 0.5, 2) for emotion in EMOTIONS}
+        scores[following] = round(0.5 + rng.random() * 0.5, 2)
+        yield (
+            f"Date: {timestamp.strftime('%Y-%m-%d')} | "
+            f"Time: {timestamp.strftime('%H:%M:%S')} | "
+            f"Transition: {current} -> {following} | "
+            f"Duration: {rng.random() * 3:.2f}s | "
+            f"Scores: {scores}\n"
+        )
+        current = following
+
+
+def history_blocks(count, days, seed=0):
+    """Yields `count` 'Timestamp:' blocks spread in time order over `days` days."""
+    rng = random.Random(seed + 1)
+    step = days * 86400 / max(count, 1)
+    for i in range(count):
+        timestamp = START + timedelta(seconds=int(i * step))
+        hour = timestamp.hour % 12 or 12
+        stamp = (f"{timestamp.month}/{timestamp.day}/{timestamp.year}, "
+                 f"{hour}:{timestamp.minute:02d}:{timestamp.second:02d} {'AM' if timestamp.hour < 12 else 'PM'}")
+        first, second = rng.sample(TOPICS, 2)
+        summary = (
+            f"The child wanted to talk about {first} and then {second}. "
+            f"Their mood seemed {rng.choice(MOODS)}, and Joyna responded with encouraging questions "
+            f"about {first}, prompting the child to share more about their experiences."
+        )
+        yield f"Timestamp: {stamp}\n{summary}\n\n"
+
+
+def write_logs(directory, transitions, sessions, days=None, seed=0):
+    """Writes both files into `directory`; by default about 40 transitions per day."""
+    os.makedirs(directory, exist_ok=True)
+    days = days or max(transitions // 40, 1)
+    with open(os.path.join(directory, 'emotion_log.txt'), 'w') as file:
+        file.writelines(transition_lines(transitions, days, seed))
+    with open(os.path.join(directory, 'chat_history.txt'), 'w', encoding='utf-8') as file:
+        file.write('\n\n')
+        file.writelines(history_blocks(sessions, days, seed))
+    return days
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic Joyna log files.")
+    parser.add_argument('--transitions', type=int, default=1000, help="lines in emotion_log.txt")
+    parser.add_argument('--sessions', type=int, default=None, help="blocks in chat_history.txt (default: transitions / 10)")
+    parser.add_argument('--days', type=int, default=None, help="days the history spans (default: transitions / 40)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', required=True, help="directory to write the files into")
+    args = parser.parse_args()
+
+    sessions = args.sessions if args.sessions is not None else max(args.transitions // 10, 1)
+    days = write_logs(args.output, args.transitions, sessions, args.days, args.seed)
+    print(f"Wrote {args.transitions} transitions and {sessions} sessions over {days} days to {args.output}")
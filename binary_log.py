@@ -0,0 +1,274 @@
+"""
+Fixed-width binary emotion log.
+
+Every transition is one packed 28-byte record after a 16-byte header:
+
+    timestamp  int64    local wall-clock seconds since 1970-01-01
+    from       uint8    EMOTIONS code of the previous emotion (255 if unknown)
+    to         uint8    EMOTIONS code of the new emotion (255 if unknown)
+    duration   float32  seconds spent in the previous emotion
+    scores     7 x uint16  scores in EMOTIONS order, quantized by SCORE_SCALE
+
+Records are normally appended in time order, so the file can be memory-mapped as a
+NumPy structured array and searched by timestamp without parsing.
+
+Convert an existing text log with:
+
+    python binary_log.py emotion_log.txt emotion_log.bin
+"""
+import argparse
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from log_store import EMOTIONS, EMOTION_INDEX, parse_log_line, parse_transition, scores_vector
+
+# Default binary log next to emotion_log.txt
+BINARY_LOG_FILE = 'emotion_log.bin'
+
+# Which log(s) emotion.py writes and main.py reads: text, binary, both or sqlite
+LOG_FORMAT = os.environ.get('JOYNA_LOG_FORMAT', 'text')
+
+MAGIC = b'JOYNAEL1'
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('from', 'u1'),
+    ('to', 'u1'),
+    ('duration', '<f4'),
+    ('scores', '<u2', (len(EMOTIONS),)),
+])
+HEADER = MAGIC + np.uint32(RECORD_DTYPE.itemsize).tobytes() + bytes(4)
+HEADER_SIZE = len(HEADER)
+
+SCORE_SCALE = 10000
+UNKNOWN_EMOTION = 255
+SECONDS_PER_DAY = 86400
+
+
+def emotion_code(emotion):
+    return EMOTION_INDEX.get(emotion, UNKNOWN_EMOTION)
+
+
+def wall_clock_seconds(timestamp):
+    """Seconds since 1970-01-01 of a naive local datetime, so day boundaries follow the logged dates."""
+    return int((timestamp - datetime(1970, 1, 1)).total_seconds())
+
+
+def encode_record(from_emotion, to_emotion, duration, scores, timestamp):
+    """Packs one transition into a single-record structured array."""
+    record = np.zeros(1, dtype=RECORD_DTYPE)
+    record['timestamp'] = wall_clock_seconds(timestamp)
+    record['from'] = emotion_code(from_emotion)
+    record['to'] = emotion_code(to_emotion)
+    record['duration'] = duration
+    record['scores'] = quantize_scores([scores_vector(scores)])
+    return record
+
+
+def quantize_scores(scores):
+    scaled = np.rint(np.asarray(scores, dtype=np.float64) * SCORE_SCALE)
+    return np.clip(scaled, 0, np.iinfo(np.uint16).max).astype(np.uint16)
+
+
+def append_records(path, records):
+    """Appends structured records, writing the header first if the file is new."""
+    with open(path, 'ab') as file:
+        if file.tell() == 0:
+            file.write(HEADER)
+        file.write(np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+
+
+def append_transition(path, from_emotion, to_emotion, duration, scores, timestamp):
+    append_records(path, encode_record(from_emotion, to_emotion, duration, scores, timestamp))
+
+
+def parse_text_record(line):
+    """Parses a log_transition text line into a structured record, or None if malformed."""
+    parsed = parse_log_line(line)
+    if parsed is None:
+        return None
+    date_part, time_part, scores_dict = parsed
+    try:
+        timestamp = datetime.strptime(f"{date_part} {time_part}", '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+    from_emotion, to_emotion, duration = parse_transition(line)
+    return encode_record(from_emotion, to_emotion, duration, scores_dict, timestamp)
+
+
+def convert_text_log(source, destination):
+    """
+    Converts a text emotion log into the binary format, sorted by timestamp.
+    Returns (converted, skipped) line counts.
+    """
+    records = []
+    skipped = 0
+    with open(source, 'r', encoding='utf-8', errors='replace') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = parse_text_record(line)
+            if record is None:
+                skipped += 1
+                continue
+            records.append(record)
+
+    table = np.concatenate(records) if records else np.zeros(0, dtype=RECORD_DTYPE)
+    table = table[np.argsort(table['timestamp'], kind='stable')]
+    with open(destination, 'wb') as file:
+        file.write(HEADER)
+        file.write(table.tobytes())
+    return len(table), skipped
+
+
+class BinaryEmotionLog:
+    """
+    Memory-mapped reader for the binary log with the same interface as
+    EmotionLogStore. Nothing is parsed: refresh() only remaps the file when
+    it has grown, and a date lookup is a binary search over the timestamp
+    column. If records were appended out of time order (e.g. by batch
+    re-scoring of older recordings), a sorted permutation and the
+    timestamps in that order are kept and the search runs over those
+    instead; records appended later are sorted on their own and merged in.
+    """
+
+    def __init__(self, path=BINARY_LOG_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self.generation = 0
+        self._reset()
+
+    def _reset(self):
+        self._inode = None
+        self.available = False
+        self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self._order = None  # sorting permutation, only when records are out of time order
+        self._sorted = None  # timestamps in _order
+        self.generation += 1
+
+    def __len__(self):
+        return len(self.records)
+
+    def refresh(self):
+        """Maps records appended since the last refresh. Returns the number of new rows."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self.available:
+                    self._reset()
+                return 0
+
+            count = max(stat.st_size - HEADER_SIZE, 0) // RECORD_DTYPE.itemsize
+            if count < len(self.records) or (self._inode is not None and stat.st_ino != self._inode):
+                self._reset()
+            if not self.available:
+                with open(self.path, 'rb') as file:
+                    header = file.read(HEADER_SIZE)
+                if header and header != HEADER:
+                    raise ValueError(f"{self.path} is not a binary emotion log")
+            self.available = True
+            self._inode = stat.st_ino
+
+            before = len(self.records)
+            if count == before:
+                return 0
+            self.records = np.memmap(self.path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+            # Only the new records and the boundary need checking to stay sorted
+            timestamps = self.records['timestamp']
+            tail = timestamps[max(before - 1, 0):]
+            if self._order is None and np.any(tail[1:] < tail[:-1]):
+                # Everything before the new records was in order
+                self._order = np.arange(before)
+                self._sorted = np.array(timestamps[:before])
+            if self._order is not None:
+                self._merge(before)
+            return count - before
+
+    def _merge(self, start):
+        """Merges the records from index `start` into the sorted permutation, after equal timestamps."""
+        timestamps = self.records['timestamp']
+        new_order = np.argsort(timestamps[start:], kind='stable') + start
+        new_sorted = timestamps[new_order]
+        positions = np.searchsorted(self._sorted, new_sorted, side='right')
+        self._order = np.insert(self._order, positions, new_order)
+        self._sorted = np.insert(self._sorted, positions, new_sorted)
+
+    def _between(self, first, stop):
+        """Row range [start, stop) of the time-ordered records with timestamps from `first` up to `stop`."""
+        timestamps = self.records['timestamp'] if self._order is None else self._sorted
+        return np.searchsorted(timestamps, [first, stop])
+
+    @staticmethod
+    def _columns(records):
+        timestamps = records['timestamp']
+        days = (timestamps // SECONDS_PER_DAY).astype(np.int32)
+        seconds = (timestamps % SECONDS_PER_DAY).astype(np.int32)
+        scores = records['scores'].astype(np.float32) / SCORE_SCALE
+        return days, seconds, scores
+
+    @property
+    def days(self):
+        return self._columns(self.records)[0]
+
+    @property
+    def seconds(self):
+        return self._columns(self.records)[1]
+
+    @property
+    def scores(self):
+        return self._columns(self.records)[2]
+
+    def rows_since(self, start):
+        """Returns (days, seconds, scores) for rows from index `start` to the end."""
+        with self._lock:
+            return self._columns(self.records[start:])
+
+    def rows_for_date(self, date_str):
+        """Returns (seconds, scores) arrays for the rows logged on a YYYY-MM-DD date."""
+        with self._lock:
+            try:
+                first = wall_clock_seconds(datetime.strptime(date_str, '%Y-%m-%d'))
+            except ValueError:
+                first = None
+            if first is None or len(self.records) == 0:
+                return np.empty(0, dtype=np.int32), np.empty((0, len(EMOTIONS)), dtype=np.float32)
+            start, stop = self._between(first, first + SECONDS_PER_DAY)
+            if self._order is None:
+                rows = self.records[start:stop]
+            else:
+                rows = self.records[np.sort(self._order[start:stop])]
+            _, seconds, scores = self._columns(rows)
+            return seconds, scores
+
+    def count_for_date(self, date_str):
+        """Returns the number of rows logged on a YYYY-MM-DD date."""
+        with self._lock:
+            try:
+                first = wall_clock_seconds(datetime.strptime(date_str, '%Y-%m-%d'))
+            except ValueError:
+                return 0
+            start, stop = self._between(first, first + SECONDS_PER_DAY)
+            return int(stop - start)
+
+    def days_between(self, first=None, last=None):
+        """Returns the sorted logged day numbers from `first` to `last` inclusive; None leaves a side open."""
+        with self._lock:
+            timestamps = self.records['timestamp'] if self._order is None else self._sorted
+            start, stop = self._between(
+                first * SECONDS_PER_DAY if first is not None else np.iinfo(np.int64).min,
+                (last + 1) * SECONDS_PER_DAY if last is not None else np.iinfo(np.int64).max,
+            )
+            return np.unique(timestamps[start:stop] // SECONDS_PER_DAY).tolist()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert a text emotion log to the binary format.")
+    parser.add_argument('source', nargs='?', default='emotion_log.txt')
+    parser.add_argument('destination', nargs='?', default=BINARY_LOG_FILE)
+    args = parser.parse_args()
+    converted, skipped = convert_text_log(args.source, args.destination)
+    print(f"Converted {converted} transitions to {args.destination} ({skipped} malformed lines skipped)")
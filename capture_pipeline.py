@@ -0,0 +1,222 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class LatestFrameQueue:
+    """
+    Bounded hand-off between capture and inference that always keeps the
+    freshest frames: when full, the oldest waiting frame is dropped.
+    """
+
+    def __init__(self, maxsize=1):
+        self._items = deque(maxlen=maxsize)
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._condition:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Returns the oldest waiting item, or None if nothing arrived within `timeout`."""
+        with self._condition:
+            if not self._items:
+                self._condition.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def wake_all(self):
+        with self._condition:
+            self._condition.notify_all()
+
+
+class RateMeter:
+    """Events per second over a sliding window of recent timestamps."""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self._times = deque()
+        self.total = 0
+
+    def tick(self, now):
+        self.total += 1
+        self._times.append(now)
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+
+    def rate(self, now):
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+        return len(self._times) / self.window
+
+
+class PipelineStats:
+    """Capture FPS, inference FPS and capture-to-result latency of a running pipeline."""
+
+    def __init__(self, latency_samples=200):
+        self._lock = threading.Lock()
+        self.capture = RateMeter()
+        self.inference = RateMeter()
+        self.latencies = deque(maxlen=latency_samples)
+        self.stale_results = 0
+
+    def frame_captured(self, now):
+        with self._lock:
+            self.capture.tick(now)
+
+    def frame_inferred(self, captured_at, now):
+        with self._lock:
+            self.inference.tick(now)
+            self.latencies.append(now - captured_at)
+
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            latencies = sorted(self.latencies)
+            return {
+                'capture_fps': self.capture.rate(now),
+                'inference_fps': self.inference.rate(now),
+                'latency_ms': 1000 * latencies[len(latencies) // 2] if latencies else 0.0,
+                'latency_p95_ms': 1000 * latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+                'frames_captured': self.capture.total,
+                'frames_inferred': self.inference.total,
+                'stale_results': self.stale_results,
+            }
+
+    def describe(self, now=None):
+        stats = self.snapshot(now)
+        return (
+            f"capture {stats['capture_fps']:.1f} fps | inference {stats['inference_fps']:.1f} fps | "
+            f"latency {stats['latency_ms']:.0f} ms (p95 {stats['latency_p95_ms']:.0f} ms)"
+        )
+
+
+class CapturePipeline:
+    """
+    Runs capture, inference and rendering as separate stages.
+
+    A capture thread reads frames as fast as the camera delivers them and
+    hands them to the inference workers through a LatestFrameQueue, so a
+    slow classifier drops stale frames instead of stalling capture. Each
+    worker owns one detector. Results are applied to the tracker in capture
+    order (late results from a slower worker are discarded), and the render
+    stage runs on the calling thread because cv2.imshow must stay there.
+    """
+
+    def __init__(self, cap, detectors, tracker, queue_size=1, annotate=None, window_name="Emotion Detection"):
+        self.cap = cap
+        self.detectors = list(detectors)
+        self.tracker = tracker
+        self.annotate = annotate
+        self.window_name = window_name
+        self.frames = LatestFrameQueue(queue_size)
+        self.stats = PipelineStats()
+        self._stop = threading.Event()
+        self._latest = None  # (sequence, captured_at, frame) for the render stage
+        self._latest_lock = threading.Lock()
+        self._applied_sequence = -1
+        self._tracker_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._capture_loop, name="capture", daemon=True)]
+        for number, detector in enumerate(self.detectors):
+            self._threads.append(
+                threading.Thread(target=self._inference_loop, args=(detector,), name=f"inference-{number}", daemon=True)
+            )
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.frames.wake_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def _capture_loop(self):
+        sequence = 0
+        while not self._stop.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                print("Error: Failed to capture frame.")
+                self._stop.set()
+                break
+            captured_at = time.time()
+            self.stats.frame_captured(captured_at)
+            item = (sequence, captured_at, frame)
+            with self._latest_lock:
+                self._latest = item
+            self.frames.put(item)
+            sequence += 1
+        self.frames.wake_all()
+
+    def _inference_loop(self, detector):
+        while not self._stop.is_set():
+            item = self.frames.get(timeout=0.1)
+            if item is None:
+                continue
+            sequence, captured_at, frame = item
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            emotions = detector.detect_emotions(rgb_frame)
+            self.stats.frame_inferred(captured_at, time.time())
+
+            with self._tracker_lock:
+                if sequence < self._applied_sequence:
+                    self.stats.stale_results += 1
+                    continue
+                self._applied_sequence = sequence
+                self.tracker.update(emotions, captured_at)
+
+    def render(self, report_every=5.0):
+        """Shows the freshest frame until 'q' is pressed or capture ends, printing stats periodically."""
+        last_report = time.time()
+        shown = -1
+        while not self._stop.is_set():
+            with self._latest_lock:
+                latest = self._latest
+            if latest is not None and latest[0] != shown:
+                shown, _, frame = latest
+                frame = frame.copy()
+                if self.annotate is not None:
+                    with self._tracker_lock:
+                        self.annotate(frame, self.tracker)
+                cv2.putText(frame, self.stats.describe(), (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+                cv2.imshow(self.window_name, frame)
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+            now = time.time()
+            if now - last_report >= report_every:
+                print(f"Pipeline: {self.stats.describe(now)} | dropped {self.frames.dropped}")
+                last_report = now
+
+    def run(self):
+        """
+        Starts the stages, renders until exit and returns the final stats,
+        with the frame rates averaged over the whole run rather than the
+        last few seconds.
+        """
+        began = time.time()
+        self.start()
+        try:
+            self.render()
+        finally:
+            self.stop()
+        elapsed = time.time() - began
+        stats = self.stats.snapshot()
+        stats['frames_dropped'] = self.frames.dropped
+        stats['capture_fps'] = stats['frames_captured'] / elapsed if elapsed else 0.0
+        stats['inference_fps'] = stats['frames_inferred'] / elapsed if elapsed else 0.0
+        return stats
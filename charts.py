@@ -0,0 +1,178 @@
+"""
+Headless chart rendering.
+
+Charts are drawn with matplotlib's Agg canvas on a Figure of their own,
+never through pyplot, so no window or display is needed and renders on
+different threads share no state. matplotlib itself is only imported by
+the thread or process that draws, which keeps it out of the startup of
+the dashboard and of emotion.py.
+
+ChartRenderer draws on one background thread by default, or in spawned
+worker processes (`processes=N`, JOYNA_CHART_PROCESSES). Finished images
+are remembered by their content, so a chart whose data has not changed is
+never drawn twice; the dashboard puts HTTP caching keyed by the log
+versions in front of that.
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Worker processes for the dashboard's renderer; 0 draws on a thread instead
+CHART_PROCESSES = int(os.environ.get('JOYNA_CHART_PROCESSES', '0') or 0)
+
+VALENCE_TICKS = {-1: 'Negative', 0: 'Neutral', 1: 'Positive'}
+
+
+def _valence_chart(figure, labels, values, title):
+    axes = figure.add_subplot()
+    axes.plot(range(len(values)), values, color='#ff9eaa', marker='o', markersize=3, linewidth=1.5)
+    axes.fill_between(range(len(values)), values, color='#ff9eaa', alpha=0.1)
+    axes.set_ylim(-1.1, 1.1)
+    axes.set_yticks(list(VALENCE_TICKS), list(VALENCE_TICKS.values()))
+    # At most a dozen date labels, however long the range
+    step = max(len(labels) // 12, 1)
+    axes.set_xticks(range(0, len(labels), step), labels[::step], rotation=45, ha='right', fontsize=8)
+    axes.grid(axis='y', alpha=0.3)
+    axes.set_title(title)
+
+
+def _distribution_chart(figure, labels, values, title):
+    from matplotlib import colormaps
+
+    axes = figure.add_subplot()
+    axes.pie(values, labels=labels, autopct='%1.1f%%', startangle=140, colors=colormaps['Paired'].colors)
+    axes.set_title(title)
+    axes.axis('equal')  # Equal aspect ratio ensures the pie chart is circular.
+
+
+CHART_KINDS = {
+    'valence': (_valence_chart, (8, 4)),
+    'distribution': (_distribution_chart, (8, 8)),
+}
+
+
+def render_chart(kind, labels, values, title=''):
+    """Draws one chart and returns it as PNG bytes."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    draw, size = CHART_KINDS[kind]
+    figure = Figure(figsize=size, dpi=100)
+    FigureCanvasAgg(figure)
+    draw(figure, list(labels), list(values), title)
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def save_chart(path, kind, labels, values, title=''):
+    with open(path, 'wb') as file:
+        file.write(render_chart(kind, labels, values, title))
+    return path
+
+
+def start_saving_chart(path, kind, labels, values, title=''):
+    """
+    Draws a chart into `path` in a separate interpreter and returns its
+    Popen, so the caller neither imports matplotlib nor waits for it. A
+    plain `python charts.py` child, unlike a multiprocessing one, does not
+    re-import the caller's main module (and with it the emotion model).
+    """
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__)], stdin=subprocess.PIPE)
+    process.stdin.write(json.dumps({'path': path, 'kind': kind, 'labels': list(labels),
+                                    'values': list(values), 'title': title}).encode())
+    process.stdin.close()
+    return process
+
+
+class ChartRenderer:
+    """
+    Renders charts off the request threads and remembers the last
+    `max_entries` of them by content. Requests for a chart that is being
+    drawn wait for that render instead of starting another.
+    """
+
+    def __init__(self, processes=CHART_PROCESSES, max_entries=64):
+        self.processes = max(int(processes), 0)
+        self.max_entries = max_entries
+        self._executor = None
+        self._pid = None
+        self._images = OrderedDict()  # content key -> Future of PNG bytes
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.hits = 0
+        self.failures = 0
+
+    def _pool(self):
+        if self._pid != os.getpid():
+            # A worker forked after a preloading warm-up: the pool stayed in the
+            # parent, along with whatever it was still drawing
+            self._executor = None
+            self._pid = os.getpid()
+            for key in [key for key, future in self._images.items() if not future.done()]:
+                del self._images[key]
+        if self._executor is None:
+            if self.processes:
+                self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._executor = ThreadPoolExecutor(1, thread_name_prefix='charts')
+        return self._executor
+
+    @staticmethod
+    def key(kind, labels, values, title=''):
+        content = json.dumps([kind, title, list(labels), list(values)], separators=(',', ':'))
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def submit(self, kind, labels, values, title=''):
+        """Queues a render unless the same chart is cached or in flight; returns its Future."""
+        key = self.key(kind, labels, values, title)
+        with self._lock:
+            pool = self._pool()
+            future = self._images.get(key)
+            if future is not None and not (future.done() and future.exception() is not None):
+                self._images.move_to_end(key)
+                self.hits += 1
+                return future
+            self.renders += 1
+            future = pool.submit(render_chart, kind, list(labels), list(values), title)
+            self._images[key] = future
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return future
+
+    def render(self, kind, labels, values, title='', timeout=60):
+        """PNG bytes of a chart, drawn in the background if it is not cached yet."""
+        try:
+            return self.submit(kind, labels, values, title).result(timeout)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+
+    def close(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._images),
+                'renders': self.renders,
+                'hits': self.hits,
+                'failures': self.failures,
+            }
+
+
+if __name__ == '__main__':
+    # start_saving_chart's child: one chart described as JSON on stdin
+    spec = json.load(sys.stdin)
+    save_chart(spec['path'], spec['kind'], spec['labels'], spec['values'], spec.get('title', ''))
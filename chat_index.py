@@ -0,0 +1,149 @@
+import os
+import threading
+
+# Default history appended by src/chatbot.js
+CHAT_HISTORY_FILE = 'chat_history.txt'
+
+BLOCK_MARKER = b'Timestamp: '
+
+
+def parse_block(raw):
+    """
+    Splits one 'Timestamp: ...' block into (timestamp, summary).
+    Returns None if the block has no summary line.
+    """
+    text = raw.decode('utf-8', errors='replace')
+    if text.startswith(BLOCK_MARKER.decode()):
+        text = text[len(BLOCK_MARKER):]
+    lines = text.strip().split('\n', 1)
+    if len(lines) < 2:
+        return None
+    return lines[0].strip(), lines[1].strip()
+
+
+class ChatHistoryIndex:
+    """
+    Byte-offset index of the 'Timestamp:' blocks in chat_history.txt.
+
+    Only the bytes appended since the last refresh() are scanned. Each block
+    is remembered by its start offset and keyed by its M/D/YYYY date, so a
+    date lookup seeks straight to its blocks and the tail of the history can
+    be read without touching the rest of the file.
+    """
+
+    def __init__(self, path=CHAT_HISTORY_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self.generation = 0
+        self._reset()
+
+    def _reset(self):
+        self._scanned = 0
+        self._inode = None
+        self.available = False
+        self.offsets = []      # block start offsets, in file order
+        self.timestamps = []   # raw timestamp line of each block
+        self._date_index = {}  # M/D/YYYY -> list of block numbers
+        self.generation += 1
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def refresh(self):
+        """
+        Indexes blocks appended since the last refresh. Returns the number of new blocks.
+        Starts over if the file was truncated or replaced.
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self.available or self._scanned:
+                    self._reset()
+                return 0
+
+            if stat.st_size < self._scanned or (self._inode is not None and stat.st_ino != self._inode):
+                self._reset()
+            self.available = True
+            self._inode = stat.st_ino
+            if stat.st_size == self._scanned:
+                return 0
+
+            with open(self.path, 'rb') as file:
+                file.seek(self._scanned)
+                chunk = file.read(stat.st_size - self._scanned)
+
+            # Only index complete lines; the rest is picked up next time
+            end = chunk.rfind(b'\n') + 1
+            if end == 0:
+                return 0
+
+            added = self._index_lines(chunk[:end], self._scanned)
+            self._scanned += end
+            return added
+
+    def _index_lines(self, chunk, start):
+        """Adds the blocks starting in `chunk`, complete lines read from offset `start`. Returns how many."""
+        before = len(self.offsets)
+        position = start
+        for line in chunk.splitlines(keepends=True):
+            if line.startswith(BLOCK_MARKER):
+                timestamp = line[len(BLOCK_MARKER):].decode('utf-8', errors='replace').strip()
+                self._add_block(position, timestamp)
+            position += len(line)
+        return len(self.offsets) - before
+
+    def _add_block(self, offset, timestamp):
+        block = len(self.offsets)
+        self.offsets.append(offset)
+        self.timestamps.append(timestamp)
+        block_date = timestamp.split(',')[0].strip()
+        self._date_index.setdefault(block_date, []).append(block)
+
+    def _block_end(self, block):
+        if block + 1 < len(self.offsets):
+            return self.offsets[block + 1]
+        return self._scanned
+
+    def read_blocks(self, blocks):
+        """
+        Returns the (timestamp, summary) of each block number in `blocks`, in
+        the same order; None for a block without a summary.
+        """
+        with self._lock:
+            entries = []
+            with open(self.path, 'rb') as file:
+                for block in blocks:
+                    start = self.offsets[block]
+                    file.seek(start)
+                    entries.append(parse_block(file.read(self._block_end(block) - start)))
+            return entries
+
+    def blocks_for_date(self, date):
+        """Returns the (timestamp, summary) blocks logged on an M/D/YYYY date."""
+        with self._lock:
+            blocks = self._date_index.get(date)
+            if not blocks:
+                return []
+            return [entry for entry in self.read_blocks(blocks) if entry is not None]
+
+    def count_for_date(self, date):
+        """Returns the number of blocks logged on an M/D/YYYY date."""
+        with self._lock:
+            return len(self._date_index.get(date, ()))
+
+    def recent(self, count):
+        """Returns the last `count` (timestamp, summary) blocks, reading only the file tail."""
+        with self._lock:
+            if not self.offsets or count <= 0:
+                return []
+            first = max(len(self.offsets) - count, 0)
+            return [entry for entry in self.read_blocks(range(first, len(self.offsets))) if entry is not None]
+
+    def dates(self):
+        """Returns the distinct M/D/YYYY dates that have at least one block."""
+        with self._lock:
+            return list(self._date_index)
+
+    def day_count(self):
+        return len(self._date_index)
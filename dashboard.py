@@ -0,0 +1,89 @@
+import threading
+
+import numpy as np
+
+from log_store import EMOTIONS, POSITIVE_MASK, dominant_indices
+
+
+class DashboardAggregates:
+    """
+    Running totals behind the home page.
+
+    Counters are folded forward from the rows and blocks that the emotion
+    log store and chat history index absorbed since the previous update, so
+    rendering the dashboard does not depend on how long the history is.
+    """
+
+    def __init__(self, emotion_store, chat_index, recent_count=5):
+        self.emotion_store = emotion_store
+        self.chat_index = chat_index
+        self.recent_count = recent_count
+        self._lock = threading.Lock()
+        self._reset_emotions()
+        self._reset_chats()
+
+    def _reset_emotions(self):
+        self._emotion_generation = self.emotion_store.generation
+        self._rows_seen = 0
+        self.emotion_counts = np.zeros(len(EMOTIONS), dtype=np.int64)
+
+    def _reset_chats(self):
+        self._chat_generation = self.chat_index.generation
+        self._blocks_seen = 0
+        self.active_days = set()
+        self._recent = []
+        self._recent_at = None
+
+    def update(self):
+        """Folds newly appended log rows and chat blocks into the counters."""
+        with self._lock:
+            self.emotion_store.refresh()
+            self.chat_index.refresh()
+
+            if self.emotion_store.generation != self._emotion_generation:
+                self._reset_emotions()
+            _, _, scores = self.emotion_store.rows_since(self._rows_seen)
+            self.emotion_counts += np.bincount(dominant_indices(scores), minlength=len(EMOTIONS))
+            self._rows_seen += len(scores)
+
+            if self.chat_index.generation != self._chat_generation:
+                self._reset_chats()
+            # Another request may refresh the index meanwhile; stop where this pass started
+            stop = len(self.chat_index)
+            for timestamp in self.chat_index.timestamps[self._blocks_seen:stop]:
+                self.active_days.add(timestamp.split(',')[0].strip())
+            self._blocks_seen = stop
+
+            # The recent activity list only changes when a block is appended
+            if self._recent_at != self._blocks_seen:
+                self._recent = [
+                    {'time': timestamp, 'summary': summary}
+                    for timestamp, summary in self.chat_index.recent(self.recent_count)
+                ]
+                self._recent_at = self._blocks_seen
+
+    @property
+    def total_interactions(self):
+        return self._blocks_seen
+
+    @property
+    def positive_count(self):
+        return int(self.emotion_counts[POSITIVE_MASK].sum())
+
+    @property
+    def positive_percentage(self):
+        total_count = self._rows_seen
+        percentage = (self.positive_count / total_count * 100) if total_count > 0 else 0
+        return round(percentage, 2)
+
+    def snapshot(self):
+        """Returns the current dashboard figures after absorbing any new data."""
+        self.update()
+        with self._lock:
+            return {
+                'total_interactions': self.total_interactions,
+                'positive_percentage': self.positive_percentage,
+                'active_days': len(self.active_days),
+                'recent_activities': list(self._recent),
+                'emotion_counts': dict(zip(EMOTIONS, self.emotion_counts.tolist())),
+            }
@@ -1,66 +1,137 @@
 import cv2
 import numpy as np
 from fer import FER
-from collections import deque, Counter
+from collections import Counter
 import time
 from datetime import datetime
-import matplotlib.pyplot as plt
 import os
+import argparse
+import functools
+from binary_log import append_transition, BINARY_LOG_FILE, LOG_FORMAT
+from capture_pipeline import CapturePipeline
+from face_tracker import TrackedFaceDetector, TRACKER_FACTORIES
+from frame_gate import FrameGate
+from emotion_window import EmotionWindow
+from transition_debounce import TransitionDebouncer
+from transition_logger import TransitionLogWriter, format_log_entry
+from live_channel import LivePublisher
+from charts import start_saving_chart
+from multi_camera import BatchedEmotionService, CameraStream, MultiSourceCapture, parse_sources
+from segments import SEGMENT_PERIOD, SegmentWriter, segment_directory
+import sqlite_store
 
-# Initialize the emotion detector
-detector = FER(mtcnn=True)
-
-# Initialize webcam
-cap = cv2.VideoCapture(0)
-
-# Check if webcam is opened successfully
-if not cap.isOpened():
-    print("Error: Could not open webcam.")
-    exit()
-
-# Log file
+# Log file(s); JOYNA_LOG_FORMAT selects text, binary, both or sqlite
 log_file = "emotion_log.txt"
+binary_log_file = BINARY_LOG_FILE
+database_file = sqlite_store.DATABASE_FILE
 output_folder = "emotion_session_data"
-os.makedirs(output_folder, exist_ok=True)
-
-# Variables for logging and session analysis
-emotion_history = deque(maxlen=50)  # Stores emotions for ~5 seconds (assuming ~10 FPS)
-current_emotion = None
-emotion_start_time = None
-session_emotions = Counter()  # To track emotion distribution for the session
+# With JOYNA_LOG_SEGMENTS=daily or monthly the text log is a directory of segments
+text_segments = SegmentWriter(segment_directory(log_file), SEGMENT_PERIOD) if SEGMENT_PERIOD else None
 
-def log_transition(from_emotion, to_emotion, duration, scores, timestamp):
+def log_transition(from_emotion, to_emotion, duration, scores, timestamp, source=None):
     """
-    Logs a transition from one emotion to another.
+    Logs a transition from one emotion to another, tagged with the camera's source ID when there are several.
     """
-    with open(log_file, "a") as file:
-        log_entry = (
-            f"Date: {timestamp.strftime('%Y-%m-%d')} | "
-            f"Time: {timestamp.strftime('%H:%M:%S')} | "
-            f"Transition: {from_emotion} -> {to_emotion} | "
-            f"Duration: {duration:.2f}s | "
-            f"Scores: {scores}\n"
-        )
-        file.write(log_entry)
+    if LOG_FORMAT in ("text", "both") and text_segments is not None:
+        text_segments.write(timestamp, format_log_entry(from_emotion, to_emotion, duration, scores, timestamp, source))
+        text_segments.flush()
+    elif LOG_FORMAT in ("text", "both"):
+        with open(log_file, "a") as file:
+            file.write(format_log_entry(from_emotion, to_emotion, duration, scores, timestamp, source))
+    if LOG_FORMAT in ("binary", "both"):
+        append_transition(binary_log_file, from_emotion, to_emotion, duration, scores, timestamp)
+    if LOG_FORMAT == "sqlite":
+        sqlite_store.append_transition(database_file, from_emotion, to_emotion, duration, scores, timestamp, source)
 
 def plot_emotion_distribution(emotion_counter):
     """
-    Plots a pie chart of the emotion distribution for the session.
+    Starts drawing a pie chart of the emotion distribution for the session in a separate process,
+    so matplotlib is never loaded here. Returns (process, file path).
     """
-    labels = list(emotion_counter.keys())
-    sizes = list(emotion_counter.values())
-    plt.figure(figsize=(8, 8))
-    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140, colors=plt.cm.Paired.colors)
-    plt.title("Emotion Distribution for the Session")
-    plt.axis('equal')  # Equal aspect ratio ensures the pie chart is circular.
-    plt.tight_layout()
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     file_path = os.path.join(output_folder, f"emotion_distribution_{timestamp}.png")
-    plt.savefig(file_path)
-    print(f"Emotion distribution chart saved at: {file_path}")
-    plt.show()
+    process = start_saving_chart(file_path, 'distribution', list(emotion_counter.keys()),
+                                 list(emotion_counter.values()), "Emotion Distribution for the Session")
+    return process, file_path
+
+def show_chart(file_path):
+    """
+    Shows a saved chart until a key is pressed.
+    """
+    image = cv2.imread(file_path)
+    if image is not None:
+        cv2.imshow("Emotion Distribution", image)
+        cv2.waitKey(0)
+        cv2.destroyAllWindows()
+
+class EmotionTracker:
+    """
+    Transition and recent-emotion state for one video stream.
+    """
+
+    def __init__(self, log=log_transition, window_seconds=5.0, debouncer=None):
+        self.log = log
+        self.debouncer = debouncer  # Holds back flicker; None logs every change of the dominant emotion
+        self.emotion_history = EmotionWindow(window_seconds)  # Running score sums over the recent window
+        self.current_emotion = None
+        self.emotion_start_time = None
+        self.session_emotions = Counter()  # To track emotion distribution for the session
+
+    def update(self, emotions, now=None):
+        """
+        Records the detector output for one frame and logs a transition if the dominant emotion changed
+        (and, with a debouncer, the change has held up long enough to count).
+        """
+        if not emotions:
+            return
+        now = time.time() if now is None else now
+        emotion_scores = emotions[0]["emotions"]  # Get the emotion probabilities
+        dominant_emotion = max(emotion_scores, key=emotion_scores.get)
+        self.emotion_history.append(emotion_scores, now)
+        self.session_emotions[dominant_emotion] += 1  # Update session emotion count
+
+        # Check for emotion transition
+        if self.current_emotion is None:
+            self.current_emotion = dominant_emotion
+            self.emotion_start_time = now
+            return
+        if self.debouncer is None:
+            new_emotion, onset, scores = dominant_emotion, now, emotion_scores
+        else:
+            confirmed = self.debouncer.observe(self.current_emotion, emotion_scores, now)
+            new_emotion, onset, scores = confirmed if confirmed else (self.current_emotion, now, emotion_scores)
+        if self.current_emotion != new_emotion:
+            # Log the transition, dated from when the new emotion set in, with scores that show it
+            duration = onset - self.emotion_start_time
+            timestamp = datetime.fromtimestamp(onset)
+            self.log(
+                self.current_emotion, new_emotion, duration, scores, timestamp
+            )
+            # Update current emotion
+            self.current_emotion = new_emotion
+            self.emotion_start_time = onset
 
-try:
+    def recent_summary(self, now=None):
+        """
+        Returns (most frequent emotion, normalized scores) over the recent window, or None.
+        """
+        current_time = time.time() if now is None else now
+        return self.emotion_history.summary(current_time)
+
+def annotate_frame(frame, tracker):
+    """
+    Draws the recent emotion and scores onto the frame.
+    """
+    summary = tracker.recent_summary()
+    if summary:
+        most_frequent_emotion, normalized_scores = summary
+        text = f"Emotion: {most_frequent_emotion} | Scores: {normalized_scores}"
+        cv2.putText(frame, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+
+def run_sequential(cap, detector, tracker):
+    """
+    Captures, classifies and displays one frame at a time until 'q' is pressed.
+    """
     while True:
         ret, frame = cap.read()
         if not ret:
@@ -71,49 +142,10 @@ try:
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
         # Detect emotions in the frame
-        emotions = detector.detect_emotions(rgb_frame)
-        if emotions:
-            emotion_scores = emotions[0]["emotions"]  # Get the emotion probabilities
-            dominant_emotion = max(emotion_scores, key=emotion_scores.get)
-            emotion_history.append((dominant_emotion, emotion_scores, time.time()))
-            session_emotions[dominant_emotion] += 1  # Update session emotion count
-
-            # Check for emotion transition
-            if current_emotion is None:
-                current_emotion = dominant_emotion
-                emotion_start_time = time.time()
-            elif current_emotion != dominant_emotion:
-                # Log the transition
-                duration = time.time() - emotion_start_time
-                timestamp = datetime.now()
-                log_transition(
-                    current_emotion, dominant_emotion, duration, emotion_scores, timestamp
-                )
-                # Update current emotion
-                current_emotion = dominant_emotion
-                emotion_start_time = time.time()
-
-        # Calculate emotions for the past 5 seconds
-        current_time = time.time()
-        recent_emotions = [e for e in emotion_history if current_time - e[2] <= 5]
-
-        if recent_emotions:
-            # Aggregate the scores over the past 5 seconds
-            aggregated_scores = {}
-            for _, scores, _ in recent_emotions:
-                for emotion, score in scores.items():
-                    aggregated_scores[emotion] = aggregated_scores.get(emotion, 0) + score
-
-            # Normalize the scores
-            total_scores = sum(aggregated_scores.values())
-            normalized_scores = {k: v / total_scores for k, v in aggregated_scores.items()}
-
-            # Determine the most frequent emotion
-            most_frequent_emotion = max(normalized_scores, key=normalized_scores.get)
-
-            # Display the emotion and scores
-            text = f"Emotion: {most_frequent_emotion} | Scores: {normalized_scores}"
-            cv2.putText(frame, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        tracker.update(detector.detect_emotions(rgb_frame))
+
+        # Display the emotion and scores for the recent window
+        annotate_frame(frame, tracker)
 
         # Display the video feed
         cv2.imshow("Emotion Detection", frame)
@@ -121,11 +153,212 @@ try:
         # Exit on pressing 'q'
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
-finally:
-    # Release the resources
-    cap.release()
-    cv2.destroyAllWindows()
-
-    # Plot and save emotion distribution
-    if session_emotions:
-        plot_emotion_distribution(session_emotions)
+
+def build_detector(args):
+    """
+    Creates the emotion detector, wrapped in detect-then-track mode when --track-every is set,
+    behind a FrameGate that skips static frames and crops to the face.
+    """
+    detector = FER(mtcnn=True)
+    roi_size = args.roi_size
+    if args.track_every > 0:
+        detector = TrackedFaceDetector(detector, redetect_every=args.track_every,
+                                       min_confidence=args.redetect_threshold, tracker=args.tracker)
+        # The tracker follows the face in full-frame coordinates, so it must see whole frames
+        roi_size = 0
+    return FrameGate(detector, motion_threshold=args.motion_threshold,
+                     max_static_frames=args.max_static_frames, roi_margin=args.roi_margin, roi_size=roi_size)
+
+def report_gate(detectors):
+    """
+    Prints how many model calls the frame gates saved against classifying every frame once.
+    """
+    stats = [detector.stats() for detector in detectors]
+    frames = sum(s['frames'] for s in stats)
+    calls = sum(s['inferences'] for s in stats)
+    if frames:
+        print(
+            f"Frame gate: {frames} frames, {sum(s['skipped'] for s in stats)} reused the previous scores, "
+            f"ran {calls} model calls, saved {frames - calls} ({(frames - calls) / frames:.0%}); "
+            f"{sum(s['roi_inferences'] for s in stats)} on the face region, "
+            f"{sum(s['roi_misses'] for s in stats)} of them retried on the full frame"
+        )
+
+def build_debouncer(args):
+    """
+    Creates the transition debouncer for one tracker.
+    """
+    return TransitionDebouncer(min_dwell=args.min_dwell, margin=args.score_margin,
+                               vote_window=args.vote_window, majority=args.majority)
+
+def report_debounce(trackers):
+    """
+    Prints how many frame-to-frame emotion changes the debouncers kept out of the log.
+    """
+    stats = [tracker.debouncer.stats() for tracker in trackers if tracker.debouncer is not None]
+    raw = sum(s['raw_transitions'] for s in stats)
+    if raw:
+        logged = sum(s['transitions'] for s in stats)
+        blocked = Counter()
+        for s in stats:
+            blocked.update(s['blocked_frames'])
+        print(
+            f"Debounce: {raw} emotion changes, logged {logged} transitions, "
+            f"suppressed {raw - logged} ({(raw - logged) / raw:.0%}); frames held back by "
+            + ", ".join(f"{check} {blocked[check]}" for check in ("majority", "margin", "dwell"))
+        )
+
+def run_pipeline(cap, args, tracker):
+    """
+    Runs capture, inference and display on separate threads and reports their rates on exit.
+    """
+    workers = max(args.workers, 1)
+    queue_size = max(args.queue_size, 1)
+    # Each inference worker gets its own detector so they never share model state
+    detectors = [build_detector(args) for _ in range(workers)]
+    pipeline = CapturePipeline(cap, detectors, tracker, queue_size=queue_size, annotate=annotate_frame)
+    stats = pipeline.run()
+    report_gate(detectors)
+    print(
+        f"Pipeline summary: captured {stats['frames_captured']} frames ({stats['capture_fps']:.1f} fps), "
+        f"inferred {stats['frames_inferred']} ({stats['inference_fps']:.1f} fps), dropped {stats['frames_dropped']}, "
+        f"latency {stats['latency_ms']:.0f} ms (p95 {stats['latency_p95_ms']:.0f} ms)"
+    )
+
+def run_sources(captures, args, trackers):
+    """
+    Runs several cameras against one shared model, classifying the faces of all of them in one call per tick.
+    """
+    streams = [CameraStream(source_id, cap, trackers[source_id]) for source_id, cap in captures]
+    service = BatchedEmotionService(FER(mtcnn=True), detect_every=max(args.track_every, 1))
+    stats = MultiSourceCapture(streams, service, annotate=annotate_frame).run()
+    print(
+        f"Shared model: {stats['ticks']} batched calls for {stats['frames']} frames "
+        f"({stats['frames_per_call']:.1f} per call), {stats['faces']} faces classified, "
+        f"{stats['face_detections']} face detections"
+    )
+    for stream in streams:
+        print(f"{stream.source_id}: {stream.stats.describe()}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Real-time facial emotion detection from the webcam.")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="run capture, inference and display on separate threads")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="inference worker threads in pipeline mode")
+    parser.add_argument("--queue-size", type=int, default=1,
+                        help="frames waiting for inference before the oldest is dropped")
+    parser.add_argument("--track-every", type=int, default=0,
+                        help="run MTCNN face detection only every N frames and track the face in between (0 = every frame)")
+    parser.add_argument("--redetect-threshold", type=float, default=0.5,
+                        help="re-run face detection when tracking confidence falls below this (0-1)")
+    parser.add_argument("--tracker", default="auto", choices=["auto"] + list(TRACKER_FACTORIES),
+                        help="OpenCV tracker used between detections")
+    parser.add_argument("--motion-threshold", type=float, default=2.0,
+                        help="mean grey-level change (0-255) below which a frame reuses the last scores (0 = classify every frame)")
+    parser.add_argument("--max-static-frames", type=int, default=15,
+                        help="classify at least once every N+1 frames even when nothing moves")
+    parser.add_argument("--roi-margin", type=float, default=0.5,
+                        help="margin around the last face box, as a fraction of its size, when cropping")
+    parser.add_argument("--roi-size", type=int, default=224,
+                        help="downscale the face crop so its longer side is at most this many pixels (0 = no crop)")
+    parser.add_argument("--sources", nargs="+", metavar="[ID=]DEVICE",
+                        help="several cameras (device indexes, files or stream URLs) sharing one model; "
+                             "transitions are logged with each camera's ID")
+    parser.add_argument("--min-dwell", type=float, default=1.0,
+                        help="seconds a new emotion must hold before its transition is logged")
+    parser.add_argument("--score-margin", type=float, default=0.1,
+                        help="lead over the current emotion, in averaged score share (0-1), a new emotion needs")
+    parser.add_argument("--vote-window", type=float, default=1.0,
+                        help="seconds of frames a new emotion must win the majority of")
+    parser.add_argument("--majority", type=float, default=0.6,
+                        help="share of the vote window's frames a new emotion must win (0-1)")
+    parser.add_argument("--window", type=float, default=5.0,
+                        help="seconds of frames aggregated into the on-screen emotion")
+    parser.add_argument("--show-chart", action="store_true",
+                        help="show the session's emotion distribution chart on exit, not just save it")
+    parser.add_argument("--flush-interval", type=float, default=1.0,
+                        help="seconds between flushes of the transition log")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # Initialize the webcam, or every camera given with --sources
+    sources = parse_sources(args.sources) if args.sources else [(None, 0)]
+    captures = []
+    for source_id, device in sources:
+        cap = cv2.VideoCapture(device)
+        # Check if the camera is opened successfully
+        if not cap.isOpened():
+            print(f"Error: Could not open {'webcam' if source_id is None else source_id}.")
+            for _, opened in captures:
+                opened.release()
+            exit()
+        captures.append((source_id, cap))
+
+    os.makedirs(output_folder, exist_ok=True)
+    text_path = segment_directory(log_file) if SEGMENT_PERIOD else log_file
+    # Transitions are written from a background thread, off the frame loop
+    writer = TransitionLogWriter(
+        text_path=text_path if LOG_FORMAT in ("text", "both") else None,
+        binary_path=binary_log_file if LOG_FORMAT in ("binary", "both") else None,
+        database_path=database_file if LOG_FORMAT == "sqlite" else None,
+        flush_interval=args.flush_interval,
+        segment_period=SEGMENT_PERIOD or None
+    )
+    # Running dashboards also get every transition pushed to their /live stream
+    publisher = LivePublisher()
+
+    def log(*transition, source=None):
+        writer.log(*transition, source=source)
+        publisher.publish(*transition, source=source)
+
+    # Each camera keeps its own transition state
+    trackers = {
+        source_id: EmotionTracker(log=functools.partial(log, source=source_id), window_seconds=args.window,
+                                  debouncer=build_debouncer(args))
+        for source_id, _ in captures
+    }
+
+    try:
+        if args.sources:
+            run_sources(captures, args, trackers)
+        elif args.pipeline:
+            run_pipeline(cap, args, trackers[None])
+        else:
+            # Initialize the emotion detector
+            detector = build_detector(args)
+            try:
+                run_sequential(cap, detector, trackers[None])
+            finally:
+                report_gate([detector])
+    finally:
+        # Release the resources
+        for _, cap in captures:
+            cap.release()
+        cv2.destroyAllWindows()
+
+        report_debounce(trackers.values())
+
+        # Plot and save emotion distribution, over all cameras, while the logs are flushed
+        session_emotions = sum((tracker.session_emotions for tracker in trackers.values()), Counter())
+        chart = plot_emotion_distribution(session_emotions) if session_emotions else None
+
+        # Write out any transitions still queued; a failed writer is re-raised after the rest is shut down
+        try:
+            writer.close()
+        finally:
+            publisher.close()
+
+            if chart is not None:
+                process, file_path = chart
+                if process.wait() == 0:
+                    print(f"Emotion distribution chart saved at: {file_path}")
+                    if args.show_chart:
+                        show_chart(file_path)
+                else:
+                    print("Error: Failed to draw the emotion distribution chart.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import numpy as np
+
+from log_store import EMOTIONS, scores_vector
+
+
+class EmotionWindow:
+    """
+    Time-windowed ring buffer of per-frame emotion scores.
+
+    Keeps running per-emotion sums that are added to on append and
+    subtracted from as entries expire, so each frame costs constant time
+    however long the window is. Capacity doubles when the window holds more
+    frames than fit.
+    """
+
+    # Recompute the sums from the buffer every so many expiries to shed float drift
+    RESYNC_EVERY = 10000
+
+    def __init__(self, window_seconds=5.0, capacity=128):
+        self.window_seconds = window_seconds
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._scores = np.zeros((capacity, len(EMOTIONS)), dtype=np.float64)
+        self._head = 0  # oldest entry
+        self._count = 0
+        self._sums = np.zeros(len(EMOTIONS), dtype=np.float64)
+        self._expired = 0
+
+    def __len__(self):
+        return self._count
+
+    def _grow(self):
+        capacity = len(self._times)
+        order = (self._head + np.arange(self._count)) % capacity
+        times = np.zeros(capacity * 2, dtype=np.float64)
+        scores = np.zeros((capacity * 2, len(EMOTIONS)), dtype=np.float64)
+        times[:self._count] = self._times[order]
+        scores[:self._count] = self._scores[order]
+        self._times, self._scores, self._head = times, scores, 0
+
+    def expire(self, now):
+        """Drops entries older than the window and subtracts them from the sums."""
+        capacity = len(self._times)
+        cutoff = now - self.window_seconds
+        while self._count and self._times[self._head] < cutoff:
+            self._sums -= self._scores[self._head]
+            self._head = (self._head + 1) % capacity
+            self._count -= 1
+            self._expired += 1
+
+        if self._count == 0:
+            self._sums[:] = 0.0
+        elif self._expired >= self.RESYNC_EVERY:
+            order = (self._head + np.arange(self._count)) % capacity
+            self._sums = self._scores[order].sum(axis=0)
+            self._expired = 0
+
+    def append(self, scores, now):
+        """Adds one frame's scores (dict or EMOTIONS-ordered sequence) at time `now`."""
+        self.expire(now)
+        if self._count == len(self._times):
+            self._grow()
+        vector = scores_vector(scores) if isinstance(scores, dict) else scores
+        slot = (self._head + self._count) % len(self._times)
+        self._times[slot] = now
+        self._scores[slot] = vector
+        self._sums += self._scores[slot]
+        self._count += 1
+
+    def summary(self, now):
+        """
+        Returns (most frequent emotion, normalized scores) over the window, or None if it is empty.
+        """
+        self.expire(now)
+        if self._count == 0:
+            return None
+        total_scores = self._sums.sum()
+        if total_scores <= 0:
+            return None
+        normalized = self._sums / total_scores
+        normalized_scores = dict(zip(EMOTIONS, normalized.tolist()))
+        return EMOTIONS[int(normalized.argmax())], normalized_scores
@@ -0,0 +1,185 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+# OpenCV tracker constructors by name; KCF and CSRT need opencv-contrib-python
+TRACKER_FACTORIES = {
+    'kcf': 'TrackerKCF_create',
+    'csrt': 'TrackerCSRT_create',
+    'mil': 'TrackerMIL_create',
+}
+
+
+def create_tracker(name='auto'):
+    """
+    Creates an OpenCV single-object tracker. 'auto' picks KCF when the
+    contrib build is installed and falls back to MIL otherwise.
+    """
+    names = ['kcf', 'mil'] if name == 'auto' else [name]
+    for candidate in names:
+        factory_name = TRACKER_FACTORIES.get(candidate)
+        if factory_name is None:
+            raise ValueError(f"Unknown tracker: {candidate}")
+        for namespace in (cv2, getattr(cv2, 'legacy', None)):
+            factory = getattr(namespace, factory_name, None) if namespace is not None else None
+            if factory is not None:
+                return factory()
+    raise RuntimeError(f"OpenCV build has no {name} tracker")
+
+
+class TrackedFaceDetector:
+    """
+    Wraps a FER detector so full MTCNN face detection only runs every
+    `redetect_every` frames, or sooner when tracking confidence drops below
+    `min_confidence`. In between, an OpenCV tracker carries the face box
+    and only the emotion classifier runs on it.
+
+    Tracking confidence is the normalized cross-correlation between the
+    tracked patch and the face as it looked at the last detection.
+    """
+
+    def __init__(self, detector, redetect_every=10, min_confidence=0.5, tracker='auto'):
+        self.detector = detector
+        self.redetect_every = max(int(redetect_every), 1)
+        self.min_confidence = min_confidence
+        self.tracker_name = tracker
+        self._tracker = None
+        self._template = None
+        self._frames_since_detection = 0
+        self.detections = 0
+        self.tracked_frames = 0
+        self.confidence = 0.0
+
+    def reset(self):
+        self._tracker = None
+        self._template = None
+
+    def _detect(self, rgb_frame):
+        self.detections += 1
+        self._frames_since_detection = 0
+        emotions = self.detector.detect_emotions(rgb_frame)
+        if not emotions:
+            self.reset()
+            return emotions
+
+        box = tuple(int(v) for v in emotions[0]["box"])
+        self._tracker = create_tracker(self.tracker_name)
+        self._tracker.init(rgb_frame, box)
+        self._template = self._patch(rgb_frame, box)
+        self.confidence = 1.0
+        return emotions
+
+    @staticmethod
+    def _patch(rgb_frame, box):
+        x, y, w, h = box
+        height, width = rgb_frame.shape[:2]
+        x, y = max(x, 0), max(y, 0)
+        w, h = min(w, width - x), min(h, height - y)
+        if w <= 0 or h <= 0:
+            return None
+        return cv2.cvtColor(rgb_frame[y:y + h, x:x + w], cv2.COLOR_RGB2GRAY)
+
+    def _track_confidence(self, rgb_frame, box):
+        patch = self._patch(rgb_frame, box)
+        if patch is None or self._template is None:
+            return 0.0
+        if patch.shape != self._template.shape:
+            patch = cv2.resize(patch, (self._template.shape[1], self._template.shape[0]))
+        return float(cv2.matchTemplate(patch, self._template, cv2.TM_CCOEFF_NORMED)[0, 0])
+
+    def detect_emotions(self, rgb_frame):
+        """Same contract as FER.detect_emotions: a list of {'box', 'emotions'} dicts."""
+        self._frames_since_detection += 1
+        if self._tracker is None or self._frames_since_detection >= self.redetect_every:
+            return self._detect(rgb_frame)
+
+        ok, box = self._tracker.update(rgb_frame)
+        box = tuple(int(v) for v in box)
+        self.confidence = self._track_confidence(rgb_frame, box) if ok else 0.0
+        if self.confidence < self.min_confidence:
+            return self._detect(rgb_frame)
+
+        self.tracked_frames += 1
+        # Classifier only: FER skips its face detector when given the boxes
+        return self.detector.detect_emotions(rgb_frame, face_rectangles=[box])
+
+    def stats(self):
+        total = self.detections + self.tracked_frames
+        return {
+            'frames': total,
+            'detections': self.detections,
+            'tracked_frames': self.tracked_frames,
+            'detection_rate': self.detections / total if total else 0.0,
+        }
+
+
+def read_clip(path, max_frames=None):
+    """Loads a video file into a list of RGB frames."""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    return frames
+
+
+def dominant(emotions):
+    if not emotions:
+        return None
+    scores = emotions[0]["emotions"]
+    return max(scores, key=scores.get)
+
+
+def evaluate(frames, detector_factory, settings, min_confidence=0.5, tracker='auto'):
+    """
+    Runs full detection on every frame as the reference, then each
+    redetect interval in `settings`, and returns one row per run with
+    throughput and agreement of the dominant emotion with the reference.
+    """
+    results = []
+
+    detector = detector_factory()
+    start = time.perf_counter()
+    reference = [dominant(detector.detect_emotions(frame)) for frame in frames]
+    elapsed = time.perf_counter() - start
+    results.append({'mode': 'detect every frame', 'fps': len(frames) / elapsed, 'agreement': 1.0, 'detection_rate': 1.0})
+
+    for every in settings:
+        tracked = TrackedFaceDetector(detector_factory(), redetect_every=every,
+                                      min_confidence=min_confidence, tracker=tracker)
+        start = time.perf_counter()
+        predicted = [dominant(tracked.detect_emotions(frame)) for frame in frames]
+        elapsed = time.perf_counter() - start
+        agreement = np.mean([p == r for p, r in zip(predicted, reference)]) if frames else 0.0
+        results.append({
+            'mode': f"redetect every {every}",
+            'fps': len(frames) / elapsed,
+            'agreement': float(agreement),
+            'detection_rate': tracked.stats()['detection_rate'],
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Compare accuracy and throughput of detect-then-track against full detection on a video clip.")
+    parser.add_argument('clip', help="video file to evaluate")
+    parser.add_argument('--every', type=int, nargs='+', default=[5, 10, 30],
+                        help="redetect intervals to try")
+    parser.add_argument('--min-confidence', type=float, default=0.5)
+    parser.add_argument('--tracker', default='auto', choices=['auto'] + list(TRACKER_FACTORIES))
+    parser.add_argument('--max-frames', type=int, default=300)
+    args = parser.parse_args()
+
+    from fer import FER
+
+    clip = read_clip(args.clip, args.max_frames)
+    print(f"Loaded {len(clip)} frames from {args.clip}")
+    for row in evaluate(clip, lambda: FER(mtcnn=True), args.every, args.min_confidence, args.tracker):
+        print(f"{row['mode']:>20}: {row['fps']:6.1f} fps | agreement {row['agreement']:.1%} | "
+              f"MTCNN on {row['detection_rate']:.0%} of frames")
@@ -0,0 +1,126 @@
+import cv2
+import numpy as np
+
+# Size of the grayscale thumbnail that consecutive frames are compared on
+THUMBNAIL_SIZE = (64, 48)
+
+
+class FrameGate:
+    """
+    Wraps an emotion detector with a cheap pre-inference stage.
+
+    Each frame is shrunk to a small grayscale thumbnail and compared with
+    the thumbnail of the last frame that was actually classified. When the
+    mean absolute difference stays below `motion_threshold` (grey levels,
+    0-255) the previous result is returned without running the model, for
+    at most `max_static_frames` frames in a row so a slow drift is still
+    picked up.
+
+    Frames that do get classified are cropped to the last known face box,
+    grown by `roi_margin` of its size on every side, and downscaled so the
+    longer side is at most `roi_size` pixels; boxes in the result are mapped
+    back to full-frame coordinates. When no face is found in the crop, the
+    full frame is classified instead. `roi_size=0` disables cropping.
+    """
+
+    def __init__(self, detector, motion_threshold=2.0, max_static_frames=15, roi_margin=0.5, roi_size=224):
+        self.detector = detector
+        self.motion_threshold = motion_threshold
+        self.max_static_frames = max(int(max_static_frames), 0)
+        self.roi_margin = max(roi_margin, 0.0)
+        self.roi_size = max(int(roi_size), 0)
+        self._reference = None
+        self._last_result = None
+        self._box = None
+        self._static_frames = 0
+        self.frames = 0
+        self.skipped = 0  # frames answered from the previous result
+        self.inferences = 0  # model calls, counting a crop and its full-frame fallback separately
+        self.roi_inferences = 0
+        self.roi_misses = 0
+
+    def reset(self):
+        self._reference = None
+        self._last_result = None
+        self._box = None
+        self._static_frames = 0
+
+    @staticmethod
+    def thumbnail(rgb_frame):
+        gray = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY)
+        return cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+    def _is_static(self, thumbnail):
+        if self._reference is None or self._last_result is None:
+            return False
+        if self._static_frames >= self.max_static_frames:
+            return False
+        return float(cv2.absdiff(thumbnail, self._reference).mean()) < self.motion_threshold
+
+    def _region(self, shape):
+        """The last face box grown by the margin and clipped to the frame, as (x0, y0, x1, y1)."""
+        x, y, w, h = self._box
+        height, width = shape[:2]
+        dx, dy = int(w * self.roi_margin), int(h * self.roi_margin)
+        x0, y0 = max(x - dx, 0), max(y - dy, 0)
+        x1, y1 = min(x + w + dx, width), min(y + h + dy, height)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return x0, y0, x1, y1
+
+    def _classify_region(self, rgb_frame):
+        region = self._region(rgb_frame.shape)
+        if region is None:
+            return None
+        x0, y0, x1, y1 = region
+        crop = rgb_frame[y0:y1, x0:x1]
+        scale = min(self.roi_size / max(crop.shape[:2]), 1.0)
+        if scale < 1.0:
+            size = (max(int(crop.shape[1] * scale), 1), max(int(crop.shape[0] * scale), 1))
+            crop = cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+        self.inferences += 1
+        self.roi_inferences += 1
+        emotions = self.detector.detect_emotions(np.ascontiguousarray(crop))
+        if not emotions:
+            self.roi_misses += 1
+            return None
+        for face in emotions:
+            bx, by, bw, bh = face["box"]
+            face["box"] = [
+                int(round(x0 + bx / scale)), int(round(y0 + by / scale)),
+                int(round(bw / scale)), int(round(bh / scale)),
+            ]
+        return emotions
+
+    def detect_emotions(self, rgb_frame):
+        """Same contract as FER.detect_emotions: a list of {'box', 'emotions'} dicts."""
+        self.frames += 1
+        thumbnail = self.thumbnail(rgb_frame)
+        if self._is_static(thumbnail):
+            self._static_frames += 1
+            self.skipped += 1
+            return self._last_result
+
+        emotions = None
+        if self.roi_size and self._box is not None:
+            emotions = self._classify_region(rgb_frame)
+        if emotions is None:
+            # A crop without a face costs a second model call on the full frame
+            self.inferences += 1
+            emotions = self.detector.detect_emotions(rgb_frame)
+
+        self._reference = thumbnail
+        self._last_result = emotions
+        self._static_frames = 0
+        self._box = tuple(int(v) for v in emotions[0]["box"]) if emotions else None
+        return emotions
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'inferences': self.inferences,
+            'skipped': self.skipped,
+            'skip_rate': self.skipped / self.frames if self.frames else 0.0,
+            'roi_inferences': self.roi_inferences,
+            'roi_misses': self.roi_misses,
+        }
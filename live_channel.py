@@ -0,0 +1,207 @@
+"""
+Local push channel from the capture process to the dashboard.
+
+Every dashboard process binds its own Unix datagram socket in LIVE_DIR;
+emotion.py sends each transition to all of them as one small JSON datagram.
+Sending never blocks the frame loop: with no dashboard running, or with a
+receiver that is not keeping up, the event is simply dropped, and the
+transition is still in the log.
+"""
+import atexit
+import errno
+import glob
+import json
+import os
+import socket
+import tempfile
+import threading
+from collections import deque
+from itertools import islice
+
+import numpy as np
+
+from log_store import EMOTIONS, scores_vector
+
+# Directory holding one socket per listening dashboard process
+LIVE_DIR = os.environ.get('JOYNA_LIVE_DIR', os.path.join(tempfile.gettempdir(), 'joyna-live'))
+
+# Datagrams larger than this are not sent; a transition is a few hundred bytes
+MAX_DATAGRAM = 8192
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15.0
+
+
+def transition_message(from_emotion, to_emotion, duration, scores, timestamp, source=None):
+    """The JSON datagram for one transition; log_transition's signature."""
+    message = {
+        'date': timestamp.strftime('%Y-%m-%d'),
+        'time': timestamp.strftime('%H:%M:%S'),
+        'from': from_emotion,
+        'to': to_emotion,
+        'duration': round(float(duration), 2),
+        'scores': {emotion: float(score) for emotion, score in scores.items()},
+    }
+    if source is not None:
+        message['source'] = source
+    return json.dumps(message).encode()
+
+
+def session_event(message):
+    """
+    Adds the dominant emotion and its score to a transition message, in the
+    shape of a /chat-summary session.
+    """
+    vector = np.asarray(scores_vector(message.get('scores', {})), dtype=np.float32)
+    dominant = int(vector.argmax())
+    return dict(message, emotion=EMOTIONS[dominant], score=round(float(vector[dominant]), 2))
+
+
+class LivePublisher:
+    """Sends transitions to every dashboard process listening in `directory`."""
+
+    def __init__(self, directory=LIVE_DIR):
+        self.directory = directory
+        self.sent = 0
+        self.dropped = 0
+        self._socket = None
+        if hasattr(socket, 'AF_UNIX'):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._socket.setblocking(False)
+
+    def publish(self, from_emotion, to_emotion, duration, scores, timestamp, source=None):
+        """Same signature as log_transition, so it can sit next to the log writer."""
+        if self._socket is None:
+            return
+        message = transition_message(from_emotion, to_emotion, duration, scores, timestamp, source)
+        if len(message) > MAX_DATAGRAM:
+            self.dropped += 1
+            return
+        for path in glob.glob(os.path.join(self.directory, '*.sock')):
+            try:
+                self._socket.sendto(message, path)
+                self.sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a dashboard process that exited
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS):
+                    raise
+                self.dropped += 1
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class LiveBroadcaster:
+    """
+    Receives transitions on this process's socket and fans them out to any
+    number of stream subscribers.
+
+    Events go into one bounded ring with increasing ids, and a single
+    condition wakes every waiting subscriber; a subscriber only remembers
+    the last id it sent. Publishing is O(1) whatever the number of
+    subscribers, and an idle subscriber costs nothing but its waiting
+    thread. A subscriber that falls more than `history` events behind skips
+    ahead to the oldest event still kept.
+    """
+
+    def __init__(self, directory=LIVE_DIR, history=256):
+        self.directory = directory
+        self.path = None
+        self._events = deque(maxlen=history)  # (id, payload)
+        self._last_id = 0
+        self._condition = threading.Condition()
+        self._socket = None
+        self._pid = None
+        self.subscribers = 0
+        self.received = 0
+
+    def start(self):
+        """Binds this process's socket and starts the receiver thread, once per process."""
+        with self._condition:
+            if self._pid == os.getpid():
+                return
+            if not hasattr(socket, 'AF_UNIX'):
+                raise RuntimeError("Live updates need Unix domain sockets")
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, f'{os.getpid()}.sock')
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._socket.bind(self.path)
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+            threading.Thread(target=self._receive, name='live-receiver', daemon=True).start()
+
+    def _receive(self):
+        sock = self._socket
+        while True:
+            try:
+                data = sock.recv(MAX_DATAGRAM)
+            except OSError:
+                return
+            try:
+                payload = json.dumps(session_event(json.loads(data)))
+            except (ValueError, TypeError, AttributeError):
+                continue
+            self.publish(payload)
+
+    def publish(self, payload):
+        """Queues a JSON payload for every subscriber. Returns its event id."""
+        with self._condition:
+            self._last_id += 1
+            self._events.append((self._last_id, payload))
+            self.received += 1
+            self._condition.notify_all()
+            return self._last_id
+
+    def stop(self):
+        with self._condition:
+            if self._socket is not None and self._pid == os.getpid():
+                self._socket.close()
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
+            self._socket = None
+            self._pid = None
+
+    def subscribe(self, last_id=None, heartbeat=HEARTBEAT_INTERVAL):
+        """
+        Yields Server-Sent Events text: every event after `last_id` (by
+        default, only new ones), and a comment line when nothing happened
+        for `heartbeat` seconds so proxies keep the connection open and a
+        closed client is noticed.
+        """
+        with self._condition:
+            if last_id is None or last_id > self._last_id:
+                last_id = self._last_id
+            self.subscribers += 1
+        try:
+            yield 'retry: 2000\n\n'
+            while True:
+                with self._condition:
+                    if self._last_id == last_id:
+                        self._condition.wait(heartbeat)
+                    # Ids are consecutive, so the unseen events are the ring's tail
+                    missed = self._last_id - last_id
+                    events = list(islice(self._events, max(len(self._events) - missed, 0), None))
+                if not events:
+                    yield ': keep-alive\n\n'
+                    continue
+                for event_id, payload in events:
+                    yield f'id: {event_id}\nevent: transition\ndata: {payload}\n\n'
+                last_id = events[-1][0]
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+    def stats(self):
+        with self._condition:
+            return {'subscribers': self.subscribers, 'received': self.received}
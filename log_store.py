@@ -0,0 +1,464 @@
+"""
+Columnar index over emotion_log.txt.
+
+A cold start over a large log is parsed in parallel: the file is split into
+newline-aligned byte ranges that a process pool parses independently, and
+the columns are concatenated. To time it on a log:
+
+    python log_store.py emotion_log.txt --workers 1 2 4 --quarantine rejected.txt
+"""
+import argparse
+import ast
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from collections import deque
+from datetime import date, datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Default log written by emotion.py's log_transition
+LOG_FILE = 'emotion_log.txt'
+
+# Processes used to parse a large log; JOYNA_PARSE_WORKERS overrides the core count
+PARSE_WORKERS = int(os.environ.get('JOYNA_PARSE_WORKERS', 0)) or os.cpu_count() or 1
+
+# Below this many new bytes a refresh parses in-process; starting a pool costs more
+PARALLEL_MIN_BYTES = 32 << 20
+
+# Malformed lines kept for inspection per store; older ones are only counted
+QUARANTINE_LIMIT = 1000
+
+# Fixed column order of the score matrix
+EMOTIONS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+EMOTION_INDEX = {emotion: i for i, emotion in enumerate(EMOTIONS)}
+
+# Valence of each emotion column: -1 negative, 0 neutral, 1 positive
+VALENCE = np.array([-1, -1, -1, 1, -1, 1, 0], dtype=np.int8)
+NEGATIVE_MASK = VALENCE < 0
+# The dashboard has always counted neutral as a positive interaction
+POSITIVE_MASK = np.isin(np.arange(len(EMOTIONS)), [EMOTION_INDEX[e] for e in ('happy', 'surprise', 'neutral')])
+
+EPOCH = date(1970, 1, 1)
+
+_TRANSITION_PATTERN = re.compile(r'Transition:\s*(\w+)\s*->\s*(\w+)')
+_DURATION_PATTERN = re.compile(r'Duration:\s*([\d.]+)s')
+_SOURCE_PATTERN = re.compile(r'\|\s*Source:\s*([^|]*?)\s*\|')
+
+# A line exactly as log_transition writes it, with the scores in EMOTIONS
+# order; anything else goes through parse_log_line
+_NUMBER = rb'(-?(?:\d+\.\d*|\.\d+|0|[1-9]\d*)(?:[eE][-+]?\d+)?)'
+_FAST_LINE_PATTERN = re.compile(
+    rb'Date: (\d{4}-\d\d-\d\d) \| Time: (\d\d):(\d\d):(\d\d) \|.* \| Scores: \{'
+    + b', '.join(b"'" + emotion.encode() + b"': " + _NUMBER for emotion in EMOTIONS)
+    + rb'\}\s*$'
+)
+
+
+def day_number(date_str):
+    """Converts a YYYY-MM-DD string to days since 1970-01-01."""
+    return (datetime.strptime(date_str, '%Y-%m-%d').date() - EPOCH).days
+
+
+def format_day(day):
+    """Converts days since 1970-01-01 back to a YYYY-MM-DD string."""
+    return str(np.datetime64(int(day), 'D'))
+
+
+def format_seconds(seconds):
+    """Converts seconds since midnight to an HH:MM:SS string."""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def scores_vector(scores):
+    """Orders a scores dict into the EMOTIONS column layout; missing emotions score 0."""
+    return [float(scores.get(emotion, 0.0)) for emotion in EMOTIONS]
+
+
+def dominant_indices(scores):
+    """Returns the column of the highest score for every row of a score matrix."""
+    if len(scores) == 0:
+        return np.empty(0, dtype=np.intp)
+    return scores.argmax(axis=1)
+
+
+def parse_log_line(line):
+    """
+    Parses one line written by log_transition into (date, time, scores).
+    Returns None for blank or malformed lines.
+    """
+    if not line.strip():
+        return None
+    parts = line.split('|')
+    if len(parts) < 3 or 'Scores:' not in parts[-1]:
+        return None
+    try:
+        date_part = parts[0].split('Date:')[1].strip()
+        time_part = parts[1].split('Time:')[1].strip()
+        scores_part = parts[-1].split('Scores:')[1].strip()
+        scores_dict = ast.literal_eval(scores_part)
+    except (IndexError, ValueError, SyntaxError):
+        return None
+    if not isinstance(scores_dict, dict) or not scores_dict:
+        return None
+    return date_part, time_part, scores_dict
+
+
+def parse_transition(line):
+    """
+    Returns the (from, to, duration) fields of a log_transition line; the
+    emotions are None and the duration 0.0 when missing.
+    """
+    transition = _TRANSITION_PATTERN.search(line)
+    duration = _DURATION_PATTERN.search(line)
+    return (
+        transition.group(1) if transition else None,
+        transition.group(2) if transition else None,
+        float(duration.group(1)) if duration else 0.0
+    )
+
+
+def parse_source(line):
+    """The source ID of a line logged by one of several cameras, or None."""
+    match = _SOURCE_PATTERN.search(line)
+    return match.group(1) if match else None
+
+
+def _parse_fields(line, day_cache):
+    """(day, seconds, scores) of one raw line, or None if it is malformed."""
+    match = _FAST_LINE_PATTERN.match(line)
+    if match is not None:
+        hour, minute, second = int(match[2]), int(match[3]), int(match[4])
+        day = day_cache.get(match[1])
+        if day is None:
+            try:
+                day = day_cache[match[1]] = day_number(match[1].decode())
+            except ValueError:
+                day = -1
+        # strptime's %S accepts leap seconds
+        if day != -1 and hour < 24 and minute < 60 and second < 62:
+            return day, hour * 3600 + minute * 60 + second, [float(value) for value in match.groups()[4:]]
+
+    parsed = parse_log_line(line.decode('utf-8', errors='replace'))
+    if parsed is None:
+        return None
+    date_part, time_part, scores_dict = parsed
+    try:
+        day = day_number(date_part)
+        clock = datetime.strptime(time_part, '%H:%M:%S')
+    except ValueError:
+        return None
+    return day, clock.hour * 3600 + clock.minute * 60 + clock.second, scores_vector(scores_dict)
+
+
+def parse_log_chunk(chunk, offset=0):
+    """
+    Parses the complete lines of a bytes chunk of the log into columns.
+    Returns (days, seconds, scores, rejected): int32 and float32 arrays in
+    EMOTIONS order, and the (byte offset, line) of every malformed line,
+    where `offset` is the position of the chunk in the file. Blank lines and
+    '#' comments, such as segment footers, are skipped without being rejected.
+    """
+    days, seconds, scores = array('i'), array('i'), array('f')
+    rejected = []
+    day_cache = {}
+    position = offset
+    for line in chunk.split(b'\n'):
+        start = position
+        position += len(line) + 1
+        if not line.strip() or line.startswith(b'#'):
+            continue
+        fields = _parse_fields(line, day_cache)
+        if fields is None:
+            rejected.append((start, line.decode('utf-8', errors='replace').rstrip('\r')))
+            continue
+        days.append(fields[0])
+        seconds.append(fields[1])
+        scores.extend(fields[2])
+    return (
+        np.frombuffer(days, dtype=np.int32),
+        np.frombuffer(seconds, dtype=np.int32),
+        np.frombuffer(scores, dtype=np.float32).reshape(-1, len(EMOTIONS)),
+        rejected
+    )
+
+
+def _parse_range(path, start, stop):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        return parse_log_chunk(file.read(stop - start), start)
+
+
+def complete_lines_end(file, start, stop):
+    """The offset just past the last newline in [start, stop) of an open file, or `start` if there is none."""
+    position = stop
+    while position > start:
+        block_start = max(position - 65536, start)
+        file.seek(block_start)
+        newline = file.read(position - block_start).rfind(b'\n')
+        if newline != -1:
+            return block_start + newline + 1
+        position = block_start
+    return start
+
+
+def split_ranges(path, start, stop, parts):
+    """
+    Splits [start, stop) of a file into up to `parts` consecutive ranges of
+    similar size that each begin at the start of a line.
+    """
+    bounds = [start]
+    with open(path, 'rb') as file:
+        for i in range(1, parts):
+            position = start + (stop - start) * i // parts
+            if position <= bounds[-1]:
+                continue
+            # Move forward to just past the next newline
+            file.seek(position - 1)
+            file.readline()
+            position = file.tell()
+            if position >= stop:
+                break
+            bounds.append(position)
+    bounds.append(stop)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parse_log_file(path, start=0, stop=None, workers=PARSE_WORKERS):
+    """
+    Parses the lines in [start, stop) of the log, which must begin and end
+    on line boundaries, in up to `workers` processes. Returns the same
+    columns as parse_log_chunk, in file order.
+    """
+    if stop is None:
+        stop = os.path.getsize(path)
+    ranges = split_ranges(path, start, stop, max(int(workers), 1))
+    if len(ranges) <= 1:
+        return _parse_range(path, start, stop)
+
+    results = map_processes(_parse_range, [(path, first, last) for first, last in ranges], len(ranges))
+    return (
+        np.concatenate([result[0] for result in results]),
+        np.concatenate([result[1] for result in results]),
+        np.concatenate([result[2] for result in results]),
+        [entry for result in results for entry in result[3]]
+    )
+
+
+def map_processes(function, arguments, workers):
+    """Returns [function(*args) for args in arguments], computed in a pool of `workers` processes."""
+    # Deferred: only a cold start over a large log needs a pool
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Fresh interpreters rather than forks, since the caller may be a threaded server
+    with ProcessPoolExecutor(max(min(workers, len(arguments)), 1),
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(function, *zip(*arguments)))
+
+
+class EmotionLogStore:
+    """
+    In-process index over emotion_log.txt.
+
+    The log is parsed once and then tailed by byte offset, so each refresh()
+    only reads the lines appended since the previous call. Rows are kept in
+    file order as columns: day number and seconds since midnight (int32) and
+    a float32 score matrix in EMOTIONS order, about 36 bytes per row. Rows
+    are indexed by day as [start, stop) runs, which keeps a per-date lookup
+    proportional to the rows of that day.
+
+    Malformed lines are skipped and quarantined with their byte offsets:
+    `rejected` counts them, and `quarantine` keeps the latest
+    QUARANTINE_LIMIT as (offset, line) pairs.
+    """
+
+    def __init__(self, path=LOG_FILE, workers=PARSE_WORKERS):
+        self.path = path
+        self.workers = workers
+        self._lock = threading.RLock()
+        self.generation = 0
+        self._reset()
+
+    def _reset(self):
+        self._offset = 0
+        self._inode = None
+        self.available = False
+        self._size = 0
+        self._days = np.empty(0, dtype=np.int32)
+        self._seconds = np.empty(0, dtype=np.int32)
+        self._scores = np.empty((0, len(EMOTIONS)), dtype=np.float32)
+        self._date_index = {}  # day number -> list of [start, stop) row runs
+        self.rejected = 0
+        self.quarantine = deque(maxlen=QUARANTINE_LIMIT)
+        self.generation += 1
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def days(self):
+        return self._days[:self._size]
+
+    @property
+    def seconds(self):
+        return self._seconds[:self._size]
+
+    @property
+    def scores(self):
+        return self._scores[:self._size]
+
+    def refresh(self):
+        """
+        Absorbs lines appended since the last refresh. Returns the number of new rows.
+        Starts over if the file was truncated or replaced.
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self.available or self._offset:
+                    self._reset()
+                return 0
+
+            if stat.st_size < self._offset or (self._inode is not None and stat.st_ino != self._inode):
+                self._reset()
+            self.available = True
+            self._inode = stat.st_ino
+            if stat.st_size == self._offset:
+                return 0
+
+            with open(self.path, 'rb') as file:
+                # Leave a partially written last line for the next refresh
+                end = complete_lines_end(file, self._offset, stat.st_size)
+                if end == self._offset:
+                    return 0
+                parallel = self.workers > 1 and end - self._offset >= PARALLEL_MIN_BYTES
+                if not parallel:
+                    file.seek(self._offset)
+                    chunk = file.read(end - self._offset)
+
+            started = time.perf_counter()
+            if parallel:
+                days, seconds, scores, rejected = parse_log_file(self.path, self._offset, end, self.workers)
+                elapsed = time.perf_counter() - started
+                logger.info("Parsed %d rows of %s in %.2f s (%.0f rows/s, %d workers)",
+                            len(days), self.path, elapsed, len(days) / elapsed if elapsed else 0, self.workers)
+            else:
+                days, seconds, scores, rejected = parse_log_chunk(chunk, self._offset)
+            self._offset = end
+            return self._absorb(self.path, days, seconds, scores, rejected)
+
+    def _absorb(self, source, days, seconds, scores, rejected):
+        """Appends parsed rows and quarantines the lines rejected from `source`. Returns the number of rows."""
+        if rejected:
+            self.rejected += len(rejected)
+            self.quarantine.extend(rejected)
+            logger.warning("Skipped %d malformed lines of %s, the first at byte %d",
+                           len(rejected), source, rejected[0][0])
+        self.extend(days, seconds, scores)
+        return len(days)
+
+    def extend(self, days, seconds, scores):
+        """Appends a batch of parsed rows and indexes them by day."""
+        with self._lock:
+            count = len(days)
+            if count == 0:
+                return
+            start = self._size
+            self._reserve(start + count)
+            self._days[start:start + count] = days
+            self._seconds[start:start + count] = seconds
+            self._scores[start:start + count] = np.asarray(scores, dtype=np.float32).reshape(count, len(EMOTIONS))
+            self._size += count
+
+            new_days = self._days[start:self._size]
+            # Start of each run of consecutive rows sharing a day
+            breaks = np.flatnonzero(np.diff(new_days)) + 1
+            run_starts = np.concatenate(([0], breaks))
+            run_stops = np.concatenate((breaks, [count]))
+            for run_start, run_stop in zip(run_starts.tolist(), run_stops.tolist()):
+                runs = self._date_index.setdefault(int(new_days[run_start]), [])
+                if runs and runs[-1][1] == start + run_start:
+                    runs[-1][1] = start + run_stop
+                else:
+                    runs.append([start + run_start, start + run_stop])
+
+    def _reserve(self, needed):
+        capacity = len(self._days)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        self._days = np.resize(self._days, capacity)
+        self._seconds = np.resize(self._seconds, capacity)
+        scores = np.empty((capacity, len(EMOTIONS)), dtype=np.float32)
+        scores[:self._size] = self._scores[:self._size]
+        self._scores = scores
+
+    def rows_since(self, start):
+        """Returns (days, seconds, scores) for rows from index `start` to the end."""
+        with self._lock:
+            stop = self._size
+            return self._days[start:stop], self._seconds[start:stop], self._scores[start:stop]
+
+    def rows_for_date(self, date_str):
+        """
+        Returns (seconds, scores) arrays for the rows logged on a YYYY-MM-DD date, in file order.
+        """
+        with self._lock:
+            try:
+                runs = self._date_index.get(day_number(date_str), ())
+            except ValueError:
+                runs = ()
+            if not runs:
+                return np.empty(0, dtype=np.int32), np.empty((0, len(EMOTIONS)), dtype=np.float32)
+            seconds = np.concatenate([self._seconds[start:stop] for start, stop in runs])
+            scores = np.concatenate([self._scores[start:stop] for start, stop in runs])
+            return seconds, scores
+
+    def count_for_date(self, date_str):
+        """Returns the number of rows logged on a YYYY-MM-DD date."""
+        with self._lock:
+            try:
+                runs = self._date_index.get(day_number(date_str), ())
+            except ValueError:
+                return 0
+            return sum(stop - start for start, stop in runs)
+
+    def day_numbers(self):
+        """Returns the logged day numbers in the order they first appear."""
+        with self._lock:
+            return list(self._date_index)
+
+    def days_between(self, first=None, last=None):
+        """Returns the sorted logged day numbers from `first` to `last` inclusive; None leaves a side open."""
+        with self._lock:
+            return sorted(day for day in self._date_index
+                          if (first is None or day >= first) and (last is None or day <= last))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time a cold parse of an emotion log.")
+    parser.add_argument('path', nargs='?', default=LOG_FILE)
+    parser.add_argument('--workers', type=int, nargs='+', default=[PARSE_WORKERS],
+                        help="worker process counts to compare")
+    parser.add_argument('--quarantine', help="write malformed lines here as 'offset<TAB>line'")
+    args = parser.parse_args()
+
+    with open(args.path, 'rb') as log:
+        size = complete_lines_end(log, 0, os.path.getsize(args.path))
+    for workers in args.workers:
+        started = time.perf_counter()
+        days, seconds, scores, rejected = parse_log_file(args.path, 0, size, workers)
+        elapsed = time.perf_counter() - started
+        print(f"{workers:>3} workers: {len(days)} rows in {elapsed:.2f} s "
+              f"({len(days) / elapsed:,.0f} rows/s, {size / elapsed / 1e6:.0f} MB/s), {len(rejected)} malformed")
+    if args.quarantine:
+        with open(args.quarantine, 'w', encoding='utf-8') as file:
+            file.writelines(f"{offset}\t{line}\n" for offset, line in rejected)
@@ -1,259 +1,331 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-import pandas as pd
+import time
+# Start of this module's import, for measuring cold start
+IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, Response, current_app, render_template, request, jsonify, redirect, url_for, stream_with_context
 from datetime import datetime
 import re
-import ast
 import json
+import gc
+import logging
+import os
+import threading
+from log_store import EmotionLogStore, LOG_FILE, EMOTIONS, day_number
+from binary_log import BinaryEmotionLog, BINARY_LOG_FILE, LOG_FORMAT
+from chat_index import ChatHistoryIndex, CHAT_HISTORY_FILE
+from sqlite_store import SqliteChatIndex, SqliteEmotionStore, DATABASE_FILE, database_files
+from segments import (SEGMENT_PERIOD, SegmentedChatIndex, SegmentedEmotionLogStore, segment_directory,
+                      segment_sources)
+from dashboard import DashboardAggregates
+from search_index import ChatSearchIndex
+from rollups import EmotionRollups, FREQUENCIES
+from response_cache import ResponseCache, past_date
+from metrics import RequestMetrics
+from live_channel import LiveBroadcaster
+from charts import ChartRenderer
+from session_range import (DEFAULT_LIMIT, MAX_LIMIT, decode_cursor, iter_sessions,
+                           page_sessions, session_rows)
+
+logger = logging.getLogger(__name__)
+
+# The indexes below belong to the process, not to an app: every app returned by
+# create_app() serves the same data, and worker processes forked after a
+# preloading warm-up share the already parsed copy.
+
+# Shared index over the emotion log, tailed incrementally on each request.
+# JOYNA_LOG_FORMAT=binary (or both) reads the memory-mapped binary log instead,
+# and JOYNA_LOG_FORMAT=sqlite reads both the emotion log and chat summaries from
+# the SQLite database. JOYNA_LOG_SEGMENTS=daily or monthly reads the text logs
+# from directories of segments.
+if LOG_FORMAT in ('binary', 'both'):
+    emotion_store = BinaryEmotionLog(BINARY_LOG_FILE)
+elif LOG_FORMAT == 'sqlite':
+    emotion_store = SqliteEmotionStore(DATABASE_FILE)
+elif SEGMENT_PERIOD:
+    emotion_store = SegmentedEmotionLogStore(segment_directory(LOG_FILE))
+else:
+    emotion_store = EmotionLogStore(LOG_FILE)
+
+# Block offsets of chat_history.txt, extended as new summaries are appended
+if LOG_FORMAT == 'sqlite':
+    chat_index = SqliteChatIndex(DATABASE_FILE, follow=CHAT_HISTORY_FILE)
+elif SEGMENT_PERIOD:
+    chat_index = SegmentedChatIndex(segment_directory(CHAT_HISTORY_FILE))
+else:
+    chat_index = ChatHistoryIndex(CHAT_HISTORY_FILE)
+
+# Running home page totals fed from both indexes
+dashboard = DashboardAggregates(emotion_store, chat_index)
+
+# Inverted index over chat summaries for /search
+search_index = ChatSearchIndex(chat_index)
+
+# Per-day emotion summaries behind every transitions chart
+rollups = EmotionRollups(emotion_store)
+
+# Rendered JSON analytics, revalidated against the log files' versions
+response_cache = ResponseCache()
+
+# Chart images drawn off the request threads (JOYNA_CHART_PROCESSES for worker processes)
+charts = ChartRenderer()
+
+# Per-route latency histograms served at /metrics
+metrics = RequestMetrics()
+metrics.add_collector('response_cache', "Response cache statistics.", response_cache.stats)
+metrics.add_collector('charts', "Chart renders and cached images.", charts.stats)
+
+# Transitions pushed by emotion.py, fanned out to /live subscribers
+live = LiveBroadcaster()
+metrics.add_collector('live', "Live stream subscribers and events received.", live.stats)
+
+# Views registered on every app by create_app()
+routes = []
+
+# Set once warm_up() has run
+ready = threading.Event()
+warm_up_thread = None
+startup = {'startup_seconds': None, 'warm_up_seconds': None}
+metrics.add_collector('app', "Seconds to import and create the app, and to warm up the indexes.",
+                      lambda: {key: value for key, value in startup.items() if value is not None})
+
+def route(rule, **options):
+    """Like app.route, for the app(s) made by create_app(); the endpoint is the function name."""
+    def decorator(view):
+        routes.append((rule, view, options))
+        return view
+    return decorator
+
+def emotion_sources():
+    if LOG_FORMAT == 'sqlite':
+        return database_files(emotion_store.path)
+    if isinstance(emotion_store, SegmentedEmotionLogStore):
+        return segment_sources(emotion_store.path)
+    return [emotion_store.path]
+
+def chat_sources():
+    if LOG_FORMAT == 'sqlite':
+        return database_files(chat_index.path) + [chat_index.follow]
+    if isinstance(chat_index, SegmentedChatIndex):
+        return segment_sources(chat_index.path)
+    return [chat_index.path]
+
+def emotion_day_stamp(date_str, fmt='%m/%d/%Y'):
+    """
+    (index generation, rows logged) of a past day, which changes when rows are
+    backfilled into it; None for today, later days and invalid dates.
+    """
+    date_obj = past_date(date_str, (fmt,))
+    if date_obj is None:
+        return None
+    emotion_store.refresh()
+    return emotion_store.generation, emotion_store.count_for_date(date_obj.strftime('%Y-%m-%d'))
 
-app = Flask(__name__)
+def chat_day_stamp(date_str):
+    """(index generation, summaries logged) of a past day of the chat history, like emotion_day_stamp."""
+    date_obj = past_date(date_str, ('%m/%d/%Y', '%Y-%m-%d'))
+    if date_obj is None:
+        return None
+    chat_index.refresh()
+    return chat_index.generation, chat_index.count_for_date(f"{date_obj.month}/{date_obj.day}/{date_obj.year}")
 
 # Load and preprocess data
 def parse_emotion_log():
+    """
+    Returns the emotion log as a DataFrame with Date, Time and one float32
+    column per emotion, in EMOTIONS order.
+    """
+    # pandas is only needed here, so it is not imported at startup
+    import pandas as pd
+
+    columns = ['Date', 'Time'] + list(EMOTIONS)
     try:
-        data = []
-        with open('emotion_log.txt', 'r') as file:
-            for line in file:
-                if line.strip():  # Skip empty lines
-                    parts = line.split('|')
-                    date_part = parts[0].split('Date:')[1].strip()
-                    time_part = parts[1].split('Time:')[1].strip()
-                    scores_part = parts[-1].split('Scores:')[1].strip()
-                    
-                    # Safely evaluate the scores string to convert it to a dictionary
-                    try:
-                        scores_dict = ast.literal_eval(scores_part)
-                    except (ValueError, SyntaxError) as e:
-                        print(f"Error parsing scores: {scores_part} - {str(e)}")
-                        scores_dict = {}  # Default to an empty dictionary if parsing fails
-                    
-                    data.append({
-                        'Date': date_part,
-                        'Time': time_part,
-                        'Scores': scores_dict
-                    })
-        
-        df = pd.DataFrame(data)
+        emotion_store.refresh()
+        if not emotion_store.available:
+            logger.warning("%s not found", emotion_store.path)
+            return pd.DataFrame(columns=columns)
+
+        df = pd.DataFrame(emotion_store.scores, columns=list(EMOTIONS))
+        df.insert(0, 'Date', emotion_store.days.astype('datetime64[D]'))
+        df.insert(1, 'Time', pd.to_timedelta(emotion_store.seconds, unit='s'))
         return df
-    except FileNotFoundError:
-        print("Warning: emotion_log.txt not found")
-        return pd.DataFrame(columns=['Date', 'Time', 'Scores'])
-    except Exception as e:
-        print(f"Error reading emotion log: {str(e)}")
-        return pd.DataFrame(columns=['Date', 'Time', 'Scores'])
+    except Exception:
+        logger.exception("Error reading emotion log")
+        return pd.DataFrame(columns=columns)
 
-# Load the emotion log
-emotion_data = parse_emotion_log()
+def get_daily_sessions(formatted_date):
+    """
+    Returns the dominant emotion of every transition logged on a YYYY-MM-DD date.
+    """
+    with metrics.phase('parse'):
+        emotion_store.refresh()
+        seconds, scores = emotion_store.rows_for_date(formatted_date)
+    return session_rows(seconds, scores)
 
-@app.route('/')
+def parse_range_args():
+    """
+    Reads the optional YYYY-MM-DD `from`/`to` bounds (both inclusive) of a
+    range request as day numbers. Raises ValueError if either is malformed.
+    """
+    start = day_number(request.args['from']) if request.args.get('from') else None
+    stop = day_number(request.args['to']) if request.args.get('to') else None
+    return start, stop
+
+@route('/')
 def home():
-    total_interactions = get_total_interactions()
-    print(f"Total Interactions: {total_interactions}")
-    positive_percentage = calculate_positive_percentage()
-    print(f"Positive Percentage: {positive_percentage}")
-    active_days = calculate_active_days()
-    print(f"Active Days: {active_days}")
-    recent_activities = get_recent_activities()
-    print(f"Recent Activities: {recent_activities}")
+    with metrics.phase('parse'):
+        summary = dashboard.snapshot()
+    logger.debug("Home aggregates: %d interactions, %.2f%% positive, %d active days",
+                 summary['total_interactions'], summary['positive_percentage'], summary['active_days'])
     
-    return render_template('index.html',
-                          total_interactions=total_interactions,
-                          positive_percentage=positive_percentage,
-                          active_days=active_days,
-                          recent_activities=recent_activities)
+    with metrics.phase('serialize'):
+        return render_template('index.html',
+                              total_interactions=summary['total_interactions'],
+                              positive_percentage=summary['positive_percentage'],
+                              active_days=summary['active_days'],
+                              recent_activities=summary['recent_activities'])
 
-@app.route('/emotion-log')
+@route('/emotion-log')
 def show_emotion_log():
     return render_template('emotion_log.html')
 
-@app.route('/chat-history')
+@route('/chat-history')
 def chat_history():
     return render_template('chat_history.html')
 
-@app.route('/chat-summary/<path:date_str>')
+@route('/chat-summary/<path:date_str>')
+@response_cache.cached(emotion_sources, day_stamp=lambda date_str: emotion_day_stamp(date_str))
 def chat_summary(date_str):
     try:
         # Parse the incoming date string (format: MM/DD/YYYY)
         date_obj = datetime.strptime(date_str, '%m/%d/%Y')
         formatted_date = date_obj.strftime('%Y-%m-%d')
         
-        try:
-            # Read the emotion log with error handling
-            df = pd.read_csv('emotion_log.txt', delimiter='|', skipinitialspace=True)
-        except FileNotFoundError:
+        sessions = get_daily_sessions(formatted_date)
+        if not emotion_store.available:
             return jsonify({
                 "date": formatted_date,
                 "sessions": [],
                 "message": "No log file found"
             })
         
-        # Clean and prepare the data
-        df.columns = df.columns.str.strip()
-        df['Date'] = df['Date'].str.strip()
-        
-        # Filter for the specific date
-        daily_data = df[df['Date'] == formatted_date]
-        
-        if daily_data.empty:
+        if not sessions:
             return jsonify({
                 "date": formatted_date,
                 "sessions": [],
                 "message": "No data for this date"
             })
         
-        sessions = []
-        for _, row in daily_data.iterrows():
-            try:
-                # Extract scores from the string safely
-                scores_str = row['Scores'].strip() if isinstance(row['Scores'], str) else '{}'
-                scores_dict = eval(scores_str.replace("'", '"'))
-                
-                # Get the highest scoring emotion
-                max_emotion = max(scores_dict.items(), key=lambda x: x[1])
-                
-                sessions.append({
-                    "time": row['Time'].strip() if isinstance(row['Time'], str) else '',
-                    "emotion": max_emotion[0],
-                    "score": round(max_emotion[1], 2)
-                })
-            except Exception as row_error:
-                print(f"Error processing row: {row_error}")
-                continue
-        
         return jsonify({
             "date": formatted_date,
             "sessions": sessions
         })
         
     except ValueError as e:
-        print(f"Date parsing error: {str(e)}")
+        logger.info("Date parsing error: %s", e)
         return jsonify({"error": "Invalid date format"}), 400
     except Exception as e:
-        print(f"Error in chat_summary: {str(e)}")
+        logger.exception("Error in chat_summary")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/health-report')
+@route('/health-report')
 def health_report():
     return render_template('health_report.html')
 
-@app.route('/logout')
+@route('/logout')
 def logout():
     return redirect(url_for('home'))
 
-@app.route('/prevalent-emotion')
+@route('/prevalent-emotion')
 def prevalent_emotion():
     # Calculate prevalent emotion
     return jsonify({"emotion": "happy"})
 
-@app.route('/weekly-transitions')
-def weekly_transitions():
+@route('/transitions')
+@response_cache.cached(emotion_sources)
+def transitions():
     try:
-        if emotion_data.empty:
-            return jsonify({"data": {}}), 200
-
-        # Define emotion values
-        emotion_values = {
-            'angry': -1,
-            'disgust': -1,
-            'fear': -1,
-            'sad': -1,
-            'neutral': 0,
-            'surprise': 1,
-            'happy': 1
-        }
+        freq = request.args.get('freq', 'D').upper()
+        if freq not in FREQUENCIES:
+            return jsonify({"error": "Invalid frequency. Please use D, W or M"}), 400
         
-        def get_prevalent_emotion(group):
-            if group.empty:
-                return 0
-            try:
-                last_scores = group.iloc[-1]['Scores']
-                prevalent_emotion = max(last_scores.items(), key=lambda x: x[1])[0]
-                return emotion_values.get(prevalent_emotion, 0)
-            except Exception as e:
-                print(f"Error in get_prevalent_emotion: {str(e)}")
-                return 0
-        
-        # Group by week and get prevalent emotion
-        weekly_data = emotion_data.groupby(pd.Grouper(key='Date', freq='W')).apply(get_prevalent_emotion)
+        try:
+            start, stop = parse_range_args()
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Please use YYYY-MM-DD"}), 400
         
-        data_dict = {str(k.date()): int(v) for k, v in weekly_data.items() if pd.notnull(k)}
+        with metrics.phase('parse'):
+            data = rollups.series(freq, start, stop)
+            buckets = rollups.query(freq, start, stop)
+        return jsonify({
+            "freq": freq,
+            "data": data,
+            "buckets": buckets
+        })
+    except Exception as e:
+        logger.exception("Error in transitions")
+        return jsonify({"error": str(e)}), 500
+
+@route('/weekly-transitions')
+@response_cache.cached(emotion_sources)
+def weekly_transitions():
+    try:
+        with metrics.phase('parse'):
+            data_dict = rollups.series('W')
         
-        print("Debug - weekly_data:", data_dict)
+        logger.debug("Weekly data: %s", data_dict)
         return jsonify({"data": data_dict})
     except Exception as e:
-        print(f"Error in weekly_transitions: {str(e)}")
+        logger.exception("Error in weekly_transitions")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/monthly-transitions')
+@route('/monthly-transitions')
+@response_cache.cached(emotion_sources)
 def monthly_transitions():
     try:
-        if emotion_data.empty:
-            return jsonify({"data": {}}), 200
-
-        # Define emotion values
-        emotion_values = {
-            'angry': -1,
-            'disgust': -1,
-            'fear': -1,
-            'sad': -1,
-            'neutral': 0,
-            'surprise': 1,
-            'happy': 1
-        }
-        
-        def get_prevalent_emotion(group):
-            if group.empty:
-                return 0
-            try:
-                last_scores = group.iloc[-1]['Scores']
-                prevalent_emotion = max(last_scores.items(), key=lambda x: x[1])[0]
-                return emotion_values.get(prevalent_emotion, 0)
-            except Exception as e:
-                print(f"Error in get_prevalent_emotion: {str(e)}")
-                return 0
-        
-        # Group by month and get prevalent emotion
-        monthly_data = emotion_data.groupby(pd.Grouper(key='Date', freq='M')).apply(get_prevalent_emotion)
+        with metrics.phase('parse'):
+            data_dict = rollups.series('M')
         
-        data_dict = {str(k.date()): int(v) for k, v in monthly_data.items() if pd.notnull(k)}
-        
-        print("Debug - monthly_data:", data_dict)
+        logger.debug("Monthly data: %s", data_dict)
         return jsonify({"data": data_dict})
     except Exception as e:
-        print(f"Error in monthly_transitions: {str(e)}")
+        logger.exception("Error in monthly_transitions")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/daily-summary/<date>')
+CHART_TITLES = {'D': "Daily Emotion Transitions", 'W': "Weekly Emotion Transitions", 'M': "Monthly Emotion Transitions"}
+
+def transitions_chart_series(freq, start=None, stop=None):
+    """(labels, values) of the valence chart for one frequency and day range."""
+    series = rollups.series(freq, start, stop)
+    return list(series), list(series.values())
+
+@route('/charts/transitions.png')
+@response_cache.cached(emotion_sources)
+def transitions_chart():
+    """The /transitions series as a PNG, drawn once per distinct data and then served from cache."""
+    try:
+        freq = request.args.get('freq', 'W').upper()
+        if freq not in FREQUENCIES:
+            return jsonify({"error": "Invalid frequency. Please use D, W or M"}), 400
+
+        try:
+            start, stop = parse_range_args()
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Please use YYYY-MM-DD"}), 400
+
+        with metrics.phase('parse'):
+            labels, values = transitions_chart_series(freq, start, stop)
+        with metrics.phase('serialize'):
+            image = charts.render('valence', labels, values, CHART_TITLES[freq])
+        return Response(image, mimetype='image/png')
+    except Exception as e:
+        logger.exception("Error in transitions_chart")
+        return jsonify({"error": str(e)}), 500
+
+@route('/daily-summary/<date>')
+@response_cache.cached(emotion_sources, day_stamp=lambda date: emotion_day_stamp(date.strip(), '%Y-%m-%d'))
 def daily_summary(date):
     try:
-        # Read the emotion log
-        df = pd.read_csv('emotion_log.txt', delimiter='|')
-        
-        # Convert the date strings to datetime
-        df['Date'] = df['Date'].str.strip()
-        
-        # Filter for the specific date
-        daily_data = df[df['Date'].str.contains(date)]
-        
-        if daily_data.empty:
-            return jsonify({
-                "date": date,
-                "sessions": []
-            })
-        
-        sessions = []
-        for _, row in daily_data.iterrows():
-            # Extract scores from the string
-            scores_str = row['Scores'].strip()
-            scores_dict = eval(scores_str)
-            
-            # Get the highest scoring emotion
-            max_emotion = max(scores_dict.items(), key=lambda x: x[1])
-            
-            sessions.append({
-                "time": row['Time'].strip(),
-                "emotion": max_emotion[0],
-                "score": round(max_emotion[1], 2)
-            })
+        sessions = get_daily_sessions(date.strip())
         
         return jsonify({
             "date": date,
@@ -261,10 +333,11 @@ def daily_summary(date):
         })
         
     except Exception as e:
-        print(f"Error in daily_summary: {str(e)}")
+        logger.exception("Error in daily_summary")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/session-history/<path:date_str>')
+@route('/session-history/<path:date_str>')
+@response_cache.cached(emotion_sources, day_stamp=lambda date_str: emotion_day_stamp(date_str))
 def session_history(date_str):
     try:
         # Parse the date string and handle potential format issues
@@ -272,66 +345,90 @@ def session_history(date_str):
             date_obj = datetime.strptime(date_str, '%m/%d/%Y')
             formatted_date = date_obj.strftime('%Y-%m-%d')
         except ValueError as e:
-            print(f"Date parsing error: {str(e)}")
+            logger.info("Date parsing error: %s", e)
             return jsonify({"error": "Invalid date format"}), 400
 
-        try:
-            # Read the emotion log file
-            with open('emotion_log.txt', 'r') as file:
-                lines = file.readlines()
-        except FileNotFoundError:
+        sessions = get_daily_sessions(formatted_date)
+        if not emotion_store.available:
             return jsonify({
                 "date": formatted_date,
                 "sessions": [],
                 "message": "No log file found"
             })
 
-        sessions = []
-        for line in lines:
-            try:
-                # Split the line by delimiter and clean whitespace
-                parts = [part.strip() for part in line.split('|')]
-                if len(parts) < 4:  # Skip invalid lines
-                    continue
-
-                line_date = parts[0].replace('Date:', '').strip()
-                
-                # Check if this line matches our target date
-                if line_date == formatted_date:
-                    time = parts[1].replace('Time:', '').strip()
-                    scores_str = parts[-1].replace('Scores:', '').strip()
-                    
-                    # Safely evaluate the scores string
-                    try:
-                        scores_dict = ast.literal_eval(scores_str)
-                    except:
-                        continue
-                    
-                    # Get the highest scoring emotion
-                    max_emotion = max(scores_dict.items(), key=lambda x: x[1])
-                    
-                    sessions.append({
-                        "time": time,
-                        "emotion": max_emotion[0],
-                        "score": round(max_emotion[1], 2)
-                    })
-            except Exception as line_error:
-                print(f"Error processing line: {line_error}")
-                continue
-
         return jsonify({
             "date": formatted_date,
             "sessions": sessions
         })
 
     except Exception as e:
-        print(f"Error in session_history: {str(e)}")
+        logger.exception("Error in session_history")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/emotion-analysis/<path:date_str>')
+@route('/sessions')
+@response_cache.cached(emotion_sources)
+def sessions_range():
+    """
+    Transitions of every day from `from` to `to`, `limit` rows per page.
+    Pass the returned `next_cursor` as `cursor` to get the following page.
+    """
+    try:
+        try:
+            start, stop = parse_range_args()
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Please use YYYY-MM-DD"}), 400
+        try:
+            limit = int(request.args.get('limit', DEFAULT_LIMIT))
+            after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError:
+            return jsonify({"error": "Invalid limit or cursor"}), 400
+        if not 1 <= limit <= MAX_LIMIT:
+            return jsonify({"error": f"limit must be between 1 and {MAX_LIMIT}"}), 400
+
+        with metrics.phase('parse'):
+            emotion_store.refresh()
+            sessions, next_cursor = page_sessions(emotion_store, start, stop, after, limit)
+        return jsonify({
+            "from": request.args.get('from'),
+            "to": request.args.get('to'),
+            "sessions": sessions,
+            "next_cursor": next_cursor
+        })
+    except Exception as e:
+        logger.exception("Error in sessions_range")
+        return jsonify({"error": str(e)}), 500
+
+@route('/sessions.ndjson')
+def sessions_stream():
+    """
+    Same rows as /sessions, streamed one JSON object per line as each day is
+    read instead of being built into a single document. Accepts `cursor` to
+    resume and an optional `limit`.
+    """
+    try:
+        start, stop = parse_range_args()
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({"error": "Invalid date, limit or cursor"}), 400
+
+    with metrics.phase('parse'):
+        emotion_store.refresh()
+    json_provider = current_app.json
+
+    def generate():
+        for count, (_, _, row) in enumerate(iter_sessions(emotion_store, start, stop, after)):
+            if limit is not None and count >= limit:
+                break
+            yield json_provider.dumps(row) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@route('/emotion-analysis/<path:date_str>')
+@response_cache.cached(chat_sources, day_stamp=lambda date_str: chat_day_stamp(date_str.replace('%2F', '/')))
 def emotion_analysis(date_str):
     try:
-        print(f"Received date string: {date_str}")
+        logger.debug("Received date string: %s", date_str)
         
         # Handle URL-encoded date string
         date_str = date_str.replace('%2F', '/')
@@ -345,167 +442,187 @@ def emotion_analysis(date_str):
                 # Try YYYY-MM-DD
                 date_obj = datetime.strptime(date_str, '%Y-%m-%d')
             except ValueError as e:
-                print(f"Date parsing error: {str(e)}")
+                logger.info("Date parsing error: %s", e)
                 return jsonify({"error": "Invalid date format. Please use MM/DD/YYYY"}), 400
         
         # Format date for comparison - using a cross-platform compatible format
         formatted_date = f"{date_obj.month}/{date_obj.day}/{date_obj.year}"
-        print(f"Formatted date for search: {formatted_date}")
+        logger.debug("Formatted date for search: %s", formatted_date)
         
-        sessions = []
-        try:
-            with open('chat_history.txt', 'r', encoding='utf-8') as file:
-                content = file.read()
-                
-                if not content.strip():
-                    print("Empty chat history file")
-                    return jsonify({
-                        'date': formatted_date,
-                        'sessions': []
-                    })
-                
-                # Split content into blocks
-                blocks = content.split('Timestamp: ')
-                print(f"Found {len(blocks)} blocks in chat history")
-                
-                for block in blocks[1:]:  # Skip first empty block
-                    try:
-                        lines = block.strip().split('\n', 1)
-                        if len(lines) < 2:
-                            continue
-                        
-                        timestamp = lines[0].strip()
-                        block_date = timestamp.split(',')[0].strip()
-                        
-                        print(f"Comparing dates - Block: {block_date}, Target: {formatted_date}")
-                        
-                        if block_date == formatted_date:
-                            try:
-                                # Extract time (HH:MM AM/PM)
-                                time_part = timestamp.split(', ')[1]
-                                time = ' '.join(time_part.split()[:2])
-                                summary = lines[1].strip()
-                                
-                                if summary:
-                                    sessions.append({
-                                        'time': time,
-                                        'summary': summary
-                                    })
-                                    print(f"Added session for {time}")
-                            except Exception as e:
-                                print(f"Error processing time/summary: {str(e)}")
-                                continue
-                    except Exception as e:
-                        print(f"Error processing block: {str(e)}")
-                        continue
-                
-                print(f"Successfully found {len(sessions)} sessions")
-                return jsonify({
-                    'date': formatted_date,
-                    'sessions': sorted(sessions, key=lambda x: x['time'])
-                })
-                
-        except FileNotFoundError:
-            print("Chat history file not found")
+        with metrics.phase('parse'):
+            chat_index.refresh()
+            blocks = chat_index.blocks_for_date(formatted_date)
+        if not chat_index.available:
+            logger.warning("%s not found", chat_index.path)
             return jsonify({
                 'date': formatted_date,
                 'sessions': []
             })
-        except Exception as e:
-            print(f"Error reading chat history: {str(e)}")
-            raise
+        
+        sessions = []
+        for timestamp, summary in blocks:
+            try:
+                # Extract time (HH:MM AM/PM)
+                time_part = timestamp.split(', ')[1]
+                time = ' '.join(time_part.split()[:2])
+                
+                if summary:
+                    sessions.append({
+                        'time': time,
+                        'summary': summary
+                    })
+            except Exception as e:
+                logger.warning("Error processing time/summary: %s", e)
+                continue
+        
+        logger.debug("Found %d sessions", len(sessions))
+        return jsonify({
+            'date': formatted_date,
+            'sessions': sorted(sessions, key=lambda x: x['time'])
+        })
             
     except Exception as e:
-        print(f"Unexpected error in emotion_analysis: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Unexpected error in emotion_analysis")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/emotion-analysis')
+@route('/search')
+@response_cache.cached(chat_sources)
+def search_sessions():
+    """Chat sessions whose summaries best match the words in `q`, optionally within `from`/`to`."""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"error": "Missing search query"}), 400
+        try:
+            start, stop = parse_range_args()
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Please use YYYY-MM-DD"}), 400
+        try:
+            limit = int(request.args.get('limit', 20))
+        except ValueError:
+            return jsonify({"error": "Invalid limit"}), 400
+        if not 1 <= limit <= MAX_LIMIT:
+            return jsonify({"error": f"limit must be between 1 and {MAX_LIMIT}"}), 400
+
+        with metrics.phase('parse'):
+            search_index.update()
+            total, hits = search_index.search(query, start, stop, limit)
+            blocks = chat_index.read_blocks([block for block, _ in hits])
+
+        results = []
+        for (block, score), entry in zip(hits, blocks):
+            if entry is None:
+                continue
+            timestamp, summary = entry
+            date_part, _, time_part = timestamp.partition(', ')
+            results.append({
+                'date': date_part,
+                'time': ' '.join(time_part.split()[:2]),
+                'summary': summary,
+                'score': round(score, 4)
+            })
+        return jsonify({
+            'query': query,
+            'total': total,
+            'results': results
+        })
+    except Exception as e:
+        logger.exception("Error in search_sessions")
+        return jsonify({'error': str(e)}), 500
+
+@route('/emotion-analysis')
 def show_emotion_analysis():
     return render_template('emotion_analysis.html')
 
-def get_total_interactions():
+@route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@route('/live')
+def live_stream():
+    """
+    Server-Sent Events stream with a 'transition' event for every emotion
+    transition emotion.py detects, shaped like a /chat-summary session.
+    """
     try:
-        with open('chat_history.txt', 'r', encoding='utf-8') as file:
-            content = file.read()
-            # Count occurrences of the word 'Timestamp'
-            total_count = content.count('Timestamp')
-            return total_count
-    except FileNotFoundError:
-        print("Warning: chat_history.txt not found")
-        return 0  # Return 0 if the file is not found
-    except Exception as e:
-        print(f"Error reading chat history: {str(e)}")
-        return 0  # Return 0 in case of any other error
-
-def calculate_positive_percentage():
-    df = parse_emotion_log()
-    if 'Scores' not in df.columns:
-        print("Warning: 'Scores' column not found in DataFrame.")
-        return 0.0  # Return 0.0 if the column is not found
-
-    # Define positive emotions
-    positive_emotions = ['happy', 'surprise', 'neutral']
-    positive_count = 0
-
-    # Count positive interactions based on the dominant emotion
-    for index, row in df.iterrows():
-        scores = row['Scores']
-        if isinstance(scores, dict):  # Ensure scores is a dictionary
-            # Determine the dominant emotion
-            dominant_emotion = max(scores, key=scores.get)  # Get the emotion with the highest score
-            if dominant_emotion in positive_emotions:  # Check if it's one of the positive emotions
-                positive_count += 1
-
-    total_count = len(df)
-    percentage = (positive_count / total_count * 100) if total_count > 0 else 0
-    return round(percentage, 2)  # Round to two decimal places
-
-def get_recent_activities():
+        live.start()
+    except (RuntimeError, OSError) as e:
+        logger.warning("Live updates unavailable: %s", e)
+        return jsonify({"error": "Live updates are unavailable"}), 503
     try:
-        with open('chat_history.txt', 'r', encoding='utf-8') as file:
-            content = file.readlines()
-            recent_activities = []
-            for line in content[-5:]:  # Get the last 5 entries
-                if line.strip():  # Skip empty lines
-                    parts = line.split('Timestamp: ')
-                    if len(parts) > 1:
-                        timestamp = parts[1].strip()
-                        summary = parts[0].strip()  # Assuming the summary is before the timestamp
-                        recent_activities.append({
-                            'time': timestamp,
-                            'summary': summary
-                        })
-            return recent_activities
-    except FileNotFoundError:
-        print("Warning: chat_history.txt not found")
-        return []  # Return an empty list if the file is not found
-    except Exception as e:
-        print(f"Error reading chat history: {str(e)}")
-        return []  # Return an empty list in case of any other error
+        last_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_id = None
+    return Response(live.subscribe(last_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@route('/ready')
+def readiness():
+    """200 once the indexes are warm, 503 while the warm-up is still running."""
+    return jsonify({'ready': ready.is_set(), **startup}), 200 if ready.is_set() else 503
 
-def calculate_active_days():
+def warm_up():
+    """
+    Reads both logs into the indexes and folds them into the dashboard,
+    rollup and search structures, so the first requests only see new data.
+    """
+    began = time.perf_counter()
     try:
-        with open('chat_history.txt', 'r', encoding='utf-8') as file:
-            content = file.readlines()
-            unique_dates = set()  # Use a set to store unique dates
-            
-            for line in content:
-                if line.strip():  # Skip empty lines
-                    # Assuming the date is in a specific format, e.g., "Timestamp: YYYY-MM-DD"
-                    parts = line.split('Timestamp: ')
-                    if len(parts) > 1:
-                        date_str = parts[1].strip().split()[0]  # Extract the date part
-                        unique_dates.add(date_str)  # Add the date to the set
-            
-            return len(unique_dates)  # Return the count of unique dates
-    except FileNotFoundError:
-        print("Warning: chat_history.txt not found")
-        return 0  # Return 0 if the file is not found
-    except Exception as e:
-        print(f"Error reading chat history: {str(e)}")
-        return 0  # Return 0 in case of any other error
+        dashboard.update()
+        rollups.update()
+        search_index.update()
+        # Queue the dashboard's default charts; they finish drawing in the background
+        for freq in FREQUENCIES:
+            charts.submit('valence', *transitions_chart_series(freq), CHART_TITLES[freq])
+    except Exception:
+        # Requests still load the data lazily
+        logger.exception("Warm-up failed")
+    startup['warm_up_seconds'] = time.perf_counter() - began
+    logger.info("Warmed up %d transitions and %d chat sessions in %.2fs",
+                len(emotion_store), len(chat_index), startup['warm_up_seconds'])
+    ready.set()
+
+def configure_logging():
+    """
+    Applies JOYNA_LOG_LEVEL (default INFO) to the root logger, adding a
+    handler unless the server running the app has installed one already.
+    """
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logging.getLogger().setLevel(os.environ.get('JOYNA_LOG_LEVEL', 'INFO').upper())
+
+def create_app(warm=None):
+    """
+    Builds the dashboard app. `warm` (default: JOYNA_WARM_UP, else
+    'background') picks how the indexes are loaded:
+
+    background  a daemon thread warms up while the app starts serving
+    preload     warm up before returning, then freeze the heap so workers
+                forked afterwards (gunicorn --preload) share it copy-on-write
+    lazy        nothing up front; each index loads on the first request needing it
+    """
+    warm = warm or os.environ.get('JOYNA_WARM_UP', 'background')
+    if warm not in ('background', 'preload', 'lazy'):
+        raise ValueError(f"Unknown warm-up mode: {warm}")
+    configure_logging()
+
+    app = Flask(__name__)
+    for rule, view, options in routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    metrics.init_app(app)
+
+    if warm == 'preload':
+        warm_up()
+        # Keep the garbage collector from touching (and so copying) the warmed objects in workers
+        gc.freeze()
+    elif warm == 'background':
+        global warm_up_thread
+        if warm_up_thread is None:
+            warm_up_thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+            warm_up_thread.start()
+    else:
+        ready.set()
+    startup['startup_seconds'] = time.perf_counter() - IMPORT_STARTED
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,145 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            yield f'{name}_bucket{{{labels},le="{le}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """
+    Per-route request timing exposed in Prometheus text format.
+
+    init_app() hooks every request to record its total latency and status
+    by route rule. Inside a request, phase('parse') and the JSON provider's
+    phase('serialize') split that time into reading the logs and building
+    the response. Extra gauges (e.g. response cache stats) can be attached
+    with add_collector().
+    """
+
+    def __init__(self, app=None, prefix='joyna'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._latency = {}   # route -> Histogram
+        self._phases = {}    # (route, phase) -> Histogram
+        self._requests = {}  # (route, status) -> count
+        self._collectors = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.json = TimedJSONProvider(app, self)
+
+    @staticmethod
+    def _route():
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_phases = {}
+
+    def _finish(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = self._route()
+        with self._lock:
+            self._latency.setdefault(route, Histogram()).observe(elapsed)
+            key = (route, response.status_code)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for phase, seconds in g.pop('metrics_phases', {}).items():
+                self._phases.setdefault((route, phase), Histogram()).observe(seconds)
+        return response
+
+    @contextmanager
+    def phase(self, name):
+        """Adds the time spent in the block to the current request's `name` phase."""
+        if not has_request_context() or 'metrics_phases' not in g:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            g.metrics_phases[name] = g.metrics_phases.get(name, 0.0) + time.perf_counter() - started
+
+    def add_collector(self, name, help_text, collect):
+        """Exports the numeric values of `collect()` (a dict) as gauges `<prefix>_<name>_<key>`."""
+        self._collectors.append((name, help_text, collect))
+
+    def render(self):
+        """Returns all metrics in Prometheus text exposition format."""
+        prefix = self.prefix
+        lines = []
+        with self._lock:
+            lines.append(f'# HELP {prefix}_request_duration_seconds Request latency by route.')
+            lines.append(f'# TYPE {prefix}_request_duration_seconds histogram')
+            for route, histogram in sorted(self._latency.items()):
+                lines.extend(histogram.lines(f'{prefix}_request_duration_seconds', f'route="{_escape(route)}"'))
+
+            lines.append(f'# HELP {prefix}_request_phase_seconds Time per request spent parsing logs or serializing responses.')
+            lines.append(f'# TYPE {prefix}_request_phase_seconds histogram')
+            for (route, phase), histogram in sorted(self._phases.items()):
+                labels = f'route="{_escape(route)}",phase="{_escape(phase)}"'
+                lines.extend(histogram.lines(f'{prefix}_request_phase_seconds', labels))
+
+            lines.append(f'# HELP {prefix}_requests_total Requests by route and status.')
+            lines.append(f'# TYPE {prefix}_requests_total counter')
+            for (route, status), count in sorted(self._requests.items()):
+                lines.append(f'{prefix}_requests_total{{route="{_escape(route)}",status="{status}"}} {count}')
+
+        for name, help_text, collect in self._collectors:
+            for key, value in collect().items():
+                if isinstance(value, (int, float)):
+                    metric = f'{prefix}_{name}_{key}'
+                    lines.append(f'# HELP {metric} {help_text}')
+                    lines.append(f'# TYPE {metric} gauge')
+                    lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with serialization time recorded as the 'serialize' phase."""
+
+    def __init__(self, app, metrics):
+        super().__init__(app)
+        self.metrics = metrics
+
+    def response(self, *args, **kwargs):
+        with self.metrics.phase('serialize'):
+            return super().response(*args, **kwargs)
@@ -0,0 +1,268 @@
+"""
+Several cameras sharing one emotion model.
+
+Every source gets a capture thread that keeps only its newest frame, and an
+EmotionTracker of its own, so transitions are detected and logged per
+camera. A single inference loop serves all of them: each tick it finds the
+faces in every new frame, then classifies the faces from all sources in one
+classifier call. FER classifies all the faces of an image in one batch, so
+the face crops are tiled into a mosaic and passed with their cell boxes.
+The model is loaded once, and a camera added to the tick costs its face
+detection and a few more rows in the batch, not another process.
+
+    python emotion.py --sources hall=0 kitchen=rtsp://192.168.1.20/stream
+"""
+import math
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from capture_pipeline import PipelineStats
+
+
+def parse_sources(specs):
+    """
+    Turns 'name=device' or bare 'device' arguments into (source ID, device)
+    pairs; a bare device is named cam<N>. Device indexes become ints, as
+    cv2.VideoCapture expects; anything else is a file or stream URL.
+    """
+    sources = []
+    for number, spec in enumerate(specs):
+        name, separator, device = spec.partition('=')
+        if not separator or '://' in name:
+            name, device = f'cam{number}', spec
+        sources.append((name, int(device) if device.isdigit() else device))
+    names = [name for name, _ in sources]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate source IDs: {names}")
+    return sources
+
+
+class CameraStream:
+    """One capture source: a thread keeping its newest frame, and the tracker its results go to."""
+
+    def __init__(self, source_id, cap, tracker):
+        self.source_id = source_id
+        self.cap = cap
+        self.tracker = tracker
+        self.stats = PipelineStats()
+        self.ended = False
+        self._latest = None  # (sequence, captured_at, frame)
+        self._taken = -1
+        self._lock = threading.Lock()
+        self.on_frame = None
+
+    def capture_loop(self, stop):
+        sequence = 0
+        while not stop.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                print(f"Error: Failed to capture frame from {self.source_id}.")
+                break
+            captured_at = time.time()
+            self.stats.frame_captured(captured_at)
+            with self._lock:
+                self._latest = (sequence, captured_at, frame)
+            sequence += 1
+            if self.on_frame is not None:
+                self.on_frame()
+        self.ended = True
+
+    def latest(self):
+        with self._lock:
+            return self._latest
+
+    def take(self):
+        """The newest frame if it has not been taken yet, else None. Older frames are never classified."""
+        with self._lock:
+            if self._latest is None or self._latest[0] == self._taken:
+                return None
+            self._taken = self._latest[0]
+            return self._latest
+
+
+class BatchedEmotionService:
+    """
+    One FER detector serving any number of streams.
+
+    detect() takes one frame per stream. Faces are found per frame (every
+    `detect_every` ticks per stream; the last boxes are reused in between,
+    and a stream with no face looks again on its next tick). Each face is
+    cut out with some context, scaled into a `cell_size` cell of a mosaic
+    with the face filling the central `face_size` square, and the whole
+    mosaic goes through the classifier in a single call.
+    """
+
+    def __init__(self, detector, detect_every=1, cell_size=96, face_size=64):
+        self.detector = detector
+        self.detect_every = max(int(detect_every), 1)
+        self.cell_size = cell_size
+        self.face_size = face_size
+        self._faces = {}  # source ID -> [ticks since detection, boxes]
+        self.ticks = 0
+        self.frames = 0
+        self.faces = 0
+        self.detections = 0
+
+    def _find_faces(self, source_id, rgb_frame):
+        state = self._faces.get(source_id)
+        if state is None or not state[1] or state[0] + 1 >= self.detect_every:
+            self.detections += 1
+            boxes = [tuple(int(v) for v in box) for box in self.detector.find_faces(rgb_frame, bgr=False)]
+            state = self._faces[source_id] = [0, boxes]
+        else:
+            state[0] += 1
+        return state[1]
+
+    def _cell(self, rgb_frame, box):
+        """The face with its surroundings, scaled so the face fills the central face_size square of a cell."""
+        x, y, w, h = box
+        half = max(w, h) * self.cell_size / self.face_size / 2
+        center_x, center_y = x + w / 2, y + h / 2
+        x0, y0 = int(round(center_x - half)), int(round(center_y - half))
+        side = max(int(round(2 * half)), 1)
+        canvas = np.zeros((side, side, 3), dtype=rgb_frame.dtype)
+        height, width = rgb_frame.shape[:2]
+        left, top = max(x0, 0), max(y0, 0)
+        right, bottom = min(x0 + side, width), min(y0 + side, height)
+        if right > left and bottom > top:
+            canvas[top - y0:bottom - y0, left - x0:right - x0] = rgb_frame[top:bottom, left:right]
+        return cv2.resize(canvas, (self.cell_size, self.cell_size), interpolation=cv2.INTER_AREA)
+
+    def classify(self, cells):
+        """Scores for each cell, in one classifier call; None for a cell FER could not classify."""
+        columns = math.ceil(math.sqrt(len(cells)))
+        rows = math.ceil(len(cells) / columns)
+        size, margin = self.cell_size, (self.cell_size - self.face_size) // 2
+        mosaic = np.zeros((rows * size, columns * size, 3), dtype=np.uint8)
+        boxes = []
+        for number, cell in enumerate(cells):
+            top, left = number // columns * size, number % columns * size
+            mosaic[top:top + size, left:left + size] = cell
+            boxes.append((left + margin, top + margin, self.face_size, self.face_size))
+        results = self.detector.detect_emotions(mosaic, face_rectangles=boxes)
+        # FER returns each face with the box it was given; match them back to their cells
+        by_box = {tuple(int(v) for v in result['box']): result['emotions'] for result in results}
+        return [by_box.get(box) for box in boxes]
+
+    def detect(self, frames):
+        """
+        Takes [(source ID, RGB frame), ...] and returns, for each, a list in
+        FER.detect_emotions' format with boxes in that frame's coordinates.
+        """
+        self.ticks += 1
+        self.frames += len(frames)
+        cells, owners = [], []
+        for number, (source_id, rgb_frame) in enumerate(frames):
+            for box in self._find_faces(source_id, rgb_frame):
+                cells.append(self._cell(rgb_frame, box))
+                owners.append((number, box))
+
+        results = [[] for _ in frames]
+        if not cells:
+            return results
+        self.faces += len(cells)
+        for (number, box), emotions in zip(owners, self.classify(cells)):
+            if emotions is not None:
+                results[number].append({'box': list(box), 'emotions': emotions})
+        return results
+
+    def stats(self):
+        return {
+            'ticks': self.ticks,
+            'frames': self.frames,
+            'faces': self.faces,
+            'face_detections': self.detections,
+            'frames_per_call': self.frames / self.ticks if self.ticks else 0.0,
+        }
+
+
+class MultiSourceCapture:
+    """
+    Runs every stream's capture thread and the shared inference loop, and
+    shows each stream in its own window on the calling thread.
+    """
+
+    def __init__(self, streams, service, annotate=None, report_every=5.0):
+        self.streams = list(streams)
+        self.service = service
+        self.annotate = annotate
+        self.report_every = report_every
+        self._stop = threading.Event()
+        self._new_frame = threading.Condition()
+        self._tracker_lock = threading.Lock()
+        self._threads = []
+
+    def _frame_arrived(self):
+        with self._new_frame:
+            self._new_frame.notify()
+
+    def start(self):
+        for stream in self.streams:
+            stream.on_frame = self._frame_arrived
+            self._threads.append(threading.Thread(target=stream.capture_loop, args=(self._stop,),
+                                                  name=f"capture-{stream.source_id}", daemon=True))
+        self._threads.append(threading.Thread(target=self._inference_loop, name="inference", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._frame_arrived()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            batch = [(stream, item) for stream in self.streams if (item := stream.take()) is not None]
+            if not batch:
+                if all(stream.ended for stream in self.streams):
+                    self._stop.set()
+                    break
+                with self._new_frame:
+                    self._new_frame.wait(0.1)
+                continue
+            frames = [(stream.source_id, cv2.cvtColor(item[2], cv2.COLOR_BGR2RGB)) for stream, item in batch]
+            results = self.service.detect(frames)
+            now = time.time()
+            with self._tracker_lock:
+                for (stream, (_, captured_at, _)), emotions in zip(batch, results):
+                    stream.stats.frame_inferred(captured_at, now)
+                    stream.tracker.update(emotions, captured_at)
+
+    def render(self):
+        """Shows every stream until 'q' is pressed or all of them end, printing stats periodically."""
+        shown = {}
+        last_report = time.time()
+        while not self._stop.is_set():
+            for stream in self.streams:
+                latest = stream.latest()
+                if latest is None or shown.get(stream.source_id) == latest[0]:
+                    continue
+                shown[stream.source_id] = latest[0]
+                frame = latest[2].copy()
+                if self.annotate is not None:
+                    with self._tracker_lock:
+                        self.annotate(frame, stream.tracker)
+                cv2.putText(frame, stream.stats.describe(), (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+                cv2.imshow(f"Emotion Detection - {stream.source_id}", frame)
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+            now = time.time()
+            if now - last_report >= self.report_every:
+                for stream in self.streams:
+                    print(f"{stream.source_id}: {stream.stats.describe(now)}")
+                last_report = now
+
+    def run(self):
+        """Starts capture and inference, renders until exit and returns the service stats."""
+        self.start()
+        try:
+            self.render()
+        finally:
+            self.stop()
+        return self.service.stats()
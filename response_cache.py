@@ -0,0 +1,181 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from functools import wraps
+
+from flask import make_response, request
+from werkzeug.http import http_date
+
+
+def file_version(path):
+    """(inode, size, mtime_ns) of a source file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def only_grew(old, new):
+    """True if every source is the same file as before and at least as large (appended to, not rewritten)."""
+    for before, after in zip(old, new):
+        if before is None:
+            if after is not None:
+                return False
+            continue
+        if after is None or after[0] != before[0] or after[1] < before[1]:
+            return False
+    return True
+
+
+def past_date(date_str, formats=('%m/%d/%Y',)):
+    """The datetime `date_str` parses to with the first matching of `formats` if it is before today, else None."""
+    for fmt in formats:
+        try:
+            parsed = datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+        return parsed if parsed.date() < date.today() else None
+    return None
+
+
+class ResponseCache:
+    """
+    LRU cache of rendered JSON responses keyed by route and arguments.
+
+    Every entry remembers the version (inode, size, mtime) of the files it
+    was computed from and is only served while they are unchanged. An entry
+    about one past day also remembers a stamp of that day's rows (e.g. the
+    index generation and row count) and is served without recomputation
+    while its sources have only been appended to and the stamp is the same;
+    rows backfilled into that day change the stamp. Total body size is
+    capped at `max_bytes`; the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, max_entries=4096):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key, versions, stamp=None):
+        """
+        The entry for `key` if it is still valid for `versions`; `stamp()`
+        computes the current day stamp, only when the versions differ.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        fresh = entry['versions'] == versions
+        if not fresh:
+            # Computing the stamp may refresh an index, so it runs outside the lock
+            fresh = (entry['stamp'] is not None and stamp is not None
+                     and only_grew(entry['versions'], versions) and stamp() == entry['stamp'])
+        with self._lock:
+            if not fresh:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, versions, body, mimetype, stamp=None):
+        entry = {
+            'versions': versions,
+            'body': body,
+            'mimetype': mimetype,
+            'etag': hashlib.sha1(body).hexdigest()[:20],
+            'last_modified': max((v[2] for v in versions if v is not None), default=0) / 1e9,
+            'stamp': stamp,
+        }
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.size_bytes += len(body)
+            while self._entries and (self.size_bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.size_bytes -= len(entry['body'])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def cached(self, sources, day_stamp=None):
+        """
+        Decorates a JSON view. `sources` returns the file paths the response
+        depends on; `day_stamp(**view_args)` returns a stamp of the rows of
+        the past day the response is about, or None if it is not about one
+        (see the class docstring). Adds ETag/Last-Modified headers and
+        answers matching conditional requests with 304.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = (request.endpoint, tuple(sorted(kwargs.items())), tuple(sorted(request.args.items(multi=True))))
+                versions = tuple(file_version(path) for path in sources())
+                stamp = (lambda: day_stamp(**kwargs)) if day_stamp else None
+
+                entry = self.get(key, versions, stamp)
+                if entry is None:
+                    # Stamped before rendering, so rows added meanwhile only make the entry look stale
+                    current = stamp() if stamp else None
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    entry = self.put(key, versions, response.get_data(), response.mimetype, stamp=current)
+
+                if request.if_none_match:
+                    unchanged = request.if_none_match.contains(entry['etag'])
+                else:
+                    since = request.if_modified_since
+                    unchanged = bool(since and entry['last_modified'] and int(entry['last_modified']) <= since.timestamp())
+                if unchanged:
+                    with self._lock:
+                        self.not_modified += 1
+                    response = make_response('', 304)
+                else:
+                    response = make_response(entry['body'])
+                    response.mimetype = entry['mimetype']
+                response.set_etag(entry['etag'])
+                if entry['last_modified']:
+                    response.headers['Last-Modified'] = http_date(entry['last_modified'])
+                # Browsers must revalidate, which costs a 304 when nothing changed
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            return wrapper
+        return decorator
@@ -0,0 +1,170 @@
+import threading
+
+import numpy as np
+
+from log_store import EMOTIONS, VALENCE, dominant_indices, format_day
+
+# Supported bucket sizes for range queries
+FREQUENCIES = ('D', 'W', 'M')
+
+
+def period_end(days, freq):
+    """
+    Maps day numbers to the closing day of their bucket: the day itself for
+    'D', the Sunday ending the week for 'W' and the last day of the month for 'M'.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    if freq == 'D':
+        return days
+    if freq == 'W':
+        # 1970-01-01 was a Thursday, so Monday-based weekday is (day + 3) % 7
+        return days + (6 - (days + 3) % 7)
+    if freq == 'M':
+        months = days.astype('datetime64[D]').astype('datetime64[M]')
+        return ((months + 1).astype('datetime64[D]') - 1).astype(np.int64)
+    raise ValueError(f"Unsupported frequency: {freq}")
+
+
+def period_range(first, last, freq):
+    """Returns every bucket closing day from `first` to `last` inclusive."""
+    if freq == 'D':
+        return np.arange(first, last + 1, dtype=np.int64)
+    if freq == 'W':
+        return np.arange(first, last + 1, 7, dtype=np.int64)
+    months = np.arange(np.datetime64(int(first), 'D').astype('datetime64[M]'),
+                       np.datetime64(int(last), 'D').astype('datetime64[M]') + 1)
+    return ((months + 1).astype('datetime64[D]') - 1).astype(np.int64)
+
+
+class EmotionRollups:
+    """
+    Per-day summaries of the emotion log, maintained incrementally.
+
+    Each day keeps its row count, dominant-emotion counts, score sums,
+    valence sum and the dominant emotion of its last entry. Only rows the
+    store absorbed since the previous update are folded in; weekly and
+    monthly buckets are derived from the day summaries at query time, so a
+    range query costs one pass over days instead of over raw transitions.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._generation = self.store.generation
+        self._rows_seen = 0
+        self._slots = {}  # day number -> slot in the arrays below
+        self._size = 0
+        self.day = np.empty(0, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.int64)
+        self.counts = np.empty((0, len(EMOTIONS)), dtype=np.int64)
+        self.score_sums = np.empty((0, len(EMOTIONS)), dtype=np.float64)
+        self.valence_sums = np.empty(0, dtype=np.int64)
+        self.last_emotion = np.empty(0, dtype=np.int8)
+
+    def _slot(self, day):
+        slot = self._slots.get(day)
+        if slot is not None:
+            return slot
+        slot = self._size
+        if slot == len(self.day):
+            capacity = max(64, slot * 2)
+            self.day = np.resize(self.day, capacity)
+            self.rows = np.resize(self.rows, capacity)
+            self.counts = np.resize(self.counts, (capacity, len(EMOTIONS)))
+            self.score_sums = np.resize(self.score_sums, (capacity, len(EMOTIONS)))
+            self.valence_sums = np.resize(self.valence_sums, capacity)
+            self.last_emotion = np.resize(self.last_emotion, capacity)
+        self.day[slot] = day
+        self.rows[slot] = 0
+        self.counts[slot] = 0
+        self.score_sums[slot] = 0
+        self.valence_sums[slot] = 0
+        self._slots[day] = slot
+        self._size += 1
+        return slot
+
+    def update(self):
+        """Folds rows appended to the store since the last update into the day summaries."""
+        with self._lock:
+            self.store.refresh()
+            if self.store.generation != self._generation:
+                self._reset()
+
+            days, _, scores = self.store.rows_since(self._rows_seen)
+            self._rows_seen += len(days)
+            if len(days) == 0:
+                return
+
+            dominant = dominant_indices(scores)
+            unique_days, first_reversed, inverse = np.unique(days[::-1], return_index=True, return_inverse=True)
+            slots = np.array([self._slot(day) for day in unique_days.tolist()], dtype=np.intp)
+            row_slots = slots[inverse[::-1]]
+
+            np.add.at(self.rows, row_slots, 1)
+            np.add.at(self.counts, (row_slots, dominant), 1)
+            np.add.at(self.score_sums, row_slots, scores)
+            np.add.at(self.valence_sums, row_slots, VALENCE[dominant])
+            # The first hit in the reversed batch is the latest row of each day
+            self.last_emotion[slots] = dominant[len(days) - 1 - first_reversed]
+
+    def query(self, freq='D', start=None, stop=None):
+        """
+        Returns bucket summaries for days in [start, stop] (day numbers, either
+        may be None), ordered by the bucket's closing day.
+        """
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Unsupported frequency: {freq}")
+        self.update()
+        with self._lock:
+            size = self._size
+            order = np.argsort(self.day[:size], kind='stable')
+            day = self.day[:size][order]
+            keep = np.ones(size, dtype=bool)
+            if start is not None:
+                keep &= day >= start
+            if stop is not None:
+                keep &= day <= stop
+            selected = order[keep]
+            if len(selected) == 0:
+                return []
+
+            ends, starts = np.unique(period_end(day[keep], freq), return_index=True)
+            lasts = np.append(starts[1:], len(selected)) - 1
+            rows = np.add.reduceat(self.rows[selected], starts)
+            counts = np.add.reduceat(self.counts[selected], starts, axis=0)
+            score_sums = np.add.reduceat(self.score_sums[selected], starts, axis=0)
+            valence_sums = np.add.reduceat(self.valence_sums[selected], starts)
+            last_emotion = self.last_emotion[selected[lasts]]
+
+        buckets = []
+        for i, end in enumerate(ends.tolist()):
+            means = score_sums[i] / rows[i]
+            buckets.append({
+                'period_end': format_day(end),
+                'rows': int(rows[i]),
+                'counts': dict(zip(EMOTIONS, counts[i].tolist())),
+                'mean_scores': {emotion: round(float(score), 4) for emotion, score in zip(EMOTIONS, means)},
+                'mean_valence': round(float(valence_sums[i] / rows[i]), 4),
+                'last_emotion': EMOTIONS[last_emotion[i]],
+                'value': int(VALENCE[last_emotion[i]]),
+            })
+        return buckets
+
+    def series(self, freq='D', start=None, stop=None):
+        """
+        Returns {closing day: valence of the last entry} for every bucket
+        between the first and last populated one; empty buckets count as 0.
+        """
+        buckets = self.query(freq, start, stop)
+        if not buckets:
+            return {}
+        values = {bucket['period_end']: bucket['value'] for bucket in buckets}
+        first = np.datetime64(buckets[0]['period_end'], 'D').astype(np.int64)
+        last = np.datetime64(buckets[-1]['period_end'], 'D').astype(np.int64)
+        return {
+            format_day(end): values.get(format_day(end), 0)
+            for end in period_range(first, last, freq).tolist()
+        }
@@ -0,0 +1,177 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+from log_store import EPOCH
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Query terms at least this long also match longer words, up to MAX_EXPANSIONS of them
+MIN_PREFIX = 3
+MAX_EXPANSIONS = 50
+
+# Words too common in chat summaries to be worth a posting list
+STOP_WORDS = frozenset("""
+a about after all also an and any are as at be been but by can did do for from had has have he her him his
+how i if in into is it its me more my no not of on or our she so some than that the their them then there
+they this to too up was we were what when which while who will with would you your
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+@lru_cache(maxsize=1 << 16)
+def normalize(word):
+    """Folds possessives and plurals so 'friends' and "friend's" index as 'friend'."""
+    if word.endswith("'s"):
+        word = word[:-2]
+    word = word.replace("'", '')
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Returns the normalized, non-stop-word terms of `text`."""
+    return [normalize(word) for word in _WORD.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def block_day(timestamp):
+    """Day number of a 'M/D/YYYY, ...' timestamp, or -1 if it has no valid date."""
+    try:
+        month, day, year = (int(part) for part in timestamp.split(',')[0].strip().split('/'))
+        return (date(year, month, day) - EPOCH).days
+    except ValueError:
+        return -1
+
+
+class ChatSearchIndex:
+    """
+    Inverted index over the summary text of the chat history.
+
+    Every term maps to a posting list of (block, term frequency) held in
+    compact arrays, appended to as update() absorbs new blocks from the chat
+    index, so the history is only ever read once. A query looks up the
+    posting lists of its terms (each term also matches longer words it is a
+    prefix of, found by binary search over the sorted vocabulary) and ranks
+    blocks with BM25 in a few vectorized passes, so its cost follows the
+    number of matching blocks rather than the size of the history.
+    """
+
+    def __init__(self, chat_index):
+        self.chat_index = chat_index
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._generation = self.chat_index.generation
+        self._blocks_seen = 0
+        self._postings = {}    # term -> (array of block numbers, array of term frequencies)
+        self._vocabulary = []  # sorted terms, for prefix matches
+        self._lengths = array('I')  # terms per block
+        self._days = array('i')     # day number per block, -1 if unknown
+        self._total_length = 0
+
+    def __len__(self):
+        return self._blocks_seen
+
+    def update(self):
+        """Indexes the blocks appended since the previous update. Returns how many were added."""
+        with self._lock:
+            self.chat_index.refresh()
+            if self.chat_index.generation != self._generation:
+                self._reset()
+            start, stop = self._blocks_seen, len(self.chat_index)
+            if start == stop:
+                return 0
+            new_terms = []
+            blocks = range(start, stop)
+            for block, entry in zip(blocks, self.chat_index.read_blocks(blocks)):
+                timestamp, summary = entry if entry is not None else (self.chat_index.timestamps[block], '')
+                terms = tokenize(summary)
+                for term, frequency in Counter(terms).items():
+                    posting = self._postings.get(term)
+                    if posting is None:
+                        posting = self._postings[term] = (array('i'), array('H'))
+                        new_terms.append(term)
+                    posting[0].append(block)
+                    posting[1].append(frequency if frequency < 0xFFFF else 0xFFFF)
+                self._lengths.append(len(terms))
+                self._days.append(block_day(timestamp))
+                self._total_length += len(terms)
+            if new_terms:
+                self._vocabulary = sorted(self._vocabulary + new_terms)
+            self._blocks_seen = stop
+            return stop - start
+
+    def _expand(self, term):
+        """`term` itself if indexed, plus up to MAX_EXPANSIONS longer indexed terms it is a prefix of."""
+        if len(term) < MIN_PREFIX:
+            return [term] if term in self._postings else []
+        first = bisect_left(self._vocabulary, term)
+        matches = []
+        for candidate in self._vocabulary[first:first + MAX_EXPANSIONS + 1]:
+            if not candidate.startswith(term):
+                break
+            matches.append(candidate)
+        return matches
+
+    def search(self, query, first=None, last=None, limit=20):
+        """
+        Returns (total matches, [(block, score), ...]) for the `limit` best
+        blocks matching any query term, optionally only those logged from day
+        number `first` to `last` inclusive. Best matches come first; ties go
+        to the newer block.
+        """
+        with self._lock:
+            count = self._blocks_seen
+            terms = list(dict.fromkeys(tokenize(query)))
+            if not terms or count == 0:
+                return 0, []
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+            average_length = self._total_length / count or 1.0
+
+            scores = {}
+            for term in terms:
+                for candidate in self._expand(term):
+                    blocks, frequencies = self._postings[candidate]
+                    blocks = np.frombuffer(blocks, dtype=np.int32)
+                    frequencies = np.frombuffer(frequencies, dtype=np.uint16).astype(np.float64)
+                    idf = np.log(1 + (count - len(blocks) + 0.5) / (len(blocks) + 0.5))
+                    norm = K1 * (1 - B + B * lengths[blocks] / average_length)
+                    weights = idf * frequencies * (K1 + 1) / (frequencies + norm)
+                    # A term expanded from a prefix counts for less than an exact match
+                    if candidate != term:
+                        weights *= 0.5
+                    scores[candidate] = (blocks, weights)
+            if not scores:
+                return 0, []
+
+            blocks = np.concatenate([entry[0] for entry in scores.values()])
+            weights = np.concatenate([entry[1] for entry in scores.values()])
+            matched, inverse = np.unique(blocks, return_inverse=True)
+            totals = np.bincount(inverse, weights=weights)
+
+            if first is not None or last is not None:
+                days = np.frombuffer(self._days, dtype=np.int32)[matched]
+                keep = days >= 0
+                if first is not None:
+                    keep &= days >= first
+                if last is not None:
+                    keep &= days <= last
+                matched, totals = matched[keep], totals[keep]
+
+            total = len(matched)
+            if total > limit:
+                best = np.argpartition(-totals, limit - 1)[:limit]
+                matched, totals = matched[best], totals[best]
+            order = np.lexsort((-matched, -totals))
+            return total, list(zip(matched[order].tolist(), totals[order].tolist()))
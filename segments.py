@@ -0,0 +1,559 @@
+"""
+Time-partitioned log segments.
+
+With JOYNA_LOG_SEGMENTS=daily or monthly, emotion.py and src/chatbot.js stop
+appending to one ever-growing file and write one segment per day or month
+into a directory named after the log, e.g. emotion_log/2024-11.txt and
+chat_history/2024-11.txt. When a writer moves on to a new period it closes
+the previous segment by appending a summary footer:
+
+    #summary {"first": "2024-11-01", "last": "2024-11-30", "rows": 1204, "dominant": {"angry": 31, ...}}
+
+so a reader can skip the segments outside a date range, or total them, from
+the footers alone. Closed segments can be gzipped; the footer then becomes
+a gzip member of its own ahead of the body, so it is still read without
+inflating the rest of the file.
+
+    python segments.py split --period monthly         # migrate emotion_log.txt and chat_history.txt
+    python segments.py compress emotion_log chat_history
+    python segments.py summary emotion_log --from 2024-11-01 --to 2024-12-31
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+from chat_index import BLOCK_MARKER, CHAT_HISTORY_FILE, ChatHistoryIndex, parse_block
+from log_store import (EMOTIONS, LOG_FILE, PARALLEL_MIN_BYTES, EmotionLogStore, day_number, dominant_indices,
+                       format_day, map_processes, parse_log_chunk)
+
+# daily, monthly, or unset for the single-file logs
+SEGMENT_PERIOD = os.environ.get('JOYNA_LOG_SEGMENTS', '')
+
+# Segment name (before the suffix) for each period
+PERIODS = {'daily': '%Y-%m-%d', 'monthly': '%Y-%m'}
+
+SUFFIX = '.txt'
+COMPRESSED_SUFFIX = '.txt.gz'
+FOOTER_MARKER = b'#summary '
+
+_EMOTION_DATE = re.compile(rb'Date:\s*(\d{4}-\d{2}-\d{2})')
+_CHAT_DATE = re.compile(rb'(\d{1,2})/(\d{1,2})/(\d{4})')
+
+
+def segment_directory(log_file):
+    """The directory holding the segments of a log: emotion_log.txt -> emotion_log."""
+    return os.path.splitext(log_file)[0]
+
+
+def segment_key(timestamp, period):
+    return timestamp.strftime(PERIODS[period])
+
+
+def segment_path(directory, key):
+    return os.path.join(directory, key + SUFFIX)
+
+
+def list_segments(directory):
+    """
+    Returns (key, path) for every segment in `directory`, oldest first. A
+    segment caught between compression and removal of the plain file is
+    listed once, as the compressed file.
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    segments = {}
+    for name in names:
+        if name.endswith(COMPRESSED_SUFFIX):
+            segments[name[:-len(COMPRESSED_SUFFIX)]] = name
+        elif name.endswith(SUFFIX):
+            segments.setdefault(name[:-len(SUFFIX)], name)
+    return [(key, os.path.join(directory, segments[key])) for key in sorted(segments)]
+
+
+def segment_sources(directory):
+    """
+    The files whose versions identify the state of a segmented log: the
+    directory, which changes when a segment is added, compressed or removed,
+    and the newest segment, the only one still appended to.
+    """
+    segments = list_segments(directory)
+    return [directory] + [path for _, path in segments[-1:]]
+
+
+def _footer(summary):
+    return FOOTER_MARKER + json.dumps(summary, separators=(', ', ': ')).encode() + b'\n'
+
+
+def _parse_footer(line):
+    try:
+        return json.loads(line[len(FOOTER_MARKER):])
+    except ValueError:
+        return None
+
+
+def open_body(path):
+    """
+    Opens a segment for reading its body, which excludes the footer of a
+    compressed segment. Returns (file, base): body offset N is at file
+    offset base + N. A plain segment compressed since it was listed is
+    opened as the compressed file.
+    """
+    if not path.endswith('.gz') and not os.path.exists(path) and os.path.exists(path + '.gz'):
+        path += '.gz'
+    if not path.endswith('.gz'):
+        return open(path, 'rb'), 0
+    file = gzip.open(path, 'rb')
+    first = file.readline()
+    if first.startswith(FOOTER_MARKER):
+        return file, len(first)
+    file.seek(0)
+    return file, 0
+
+
+def read_segment(path, start=0):
+    """
+    Returns (body from offset `start`, summary), where summary is the
+    footer of a closed segment and None for one still being written. The
+    footer itself is not part of the body.
+    """
+    file, base = open_body(path)
+    with file:
+        if base:
+            file.seek(0)
+            summary = _parse_footer(file.readline())
+            file.seek(base + start)
+            return file.read(), summary
+        file.seek(start)
+        data = file.read()
+    # A plain segment ends with its footer once it is closed
+    last = data.rfind(b'\n', 0, len(data) - 1) + 1
+    if data.endswith(b'\n') and data.startswith(FOOTER_MARKER, last):
+        return data[:last], _parse_footer(data[last:])
+    return data, None
+
+
+def _first_line(path):
+    with gzip.open(path, 'rb') as file:
+        return file.readline()
+
+
+def read_summary(path):
+    """The footer of a closed segment, read without the rest of the file; None while it is open."""
+    if path.endswith('.gz'):
+        line = _first_line(path)
+    else:
+        with open(path, 'rb') as file:
+            size = file.seek(0, os.SEEK_END)
+            file.seek(max(size - 65536, 0))
+            tail = file.read()
+        if not tail.endswith(b'\n'):
+            return None
+        line = tail[tail.rfind(b'\n', 0, len(tail) - 1) + 1:]
+    return _parse_footer(line) if line.startswith(FOOTER_MARKER) else None
+
+
+def summarize_transitions(data):
+    """Footer of an emotion log segment: date range, rows and dominant-emotion counts."""
+    days, _, scores, _ = parse_log_chunk(data)
+    counts = np.bincount(dominant_indices(scores), minlength=len(EMOTIONS))
+    return {
+        'first': format_day(days.min()) if len(days) else None,
+        'last': format_day(days.max()) if len(days) else None,
+        'rows': len(days),
+        'dominant': dict(zip(EMOTIONS, counts.tolist())),
+    }
+
+
+def _chat_day(line):
+    match = _CHAT_DATE.search(line)
+    if match is None:
+        return None
+    try:
+        return datetime(int(match[3]), int(match[1]), int(match[2])).strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def summarize_chat(data):
+    """Footer of a chat history segment: date range and number of blocks."""
+    days = [_chat_day(line) for line in data.split(b'\n') if line.startswith(BLOCK_MARKER)]
+    dated = [day for day in days if day is not None]
+    return {'first': min(dated, default=None), 'last': max(dated, default=None), 'rows': len(days)}
+
+
+def close_segment(path, summarize):
+    """Appends the summary footer to a plain segment unless it already has one. Returns the summary."""
+    body, summary = read_segment(path)
+    if summary is not None:
+        return summary
+    summary = summarize(body)
+    with open(path, 'ab') as file:
+        # A line cut short by a crashed writer stays a line of its own
+        if body and not body.endswith(b'\n'):
+            file.write(b'\n')
+        file.write(_footer(summary))
+    return summary
+
+
+def close_stale_segments(directory, key, summarize):
+    """Closes every open plain segment older than `key`. Returns the paths it closed."""
+    closed = []
+    for other, path in list_segments(directory):
+        if other >= key or path.endswith('.gz'):
+            continue
+        if read_summary(path) is None:
+            close_segment(path, summarize)
+            closed.append(path)
+    return closed
+
+
+def compress_segment(path):
+    """
+    Gzips a closed plain segment in place of the original. Returns the new
+    path, or None if the segment is still open.
+    """
+    body, summary = read_segment(path)
+    if summary is None:
+        return None
+    target = path + '.gz'
+    temporary = target + '.tmp'
+    with open(temporary, 'wb') as raw:
+        # Two members: readers decompress only the first to get the summary
+        for part in (_footer(summary), body):
+            with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as member:
+                member.write(part)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temporary, target)
+    os.unlink(path)
+    return target
+
+
+class SegmentWriter:
+    """
+    Appends entries to the segment of their timestamp's period, closing
+    older segments (and optionally compressing them) whenever a new one is
+    started. An entry timestamped before the current segment goes into the
+    current segment, the newest one in the directory, since closed segments
+    are never reopened; writing into a closed or compressed newest segment
+    raises ValueError.
+    """
+
+    def __init__(self, directory, period=SEGMENT_PERIOD, summarize=summarize_transitions, compress=False):
+        if period not in PERIODS:
+            raise ValueError(f"Unknown segment period: {period!r}")
+        self.directory = directory
+        self.period = period
+        self.summarize = summarize
+        self.compress = compress
+        self._key = None
+        self._file = None
+
+    def _file_for(self, timestamp):
+        key = segment_key(timestamp, self.period)
+        if self._file is not None and key <= self._key:
+            return self._file
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.makedirs(self.directory, exist_ok=True)
+        segments = list_segments(self.directory)
+        if segments and segments[-1][0] >= key:
+            # A backfilled entry, or a restart within the period: append to the newest segment
+            key, path = segments[-1]
+            if path.endswith('.gz') or read_summary(path) is not None:
+                raise ValueError(f"Segment {path} is closed; entries for {key} or earlier cannot be added")
+        for path in close_stale_segments(self.directory, key, self.summarize):
+            if self.compress:
+                compress_segment(path)
+        self._key = key
+        self._file = open(segment_path(self.directory, key), 'a')
+        return self._file
+
+    def write(self, timestamp, text):
+        self._file_for(timestamp).write(text)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        """Closes the file; the segment itself stays open for the rest of its period."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def parse_segment(path, start=0):
+    """
+    Parses a segment's complete lines from body offset `start`. Returns the
+    parse_log_chunk columns, the number of bytes consumed and whether the
+    segment is closed.
+    """
+    body, summary = read_segment(path, start)
+    end = len(body) if summary is not None else body.rfind(b'\n') + 1
+    return parse_log_chunk(body[:end], start), end, summary is not None
+
+
+class SegmentedEmotionLogStore(EmotionLogStore):
+    """
+    EmotionLogStore over a directory of segments instead of one file.
+
+    A closed segment is parsed once and never read again, even after it is
+    compressed; the open one is tailed by byte offset like the single-file
+    log. A cold start over many large segments parses them in parallel.
+    Removing a segment starts the index over.
+    """
+
+    def _reset(self):
+        super()._reset()
+        self._segments = {}  # key -> [body offset read, closed]
+
+    def refresh(self):
+        """Absorbs rows appended to open segments and rows of new segments. Returns the number of new rows."""
+        with self._lock:
+            segments = list_segments(self.path)
+            keys = {key for key, _ in segments}
+            if any(key not in keys for key in self._segments):
+                self._reset()
+            self.available = os.path.isdir(self.path)
+
+            pending = []
+            for key, path in segments:
+                start, closed = self._segments.get(key, (0, False))
+                if not closed:
+                    pending.append((key, path, start))
+            if not pending:
+                return 0
+
+            size = sum(os.path.getsize(path) - start for _, path, start in pending)
+            arguments = [(path, start) for _, path, start in pending]
+            if self.workers > 1 and len(pending) > 1 and size >= PARALLEL_MIN_BYTES:
+                results = map_processes(parse_segment, arguments, self.workers)
+            else:
+                results = [parse_segment(*args) for args in arguments]
+
+            added = 0
+            for (key, path, start), (columns, consumed, closed) in zip(pending, results):
+                self._segments[key] = [start + consumed, closed]
+                added += self._absorb(path, *columns)
+            return added
+
+
+class SegmentedChatIndex(ChatHistoryIndex):
+    """
+    ChatHistoryIndex over a directory of segments instead of one file.
+
+    Blocks remember the segment they are in as well as their offset within
+    its body, so a date lookup still reads only its own blocks, seeking
+    into a compressed segment when it has to.
+    """
+
+    def _reset(self):
+        super()._reset()
+        self._keys = {}    # segment key -> source number
+        self._paths = []   # path of each source
+        self._ends = []    # body bytes indexed in each source
+        self._closed = []
+        self._block_sources = array('I')
+
+    def refresh(self):
+        """Indexes blocks appended to open segments and the blocks of new segments. Returns the number of new blocks."""
+        with self._lock:
+            segments = list_segments(self.path)
+            keys = {key for key, _ in segments}
+            if any(key not in keys for key in self._keys):
+                self._reset()
+            self.available = os.path.isdir(self.path)
+
+            added = 0
+            for key, path in segments:
+                source = self._keys.get(key)
+                if source is None:
+                    source = self._keys[key] = len(self._paths)
+                    self._paths.append(path)
+                    self._ends.append(0)
+                    self._closed.append(False)
+                # Compression renames a segment
+                self._paths[source] = path
+                if self._closed[source]:
+                    continue
+                body, summary = read_segment(path, self._ends[source])
+                end = len(body) if summary is not None else body.rfind(b'\n') + 1
+                count = self._index_lines(body[:end], self._ends[source])
+                self._block_sources.extend([source] * count)
+                self._ends[source] += end
+                self._closed[source] = summary is not None
+                added += count
+            return added
+
+    def _block_end(self, block):
+        source = self._block_sources[block]
+        if block + 1 < len(self.offsets) and self._block_sources[block + 1] == source:
+            return self.offsets[block + 1]
+        return self._ends[source]
+
+    def read_blocks(self, blocks):
+        """
+        Returns the (timestamp, summary) of each block number in `blocks`, in
+        the same order; None for a block without a summary.
+        """
+        with self._lock:
+            entries = []
+            file, source = None, None
+            try:
+                for block in blocks:
+                    if self._block_sources[block] != source:
+                        if file is not None:
+                            file.close()
+                        source = self._block_sources[block]
+                        file, base = open_body(self._paths[source])
+                    start = self.offsets[block]
+                    file.seek(base + start)
+                    entries.append(parse_block(file.read(self._block_end(block) - start)))
+            finally:
+                if file is not None:
+                    file.close()
+            return entries
+
+
+def segment_totals(directory, first=None, last=None):
+    """
+    Totals the emotion log from day number `first` to `last` inclusive
+    (None leaves a side open). Closed segments entirely inside the range
+    are answered from their footers and those entirely outside are skipped;
+    only the rest are parsed. Returns (rows, dominant counts, segments parsed).
+    """
+    rows = 0
+    counts = np.zeros(len(EMOTIONS), dtype=np.int64)
+    parsed = 0
+    for _, path in list_segments(directory):
+        summary = read_summary(path)
+        if summary is not None and summary['first'] is None:
+            continue
+        if summary is not None:
+            start, stop = day_number(summary['first']), day_number(summary['last'])
+            if (first is not None and stop < first) or (last is not None and start > last):
+                continue
+            if (first is None or start >= first) and (last is None or stop <= last):
+                rows += summary['rows']
+                counts += [summary['dominant'].get(emotion, 0) for emotion in EMOTIONS]
+                continue
+        parsed += 1
+        days, _, scores, _ = parse_log_chunk(read_segment(path)[0])
+        keep = np.ones(len(days), dtype=bool)
+        if first is not None:
+            keep &= days >= first
+        if last is not None:
+            keep &= days <= last
+        rows += int(keep.sum())
+        counts += np.bincount(dominant_indices(scores[keep]), minlength=len(EMOTIONS))
+    return rows, dict(zip(EMOTIONS, counts.tolist())), parsed
+
+
+def split_log(source, directory, period, entry_key, summarize):
+    """
+    Copies a monolithic log into segments. `entry_key(line, period)` returns
+    the segment key of a line that starts an entry, or None for a line that
+    continues the previous one. Closes every segment but the newest, which
+    may still be appended to. Returns the segment paths written.
+    """
+    if list_segments(directory):
+        raise FileExistsError(f"{directory} already has segments")
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    key, file = None, None
+    with open(source, 'rb') as log:
+        for line in log:
+            line_key = entry_key(line, period)
+            if line_key is not None and line_key != key:
+                if file is not None:
+                    file.close()
+                key = line_key
+                path = segment_path(directory, key)
+                if path not in written:
+                    written.append(path)
+                file = open(path, 'ab')
+            if file is None:
+                # Leading lines before the first entry are not part of any segment
+                continue
+            file.write(line)
+    if file is not None:
+        file.close()
+    written.sort()
+    for path in written[:-1]:
+        close_segment(path, summarize)
+    return written
+
+
+def transition_key(line, period):
+    match = _EMOTION_DATE.match(line)
+    if match is None:
+        return None
+    try:
+        return segment_key(datetime.strptime(match[1].decode(), '%Y-%m-%d'), period)
+    except ValueError:
+        return None
+
+
+def chat_key(line, period):
+    if not line.startswith(BLOCK_MARKER):
+        return None
+    day = _chat_day(line)
+    return segment_key(datetime.strptime(day, '%Y-%m-%d'), period) if day else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manage time-partitioned log segments.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    split = commands.add_parser('split', help="split the monolithic logs into segments")
+    split.add_argument('--period', choices=list(PERIODS), default=SEGMENT_PERIOD or 'monthly')
+    split.add_argument('--emotion-log', default=LOG_FILE)
+    split.add_argument('--chat-history', default=CHAT_HISTORY_FILE)
+    split.add_argument('--compress', action='store_true', help="gzip the closed segments")
+
+    compress = commands.add_parser('compress', help="gzip every closed segment")
+    compress.add_argument('directories', nargs='+')
+
+    summary = commands.add_parser('summary', help="total an emotion log range from the segment footers")
+    summary.add_argument('directory', nargs='?', default=segment_directory(LOG_FILE))
+    summary.add_argument('--from', dest='first')
+    summary.add_argument('--to', dest='last')
+    args = parser.parse_args()
+
+    if args.command == 'split':
+        for source, entry_key, summarize in ((args.emotion_log, transition_key, summarize_transitions),
+                                             (args.chat_history, chat_key, summarize_chat)):
+            if not os.path.exists(source):
+                print(f"{source} not found, skipped")
+                continue
+            directory = segment_directory(source)
+            paths = split_log(source, directory, args.period, entry_key, summarize)
+            if args.compress:
+                for path in paths[:-1]:
+                    compress_segment(path)
+            print(f"Split {source} into {len(paths)} segments in {directory}/; "
+                  f"remove {source} once the segments are in use")
+    elif args.command == 'compress':
+        for directory in args.directories:
+            compressed = [path for _, path in list_segments(directory)
+                          if not path.endswith('.gz') and compress_segment(path)]
+            print(f"Compressed {len(compressed)} segments in {directory}")
+    else:
+        rows, counts, parsed = segment_totals(
+            args.directory,
+            day_number(args.first) if args.first else None,
+            day_number(args.last) if args.last else None
+        )
+        print(f"{rows} transitions ({parsed} segments parsed, the rest from footers)")
+        for emotion, count in counts.items():
+            print(f"  {emotion:<9} {count}")
@@ -0,0 +1,72 @@
+import base64
+
+import numpy as np
+
+from log_store import EMOTIONS, dominant_indices, format_day, format_seconds
+
+# Rows per page of /sessions when no limit is given, and the most one page may hold
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 10000
+
+
+def session_rows(seconds, scores):
+    """Returns the time, dominant emotion and its score of every row of one day."""
+    # Get the highest scoring emotion of every row at once
+    dominant = dominant_indices(scores)
+    best_scores = scores[np.arange(len(scores)), dominant]
+    return [
+        {
+            "time": format_seconds(second),
+            "emotion": EMOTIONS[emotion],
+            "score": round(float(score), 2)
+        }
+        for second, emotion, score in zip(seconds.tolist(), dominant.tolist(), best_scores.tolist())
+    ]
+
+
+def encode_cursor(day, position):
+    """Opaque token for the row at `position` within day number `day`."""
+    return base64.urlsafe_b64encode(f"{day}:{position}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor. Raises ValueError for a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        day, position = (int(part) for part in raw.split(':'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {token}") from None
+    if position < 0:
+        raise ValueError(f"Invalid cursor: {token}")
+    return day, position
+
+
+def iter_sessions(store, first=None, last=None, after=None):
+    """
+    Yields (day, position, row) for every transition logged from day number
+    `first` to `last`, ordered by date and then file order within a day.
+    Only one day's rows are materialized at a time. `after` is a decoded
+    cursor (day, position) to resume from.
+
+    Rows are only ever appended to a day, so a cursor stays valid while the
+    log grows.
+    """
+    resume_day, resume_position = after if after is not None else (None, 0)
+    if resume_day is not None and (first is None or resume_day > first):
+        first = resume_day
+    for day in store.days_between(first, last):
+        date = format_day(day)
+        seconds, scores = store.rows_for_date(date)
+        skip = resume_position if day == resume_day else 0
+        for position, row in enumerate(session_rows(seconds[skip:], scores[skip:]), skip):
+            yield day, position, {"date": date, **row}
+
+
+def page_sessions(store, first=None, last=None, after=None, limit=DEFAULT_LIMIT):
+    """Returns (rows, next_cursor) for one page; next_cursor is None on the last page."""
+    rows = []
+    for day, position, row in iter_sessions(store, first, last, after):
+        if len(rows) == limit:
+            return rows, encode_cursor(day, position)
+        rows.append(row)
+    return rows, None
@@ -0,0 +1,460 @@
+"""
+SQLite backend for the emotion log and chat summaries.
+
+The database runs in WAL mode, so emotion.py can keep inserting transitions
+while any number of dashboard workers read consistent snapshots without
+blocking it. Enable it with JOYNA_LOG_FORMAT=sqlite, after importing the
+existing text logs:
+
+    python sqlite_store.py --emotion-log emotion_log.txt --chat-history chat_history.txt
+
+The import is incremental: running it again only adds what was appended to
+the text files since the last run.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from chat_index import BLOCK_MARKER, CHAT_HISTORY_FILE, parse_block
+from log_store import (EMOTIONS, LOG_FILE, EmotionLogStore, day_number, format_day, parse_log_line,
+                       parse_source, parse_transition, scores_vector)
+
+# Default database next to the text logs
+DATABASE_FILE = 'joyna.db'
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS transitions (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,          -- YYYY-MM-DD
+    time TEXT NOT NULL,          -- HH:MM:SS
+    from_emotion TEXT,
+    to_emotion TEXT,
+    duration REAL NOT NULL DEFAULT 0,
+    {', '.join(f'{emotion} REAL NOT NULL DEFAULT 0' for emotion in EMOTIONS)},
+    source TEXT                  -- camera ID when several are logged, else NULL
+);
+CREATE INDEX IF NOT EXISTS transitions_date_time ON transitions (date, time);
+
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,          -- YYYY-MM-DD
+    time TEXT NOT NULL,          -- HH:MM:SS
+    timestamp TEXT NOT NULL,     -- as written by src/chatbot.js
+    summary TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chat_summaries_date_time ON chat_summaries (date, time);
+
+-- How far each text file has been imported
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+"""
+
+_INSERT_TRANSITION = (
+    f"INSERT INTO transitions (date, time, from_emotion, to_emotion, duration, {', '.join(EMOTIONS)}, source) "
+    f"VALUES ({', '.join('?' * (6 + len(EMOTIONS)))})"
+)
+_INSERT_SUMMARY = "INSERT INTO chat_summaries (date, time, timestamp, summary) VALUES (?, ?, ?, ?)"
+
+# Connections opened before a fork; the child must neither use nor close them
+_inherited_connections = []
+
+_BLOCK_START = re.compile(rb'(?m)^(?=' + re.escape(BLOCK_MARKER) + rb')')
+
+
+def connect(path=DATABASE_FILE):
+    """Opens the database in WAL mode, creating the schema if needed."""
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    # WAL stays crash-safe with NORMAL; only the last commits before a power loss can be lost
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+    # Databases created before transitions were tagged with their source
+    columns = {row[1] for row in connection.execute('PRAGMA table_info(transitions)')}
+    if 'source' not in columns:
+        connection.execute('ALTER TABLE transitions ADD COLUMN source TEXT')
+    return connection
+
+
+def database_files(path):
+    """The files a reader's view of the database depends on: the database and its write-ahead log."""
+    return [path, path + '-wal']
+
+
+@contextmanager
+def transaction(connection):
+    """Runs the block as one write transaction, taking the write lock up front."""
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield connection
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+def transition_row(from_emotion, to_emotion, duration, scores, timestamp, source=None):
+    """Converts log_transition arguments into a transitions table row."""
+    return (timestamp.strftime('%Y-%m-%d'), timestamp.strftime('%H:%M:%S'),
+            from_emotion, to_emotion, float(duration), *scores_vector(scores), source)
+
+
+def insert_transitions(connection, entries):
+    """Inserts (from, to, duration, scores, timestamp[, source]) transitions in one transaction."""
+    with transaction(connection):
+        connection.executemany(_INSERT_TRANSITION, [transition_row(*entry) for entry in entries])
+
+
+def append_transition(path, from_emotion, to_emotion, duration, scores, timestamp, source=None):
+    connection = connect(path)
+    try:
+        insert_transitions(connection, [(from_emotion, to_emotion, duration, scores, timestamp, source)])
+    finally:
+        connection.close()
+
+
+def _parse_emotion_chunk(chunk):
+    """Returns (transition rows, bytes consumed) for the complete lines of a chunk."""
+    end = chunk.rfind(b'\n') + 1
+    rows = []
+    for raw_line in chunk[:end].splitlines():
+        line = raw_line.decode('utf-8', errors='replace')
+        parsed = parse_log_line(line)
+        if parsed is None:
+            continue
+        date_part, time_part, scores_dict = parsed
+        try:
+            timestamp = datetime.strptime(f"{date_part} {time_part}", '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            continue
+        rows.append(transition_row(*parse_transition(line), scores_dict, timestamp, parse_source(line)))
+    return rows, end
+
+
+def _parse_chat_chunk(chunk):
+    """
+    Returns (summary rows, bytes consumed) for the complete blocks of a chunk.
+    The last block is only complete once it ends with a blank line.
+    """
+    starts = [match.start() for match in _BLOCK_START.finditer(chunk)]
+    if not starts:
+        return [], 0
+    end = len(chunk) if chunk.endswith(b'\n\n') else starts[-1]
+    rows = []
+    for start, stop in zip(starts, starts[1:] + [len(chunk)]):
+        if start >= end:
+            break
+        parsed = parse_block(chunk[start:stop])
+        if parsed is None:
+            continue
+        timestamp, summary = parsed
+        try:
+            # Newer ICU versions put a narrow no-break space before AM/PM
+            logged = datetime.strptime(' '.join(timestamp.split()), '%m/%d/%Y, %I:%M:%S %p')
+        except ValueError:
+            continue
+        rows.append((logged.strftime('%Y-%m-%d'), logged.strftime('%H:%M:%S'), timestamp, summary))
+    return rows, end
+
+
+def _import_appended(connection, path, parse_chunk, insert):
+    """
+    Imports what was appended to a text file since its last import. A file
+    that was truncated or replaced is imported again from the start.
+    Returns the number of rows added.
+    """
+    source = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0
+    query = 'SELECT inode, offset FROM imports WHERE source = ?'
+    # Check without the write lock first; most calls find nothing new
+    if connection.execute(query, (source,)).fetchone() == (stat.st_ino, stat.st_size):
+        return 0
+    with transaction(connection):
+        state = connection.execute(query, (source,)).fetchone()
+        offset = 0
+        if state is not None and state[0] == stat.st_ino and state[1] <= stat.st_size:
+            offset = state[1]
+        if offset == stat.st_size:
+            return 0
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            chunk = file.read(stat.st_size - offset)
+        rows, consumed = parse_chunk(chunk)
+        if rows:
+            connection.executemany(insert, rows)
+        connection.execute('INSERT OR REPLACE INTO imports (source, inode, offset) VALUES (?, ?, ?)',
+                           (source, stat.st_ino, offset + consumed))
+    return len(rows)
+
+
+def import_emotion_log(connection, path=LOG_FILE):
+    """Imports new emotion_log.txt lines. Returns the number of transitions added."""
+    return _import_appended(connection, path, _parse_emotion_chunk, _INSERT_TRANSITION)
+
+
+def import_chat_history(connection, path=CHAT_HISTORY_FILE):
+    """Imports new chat_history.txt blocks. Returns the number of summaries added."""
+    return _import_appended(connection, path, _parse_chat_chunk, _INSERT_SUMMARY)
+
+
+class _ProcessConnection:
+    """
+    Lazily opened connection to `self.path` for one process. A worker forked
+    from a process that already had one opens its own instead.
+    """
+
+    _connection = None
+    _connection_pid = None
+
+    def _database(self):
+        if self._connection is not None and self._connection_pid != os.getpid():
+            _inherited_connections.append(self._connection)
+            self._connection = None
+        if self._connection is None:
+            self._connection = connect(self.path)
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _close_database(self):
+        if self._connection is not None and self._connection_pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+
+# Day number and seconds since midnight of a transitions row, as EmotionLogStore keeps them
+_DAY_COLUMN = "CAST(julianday(date) - 2440587.5 AS INTEGER)"
+_SECONDS_COLUMN = (
+    "CAST(substr(time, 1, 2) AS INTEGER) * 3600 + CAST(substr(time, 4, 2) AS INTEGER) * 60 "
+    "+ CAST(substr(time, 7, 2) AS INTEGER)"
+)
+
+
+class SqliteEmotionStore(_ProcessConnection, EmotionLogStore):
+    """
+    EmotionLogStore fed from the transitions table instead of the text log.
+
+    refresh() selects only the rows inserted since the previous call (by
+    rowid), so each dashboard worker keeps the same in-memory columns as
+    with the text log while the capture process writes; the dashboard
+    totals and rollups are folded from them. Date lookups (one day's rows,
+    the days in a range) are queries on the (date, time) index instead,
+    bounded by the last refreshed rowid so they agree with the columns.
+    """
+
+    def __init__(self, path=DATABASE_FILE):
+        super().__init__(path)
+
+    def _reset(self):
+        super()._reset()
+        self._last_id = 0
+        self._close_database()
+
+    def refresh(self):
+        """Absorbs transitions inserted since the last refresh. Returns the number of new rows."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self.available:
+                    self._reset()
+                return 0
+            if self._inode is not None and stat.st_ino != self._inode:
+                self._reset()
+            database = self._database()
+            self.available = True
+            self._inode = stat.st_ino
+
+            newest = database.execute('SELECT COALESCE(MAX(id), 0) FROM transitions').fetchone()[0]
+            if newest < self._last_id:
+                self._reset()
+                return self.refresh()
+            if newest == self._last_id:
+                return 0
+
+            rows = database.execute(
+                f"SELECT id, {_DAY_COLUMN}, {_SECONDS_COLUMN}, {', '.join(EMOTIONS)} "
+                "FROM transitions WHERE id > ? AND id <= ? ORDER BY id",
+                (self._last_id, newest)
+            ).fetchall()
+            self._last_id = newest
+            if not rows:
+                return 0
+            table = np.array(rows, dtype=np.float64)
+            self.extend(table[:, 1].astype(np.int32), table[:, 2].astype(np.int32), table[:, 3:])
+            return len(rows)
+
+    def rows_for_date(self, date_str):
+        """
+        Returns (seconds, scores) arrays for the rows logged on a YYYY-MM-DD date, in insertion order.
+        """
+        empty = np.empty(0, dtype=np.int32), np.empty((0, len(EMOTIONS)), dtype=np.float32)
+        with self._lock:
+            try:
+                iso_date = format_day(day_number(date_str))
+            except ValueError:
+                return empty
+            if self._connection is None:
+                return empty
+            rows = self._database().execute(
+                f"SELECT {_SECONDS_COLUMN}, {', '.join(EMOTIONS)} FROM transitions "
+                "WHERE date = ? AND id <= ? ORDER BY id",
+                (iso_date, self._last_id)
+            ).fetchall()
+        if not rows:
+            return empty
+        table = np.array(rows, dtype=np.float64)
+        return table[:, 0].astype(np.int32), table[:, 1:].astype(np.float32)
+
+    def days_between(self, first=None, last=None):
+        """Returns the sorted logged day numbers from `first` to `last` inclusive; None leaves a side open."""
+        with self._lock:
+            if self._connection is None:
+                return []
+            rows = self._database().execute(
+                f"SELECT DISTINCT {_DAY_COLUMN} FROM transitions "
+                "WHERE date >= ? AND date <= ? AND id <= ? ORDER BY date",
+                (format_day(first) if first is not None else '',
+                 format_day(last) if last is not None else '9999-12-31', self._last_id)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+class SqliteChatIndex(_ProcessConnection):
+    """
+    ChatHistoryIndex over the chat_summaries table.
+
+    src/chatbot.js keeps appending to chat_history.txt, so when `follow` is
+    set each refresh() first imports the blocks appended to that file; the
+    import runs in a write transaction, so concurrent workers never import a
+    block twice. Date lookups and the recent list are indexed queries; only
+    the timestamps are kept in memory for the dashboard's counters.
+    """
+
+    def __init__(self, path=DATABASE_FILE, follow=None):
+        self.path = path
+        self.follow = follow
+        self._lock = threading.RLock()
+        self.generation = 0
+        self._reset()
+
+    def _reset(self):
+        self._inode = None
+        self._last_id = 0
+        self.available = False
+        self.timestamps = []   # raw timestamp of each summary, in insertion order
+        self._ids = []         # rowid of each summary
+        self._dates = {}       # M/D/YYYY -> number of summaries
+        self._close_database()
+        self.generation += 1
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def refresh(self):
+        """Indexes summaries added since the last refresh. Returns the number of new summaries."""
+        with self._lock:
+            if self.follow is None and not os.path.exists(self.path):
+                if self.available:
+                    self._reset()
+                return 0
+            database = self._database()
+            stat = os.stat(self.path)
+            if self._inode is not None and stat.st_ino != self._inode:
+                self._reset()
+                return self.refresh()
+            self.available = True
+            self._inode = stat.st_ino
+
+            if self.follow is not None:
+                import_chat_history(database, self.follow)
+
+            rows = database.execute(
+                'SELECT id, timestamp FROM chat_summaries WHERE id > ? ORDER BY id', (self._last_id,)
+            ).fetchall()
+            for row_id, timestamp in rows:
+                self._ids.append(row_id)
+                self.timestamps.append(timestamp)
+                block_date = timestamp.split(',')[0].strip()
+                self._dates[block_date] = self._dates.get(block_date, 0) + 1
+            if rows:
+                self._last_id = rows[-1][0]
+            return len(rows)
+
+    def blocks_for_date(self, date):
+        """Returns the (timestamp, summary) blocks logged on an M/D/YYYY date."""
+        with self._lock:
+            try:
+                iso_date = datetime.strptime(date, '%m/%d/%Y').strftime('%Y-%m-%d')
+            except ValueError:
+                return []
+            if self._connection is None:
+                return []
+            return self._database().execute(
+                'SELECT timestamp, summary FROM chat_summaries WHERE date = ? AND id <= ? ORDER BY id',
+                (iso_date, self._last_id)
+            ).fetchall()
+
+    def count_for_date(self, date):
+        """Returns the number of summaries logged on an M/D/YYYY date."""
+        with self._lock:
+            return self._dates.get(date, 0)
+
+    def read_blocks(self, blocks):
+        """Returns the (timestamp, summary) of each block number in `blocks`, in the same order."""
+        with self._lock:
+            ids = [self._ids[block] for block in blocks]
+            if not ids:
+                return []
+            found = {}
+            # Stay under SQLite's limit on bound parameters
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                found.update((row[0], row[1:]) for row in self._database().execute(
+                    f"SELECT id, timestamp, summary FROM chat_summaries WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ))
+            return [found.get(row_id) for row_id in ids]
+
+    def recent(self, count):
+        """Returns the last `count` (timestamp, summary) blocks."""
+        with self._lock:
+            if self._connection is None or count <= 0:
+                return []
+            rows = self._database().execute(
+                'SELECT timestamp, summary FROM chat_summaries WHERE id <= ? ORDER BY id DESC LIMIT ?',
+                (self._last_id, count)
+            ).fetchall()
+            return rows[::-1]
+
+    def dates(self):
+        """Returns the distinct M/D/YYYY dates that have at least one summary."""
+        with self._lock:
+            return list(self._dates)
+
+    def day_count(self):
+        return len(self._dates)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import Joyna's text logs into the SQLite backend.")
+    parser.add_argument('--database', default=DATABASE_FILE)
+    parser.add_argument('--emotion-log', default=LOG_FILE)
+    parser.add_argument('--chat-history', default=CHAT_HISTORY_FILE)
+    args = parser.parse_args()
+
+    connection = connect(args.database)
+    transitions = import_emotion_log(connection, args.emotion_log)
+    summaries = import_chat_history(connection, args.chat_history)
+    connection.close()
+    print(f"Imported {transitions} transitions and {summaries} chat summaries into {args.database}")
@@ -13,6 +13,9 @@ let conversationHistory = [];
 
 const __dirname = path.dirname(fileURLToPath(import.meta.url));
 const historyFilePath = path.join(__dirname, '..', 'chat_history.txt');
+// With JOYNA_LOG_SEGMENTS=daily or monthly, summaries go to one file per period instead (see segments.py)
+const segmentPeriod = process.env.JOYNA_LOG_SEGMENTS || '';
+const segmentDirectory = path.join(__dirname, '..', 'chat_history');
 
 // Text-to-Speech function with Promise (unchanged)
 function speak(text) {
@@ -140,6 +143,60 @@ export async function getChatSummary() {
     return response.response.text();
 }
 
+function segmentKey(date) {
+    const year = date.getFullYear();
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    return segmentPeriod === 'daily' ? `${year}-${month}-${day}` : `${year}-${month}`;
+}
+
+// Segments already known to end with a footer, so they are not looked at again
+const closedSegments = new Set();
+
+// Whether a segment ends with a #summary footer, read from its last 64 KB like segments.read_summary
+function hasSummaryFooter(file) {
+    const fd = fs.openSync(file, 'r');
+    try {
+        const size = fs.fstatSync(fd).size;
+        const length = Math.min(size, 65536);
+        const tail = Buffer.alloc(length);
+        fs.readSync(fd, tail, 0, length, size - length);
+        if (!length || tail[length - 1] !== 0x0a) return false;
+        const start = tail.lastIndexOf(0x0a, length - 2) + 1;
+        return tail.subarray(start).toString('utf8').startsWith('#summary ');
+    } finally {
+        fs.closeSync(fd);
+    }
+}
+
+// Appends the summary footer read by segments.py to every open segment older than `key`;
+// only a segment that still needs its footer is read in full
+function closeStaleSegments(key) {
+    for (const name of fs.readdirSync(segmentDirectory)) {
+        if (!name.endsWith('.txt') || name.slice(0, -4) >= key || closedSegments.has(name)) continue;
+        const file = path.join(segmentDirectory, name);
+        if (hasSummaryFooter(file)) {
+            closedSegments.add(name);
+            continue;
+        }
+
+        const text = fs.readFileSync(file, 'utf8');
+        const days = [];
+        let rows = 0;
+        for (const line of text.split('\n')) {
+            if (!line.startsWith('Timestamp: ')) continue;
+            rows++;
+            const match = line.match(/(\d{1,2})\/(\d{1,2})\/(\d{4})/);
+            if (match) days.push(`${match[3]}-${match[1].padStart(2, '0')}-${match[2].padStart(2, '0')}`);
+        }
+        days.sort();
+        const summary = { first: days[0] ?? null, last: days[days.length - 1] ?? null, rows };
+        const separator = text && !text.endsWith('\n') ? '\n' : '';
+        fs.appendFileSync(file, `${separator}#summary ${JSON.stringify(summary)}\n`);
+        closedSegments.add(name);
+    }
+}
+
 export async function appendToHistoryFile() {
     try {
         // Get current timestamp
@@ -159,14 +216,23 @@ export async function appendToHistoryFile() {
         // Format the entry with timestamp and summary
         const entryText = `Timestamp: ${timestamp}\n${summary}\n\n`;
         
+        // Roll over to the current period's segment, closing the previous ones
+        let targetPath = historyFilePath;
+        if (segmentPeriod === 'daily' || segmentPeriod === 'monthly') {
+            const key = segmentKey(new Date());
+            fs.mkdirSync(segmentDirectory, { recursive: true });
+            closeStaleSegments(key);
+            targetPath = path.join(segmentDirectory, `${key}.txt`);
+        }
+
         // Create the directory if it doesn't exist
-        const dir = path.dirname(historyFilePath);
+        const dir = path.dirname(targetPath);
         if (!fs.existsSync(dir)) {
             fs.mkdirSync(dir, { recursive: true });
         }
         
         // Append to file
-        fs.appendFileSync(historyFilePath, entryText);
+        fs.appendFileSync(targetPath, entryText);
         console.log('Successfully wrote to chat history file');
     } catch (error) {
         console.error('Error writing to history file:', error);
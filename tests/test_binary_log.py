@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from binary_log import BinaryEmotionLog, append_transition
+from log_store import EMOTIONS
+
+
+def test_out_of_order_appends(tmp_path):
+    path = str(tmp_path / 'emotion_log.bin')
+    log = BinaryEmotionLog(path)
+    rng = np.random.default_rng(0)
+    start = datetime(2024, 11, 1)
+    appended = []
+
+    def append(count, days):
+        for _ in range(count):
+            timestamp = start + timedelta(days=int(rng.integers(days)), seconds=int(rng.integers(86400)))
+            scores = dict(zip(EMOTIONS, rng.dirichlet(np.ones(len(EMOTIONS))).round(2).tolist()))
+            append_transition(path, 'neutral', 'happy', 1.0, scores, timestamp)
+            appended.append(timestamp)
+
+    # In order at first, then batches backfilled into earlier days across several refreshes
+    for day in range(5):
+        append_transition(path, 'neutral', 'happy', 1.0, {'happy': 1.0}, start + timedelta(days=day, hours=12))
+        appended.append(start + timedelta(days=day, hours=12))
+    log.refresh()
+    for _ in range(4):
+        append(25, 10)
+        assert log.refresh() == 25
+
+        for day in range(12):
+            date = start + timedelta(days=day)
+            expected = sorted(t for t in appended if t.date() == date.date())
+            seconds, scores = log.rows_for_date(date.strftime('%Y-%m-%d'))
+            assert log.count_for_date(date.strftime('%Y-%m-%d')) == len(expected) == len(seconds)
+            # Rows come back in append order
+            in_append_order = [t for t in appended if t.date() == date.date()]
+            assert seconds.tolist() == [t.hour * 3600 + t.minute * 60 + t.second for t in in_append_order]
+            assert scores.shape == (len(expected), len(EMOTIONS))
+
+        days = sorted({(t - datetime(1970, 1, 1)).days for t in appended})
+        first = (start - datetime(1970, 1, 1)).days
+        assert log.days_between() == days
+        assert log.days_between(first + 2, first + 6) == [day for day in days if first + 2 <= day <= first + 6]
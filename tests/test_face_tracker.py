@@ -0,0 +1,19 @@
+from face_tracker import dominant, evaluate, read_clip
+from generate_clip import SyntheticFaceDetector, write_clip
+
+
+def test_evaluate_on_synthetic_clip(tmp_path):
+    path = str(tmp_path / 'clip.avi')
+    shown = write_clip(path, count=12, hold=6)
+    clip = read_clip(path)
+    assert len(clip) == 12
+
+    # One search scale keeps the reference run fast
+    detector = SyntheticFaceDetector(scales=(1.0,))
+    assert [dominant(detector.detect_emotions(frame)) for frame in clip] == shown
+
+    rows = evaluate(clip, lambda: SyntheticFaceDetector(scales=(1.0,)), [5], tracker='mil')
+    assert [row['mode'] for row in rows] == ['detect every frame', 'redetect every 5']
+    assert all(row['fps'] > 0 for row in rows)
+    assert rows[1]['detection_rate'] < 1.0
+    assert rows[1]['agreement'] >= 0.9
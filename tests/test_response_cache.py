@@ -0,0 +1,20 @@
+from response_cache import ResponseCache
+
+
+def test_past_day_entry_is_revalidated_by_its_stamp():
+    cache = ResponseCache()
+    key = ('session_history', (('date_str', '11/10/2024'),), ())
+    cache.put(key, ((1, 100, 10),), b'{"sessions": []}', 'application/json', stamp=(1, 6))
+
+    # Rows appended for other days leave the day's stamp alone
+    assert cache.get(key, ((1, 120, 11),), lambda: (1, 6)) is not None
+    # A row backfilled into the day changes it
+    assert cache.get(key, ((1, 140, 12),), lambda: (1, 7)) is None
+    assert cache.get(key, ((1, 140, 12),), lambda: (1, 7)) is None
+
+
+def test_unstamped_entry_needs_unchanged_sources():
+    cache = ResponseCache()
+    cache.put('key', ((1, 100, 10),), b'{}', 'application/json')
+    assert cache.get('key', ((1, 100, 10),)) is not None
+    assert cache.get('key', ((1, 120, 11),), lambda: (1, 6)) is None
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+
+from segments import SegmentWriter, SegmentedEmotionLogStore, compress_segment, list_segments, read_summary
+from transition_logger import format_log_entry
+
+SCORES = {'angry': 0.1, 'disgust': 0.0, 'fear': 0.0, 'happy': 0.8, 'sad': 0.0, 'surprise': 0.0, 'neutral': 0.1}
+
+
+def write(writer, timestamp):
+    writer.write(timestamp, format_log_entry('neutral', 'happy', 1.0, SCORES, timestamp))
+
+
+def test_backfilled_entry_goes_into_the_current_segment(tmp_path):
+    directory = str(tmp_path / 'emotion_log')
+    writer = SegmentWriter(directory, 'monthly')
+    write(writer, datetime(2024, 11, 20, 9, 0))
+    write(writer, datetime(2024, 12, 1, 9, 0))
+    writer.close()
+    november = dict(list_segments(directory))['2024-11']
+    compress_segment(november)
+
+    # A new writer, as in a batch run, starting with an entry from the compressed month
+    writer = SegmentWriter(directory, 'monthly')
+    write(writer, datetime(2024, 11, 20, 10, 0))
+    writer.close()
+
+    assert [key for key, _ in list_segments(directory)] == ['2024-11', '2024-12']
+    assert not (tmp_path / 'emotion_log' / '2024-11.txt').exists()
+    store = SegmentedEmotionLogStore(directory)
+    store.refresh()
+    seconds, _ = store.rows_for_date('2024-11-20')
+    assert len(seconds) == 2
+
+
+def test_closed_newest_segment_is_not_reopened(tmp_path):
+    directory = str(tmp_path / 'emotion_log')
+    writer = SegmentWriter(directory, 'monthly')
+    write(writer, datetime(2024, 11, 20, 9, 0))
+    write(writer, datetime(2024, 12, 1, 9, 0))
+    writer.close()
+    november = dict(list_segments(directory))['2024-11']
+    footer = read_summary(november)
+    (tmp_path / 'emotion_log' / '2024-12.txt').unlink()
+
+    writer = SegmentWriter(directory, 'monthly')
+    with pytest.raises(ValueError):
+        write(writer, datetime(2024, 11, 21, 9, 0))
+    assert read_summary(november) == footer
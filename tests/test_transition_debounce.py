@@ -0,0 +1,35 @@
+import numpy as np
+
+from log_store import EMOTIONS, scores_vector
+from transition_debounce import TransitionDebouncer
+
+
+def flickering_scores(count, flicker=0.3, hold=90, seed=0):
+    """Per-frame scores for a face whose true emotion changes every `hold` frames, misread on `flicker` of them."""
+    rng = np.random.default_rng(seed)
+    for index in range(count):
+        shown = EMOTIONS[index // hold % len(EMOTIONS)]
+        dominant = EMOTIONS[rng.integers(len(EMOTIONS))] if rng.random() < flicker else shown
+        weights = rng.random(len(EMOTIONS))
+        weights[EMOTIONS.index(dominant)] += 2.0
+        weights /= weights.sum()
+        yield {emotion: round(float(weight), 2) for emotion, weight in zip(EMOTIONS, weights)}
+
+
+def test_logged_scores_show_the_confirmed_emotion():
+    debouncer = TransitionDebouncer()
+    current, confirmed = None, []
+    for frame, scores in enumerate(flickering_scores(3000)):
+        now = frame / 30
+        if current is None:
+            current = max(scores, key=scores.get)
+            continue
+        result = debouncer.observe(current, scores, now)
+        if result:
+            current, _, logged = result
+            confirmed.append((current, logged))
+
+    assert confirmed
+    assert debouncer.stats()['suppressed'] > 0
+    for emotion, logged in confirmed:
+        assert EMOTIONS[int(np.argmax(scores_vector(logged)))] == emotion
@@ -0,0 +1,105 @@
+from collections import Counter, deque
+
+from emotion_window import EmotionWindow
+
+
+class TransitionDebouncer:
+    """
+    Decides when a change of the per-frame dominant emotion is a real
+    transition rather than classifier flicker.
+
+    A challenger replaces the current emotion only once it
+      * wins at least `majority` of the frame votes over the last
+        `vote_window` seconds,
+      * leads the current emotion by `margin` in the scores averaged over
+        that window (normalized, so 0.1 is ten points of share), and
+      * has kept both up for `min_dwell` seconds.
+    The transition is then dated from when the challenger first qualified,
+    so the logged durations still add up to the session time, and logged
+    with the scores of the latest frame the challenger was dominant in, so
+    readers that take the emotion from the scores see the challenger too.
+
+    With all four settings at 0 every frame-to-frame change is accepted at
+    once, as without a debouncer.
+    """
+
+    def __init__(self, min_dwell=1.0, margin=0.1, vote_window=1.0, majority=0.6):
+        self.min_dwell = max(min_dwell, 0.0)
+        self.margin = max(margin, 0.0)
+        self.vote_window = max(vote_window, 0.0)
+        self.majority = min(max(majority, 0.0), 1.0)
+        self._scores = EmotionWindow(self.vote_window)
+        self._votes = deque()  # (time, dominant emotion) over the vote window
+        self._tally = Counter()
+        self._candidate = None
+        self._onset = None
+        self._last_dominant = None
+        self._latest_scores = {}  # dominant emotion -> scores of the latest frame it won
+        self.frames = 0
+        self.raw_transitions = 0
+        self.transitions = 0
+        # Frames on which a challenger was held back, by the check it failed
+        self.blocked = Counter()
+
+    def _vote(self, dominant, now):
+        self._votes.append((now, dominant))
+        self._tally[dominant] += 1
+        cutoff = now - self.vote_window
+        while self._votes[0][0] < cutoff:
+            _, expired = self._votes.popleft()
+            self._tally[expired] -= 1
+
+    def _challenger(self, current, scores, now):
+        """The emotion that currently qualifies to replace `current`, or None."""
+        leader, votes = self._tally.most_common(1)[0]
+        if leader == current:
+            return None
+        if votes < self.majority * len(self._votes):
+            self.blocked['majority'] += 1
+            return None
+        _, averaged = self._scores.summary(now) or (None, scores)
+        if averaged.get(leader, 0.0) - averaged.get(current, 0.0) < self.margin:
+            self.blocked['margin'] += 1
+            return None
+        return leader
+
+    def observe(self, current, scores, now):
+        """
+        Takes one frame's scores while `current` is the accepted emotion.
+        Returns (new emotion, onset time, scores to log) when a transition
+        is confirmed, else None.
+        """
+        self.frames += 1
+        dominant = max(scores, key=scores.get)
+        if self._last_dominant is not None and dominant != self._last_dominant:
+            self.raw_transitions += 1
+        self._last_dominant = dominant
+        self._latest_scores[dominant] = scores
+        self._scores.append(scores, now)
+        self._vote(dominant, now)
+
+        challenger = self._challenger(current, scores, now)
+        if challenger != self._candidate:
+            self._candidate = challenger
+            self._onset = now
+        if challenger is None:
+            return None
+        if now - self._onset < self.min_dwell:
+            self.blocked['dwell'] += 1
+            return None
+
+        self.transitions += 1
+        onset = self._onset
+        self._candidate = self._onset = None
+        # The challenger leads the vote window, so it has won a frame of its own;
+        # the confirming frame itself may still have been a flicker
+        return challenger, onset, self._latest_scores[challenger]
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'raw_transitions': self.raw_transitions,
+            'transitions': self.transitions,
+            'suppressed': max(self.raw_transitions - self.transitions, 0),
+            'blocked_frames': dict(self.blocked),
+        }
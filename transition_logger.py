@@ -0,0 +1,166 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from binary_log import HEADER, RECORD_DTYPE, encode_record
+from segments import SegmentWriter
+import sqlite_store
+
+
+def format_log_entry(from_emotion, to_emotion, duration, scores, timestamp, source=None):
+    """Formats one transition as an emotion_log.txt line, tagged with its camera's `source` ID if given."""
+    tag = f"Source: {source} | " if source is not None else ""
+    return (
+        f"Date: {timestamp.strftime('%Y-%m-%d')} | "
+        f"Time: {timestamp.strftime('%H:%M:%S')} | "
+        f"{tag}"
+        f"Transition: {from_emotion} -> {to_emotion} | "
+        f"Duration: {duration:.2f}s | "
+        f"Scores: {scores}\n"
+    )
+
+
+class WriterError(RuntimeError):
+    """The transition log writer thread has stopped and cannot take more transitions."""
+
+
+class TransitionLogWriter:
+    """
+    Writes transitions from a background thread so the frame loop never
+    touches the disk.
+
+    log() only enqueues; the writer thread keeps the log file(s) and the
+    database connection open and writes in batches (one transaction each), flushing once `batch_size` transitions are pending or
+    `flush_interval` seconds have passed. The queue is bounded: if the
+    writer falls that far behind, log() blocks rather than dropping a
+    transition. close() drains everything that was queued. If the writer
+    thread fails (the log cannot be opened or written), the next log() or
+    close() raises WriterError instead of waiting on it forever.
+
+    With `segment_period` set, `text_path` is a directory of daily or
+    monthly segments, rolled over as the transitions' timestamps move on.
+    """
+
+    _STOP = object()
+
+    def __init__(self, text_path=None, binary_path=None, database_path=None, batch_size=32, flush_interval=1.0,
+                 max_pending=1024, segment_period=None):
+        self.text_path = text_path
+        self.segment_period = segment_period
+        self.binary_path = binary_path
+        self.database_path = database_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.written = 0
+        self.flushes = 0
+        self.error = None  # What stopped the writer thread, if it failed
+        self._reported = False
+        self._thread = threading.Thread(target=self._run, name="transition-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, from_emotion, to_emotion, duration, scores, timestamp, source=None):
+        """Queues a transition; same signature as emotion.log_transition."""
+        entry = (from_emotion, to_emotion, duration, dict(scores), timestamp, source)
+        while True:
+            self._raise_if_failed()
+            try:
+                self._queue.put(entry, timeout=0.5)
+                return
+            except queue.Full:
+                # Still blocked on a slow writer; look again whether it is alive
+                continue
+
+    def close(self):
+        """Writes and flushes every queued transition, then stops the writer thread."""
+        while self._thread.is_alive():
+            try:
+                self._queue.put(self._STOP, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+        if self.error is not None and not self._reported:
+            self._raise_if_failed()
+
+    def _raise_if_failed(self):
+        if self.error is not None:
+            self._reported = True
+            raise WriterError(f"Transition log writer failed: {self.error}") from self.error
+        if not self._thread.is_alive():
+            self._reported = True
+            raise WriterError("Transition log writer is closed")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self):
+        if self.text_path and self.segment_period:
+            text_file = SegmentWriter(self.text_path, self.segment_period)
+        else:
+            text_file = open(self.text_path, "a") if self.text_path else None
+        binary_file = open(self.binary_path, "ab") if self.binary_path else None
+        if binary_file is not None and binary_file.tell() == 0:
+            binary_file.write(HEADER)
+        # Opened on the writer thread, which is the only one using it
+        database = sqlite_store.connect(self.database_path) if self.database_path else None
+        return text_file, binary_file, database
+
+    def _write(self, batch, text_file, binary_file, database):
+        if isinstance(text_file, SegmentWriter):
+            for entry in batch:
+                text_file.write(entry[4], format_log_entry(*entry))
+            text_file.flush()
+        elif text_file is not None:
+            text_file.write(''.join(format_log_entry(*entry) for entry in batch))
+            text_file.flush()
+        if binary_file is not None:
+            # Binary records have no room for the source ID
+            records = np.concatenate([encode_record(*entry[:5]) for entry in batch]).astype(RECORD_DTYPE)
+            binary_file.write(records.tobytes())
+            binary_file.flush()
+        if database is not None:
+            sqlite_store.insert_transitions(database, batch)
+        self.written += len(batch)
+        self.flushes += 1
+
+    def _run(self):
+        text_file = binary_file = database = None
+        batch = []
+        last_flush = time.monotonic()
+        try:
+            text_file, binary_file, database = self._open()
+            while True:
+                timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0.01)
+                try:
+                    entry = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    entry = None
+
+                stopping = entry is self._STOP
+                if entry is not None and not stopping:
+                    batch.append(entry)
+
+                due = time.monotonic() - last_flush >= self.flush_interval
+                if batch and (stopping or due or len(batch) >= self.batch_size):
+                    self._write(batch, text_file, binary_file, database)
+                    batch = []
+                if stopping or due:
+                    last_flush = time.monotonic()
+                if stopping:
+                    break
+        except Exception as e:
+            # Surfaced by the next log() or close(); the unwritten batch is lost
+            self.error = e
+        finally:
+            for file in (text_file, binary_file, database):
+                if file is not None:
+                    try:
+                        file.close()
+                    except Exception as e:
+                        self.error = self.error or e
@@ -0,0 +1,14 @@
+"""
+WSGI entry point for running the dashboard under a preforking server.
+
+The indexes are warmed up while this module is imported, before any worker
+is forked, so with --preload every worker starts ready and shares the parsed
+data copy-on-write instead of parsing the logs again:
+
+    gunicorn --preload --workers 4 wsgi:app
+"""
+import os
+
+from main import create_app
+
+app = create_app(os.environ.get('JOYNA_WARM_UP', 'preload'))